@@ -191,6 +191,7 @@ class PoisonCloudShareTileEffect(AddEntityEffectShareTile):
     def __init__(self):
         super(PoisonCloudShareTileEffect, self).__init__()
         self.component_type = "poison_share_tile_effect"
+        self.damage_types = [DamageTypes.POISON]
         self.poison_effect_factory = PoisonEntityEffectFactory(None, random.randrange(8, 14), 2, random.randrange(10, 20))
 
     @property
@@ -214,6 +215,7 @@ class ExplosionDamageShareTileEffect(EntityShareTileEffect):
     def __init__(self):
         super(ExplosionDamageShareTileEffect, self).__init__()
         self.component_type = "explosion_damage_share_tile_effect"
+        self.damage_types = [DamageTypes.PHYSICAL]
 
     def effect(self, **kwargs):
         target_entity = kwargs["target_entity"]
@@ -224,7 +226,7 @@ class ExplosionDamageShareTileEffect(EntityShareTileEffect):
         if not target_entity.has("effect_queue"):
             return
 
-        damage_effect = UndodgeableDamagAndBlockSameEffect(source_entity, damage, [DamageTypes.PHYSICAL],
+        damage_effect = UndodgeableDamagAndBlockSameEffect(source_entity, damage, self.damage_types,
                                                            messenger.HURT_BY_EXPLOSION, "explosion_damage",
                                                            time_to_live=gametime.single_turn)
         target_entity.effect_queue.add(damage_effect)
@@ -1,63 +1,226 @@
+import atexit
+import multiprocessing
 import random
 
 import dungeongenerator
 from monsteractor import TryPutToSleep
 from monstertables import from_table_pick_n_items_for_depth, dungeon_table, dungeon_equipment_table, dungeon_usable_item_table
+import levelcache
+import levelsnapshot
+import monster
+import settings
 import spawner
 from tools import time_it
 
+# Monsters are placed at least this far from where the player enters the level,
+# unless no free position is, then the distance is halved until one is found.
+MONSTER_MINIMUM_STAIRS_DISTANCE = 5
+
 
 class Dungeon(object):
     def __init__(self, game_state):
         self.level_count = 10
         self._dungeon_levels = [None]
         self.game_state = game_state
+        self._level_seeds = [random.getrandbits(32) for _ in range(self.level_count)]
+        self._pregenerated_levels = {}
 
     def get_dungeon_level(self, depth):
         if depth >= self.level_count:
             self.game_state.has_won = True
             return None
         while len(self._dungeon_levels) <= depth:
-            self._dungeon_levels.append(self._generate_dungeon_level(len(self._dungeon_levels)))
+            self._dungeon_levels.append(self._get_new_dungeon_level(len(self._dungeon_levels)))
+        if not self._is_last_depth(depth):
+            self._pregenerate_dungeon_level(depth + 1)
         return self._dungeon_levels[depth]
 
+    def generate_all_dungeon_levels(self, processes=None):
+        """
+        Generates every depth not generated yet in parallel, one seeded task per depth.
+
+        Returns when all levels are done, each level is loaded from its snapshot
+        when its depth is first visited.
+
+        Args:
+            processes: The number of worker processes, one per CPU if None.
+        """
+        pool = multiprocessing.Pool(processes)
+        try:
+            for depth in range(len(self._dungeon_levels), self.level_count):
+                if not depth in self._pregenerated_levels:
+                    self._pregenerated_levels[depth] = pool.apply_async(
+                        _generate_dungeon_level_snapshot,
+                        (depth, self._level_seeds[depth], self._is_last_depth(depth), level_cache))
+            for pregenerated_level in self._pregenerated_levels.values():
+                pregenerated_level.wait()
+        finally:
+            pool.close()
+            pool.join()
+
     def __getstate__(self):
-        return dict(self.__dict__)
+        state = dict(self.__dict__)
+        state["_pregenerated_levels"] = {}
+        return state
 
     def __setstate__(self, state):
         self.__dict__.update(state)
 
+    def _pregenerate_dungeon_level(self, depth):
+        """
+        Starts generating the level at depth in the worker process, unless it exists or is on its way.
+        """
+        if depth < len(self._dungeon_levels) or depth in self._pregenerated_levels:
+            return
+        self._pregenerated_levels[depth] = _get_worker_pool().apply_async(
+            _generate_dungeon_level_snapshot,
+            (depth, self._level_seeds[depth], self._is_last_depth(depth), level_cache))
+
+    def _get_new_dungeon_level(self, depth):
+        """
+        Attaches the level pregenerated for depth if the worker is done with it, generates it here otherwise.
+        """
+        pregenerated_level = self._pregenerated_levels.pop(depth, None)
+        if pregenerated_level is not None and pregenerated_level.ready() and pregenerated_level.successful():
+            try:
+                dungeon_level = levelsnapshot.loads(pregenerated_level.get(), self.game_state)
+            except levelsnapshot.SnapshotError:
+                dungeon_level = None
+            if dungeon_level is not None:
+                dungeon_level.dungeon = self
+                return dungeon_level
+        return self._generate_dungeon_level(depth)
+
     def _generate_dungeon_level(self, depth):
         self.game_state.draw_loading_screen("Generating Dungeon...")
-        size = 600 + depth * 20
+        is_last_depth = self._is_last_depth(depth)
+        seed = self._level_seeds[depth]
+        dungeon_level = None
+        if level_cache is not None:
+            dungeon_level = _load_cached_dungeon_level(level_cache, seed, depth, is_last_depth, self.game_state)
+        if dungeon_level is None:
+            dungeon_level = _generate_dungeon_level_with_seed(depth, seed, self.game_state, is_last_depth)
+            if level_cache is not None:
+                level_cache.put(_get_level_cache_key(seed, depth, is_last_depth), levelsnapshot.dumps(dungeon_level))
+        dungeon_level.dungeon = self
+        return dungeon_level
 
-        dungeon_level = time_it("dungeon_level_generation",
-                                (lambda: dungeongenerator.generate_dungeon_floor(size, depth)))
-        minimum_monsters = int(4 + depth * 1.2)
-        monsters_to_spawn = random.randrange(minimum_monsters, minimum_monsters + 3)
-        monsters = from_table_pick_n_items_for_depth(dungeon_table, monsters_to_spawn,
-                                                     depth, self.game_state)
-        print monsters
-        for monster in monsters:
-            sleep_chance = 0.25
-            if sleep_chance > random.random():
-                monster.set_child(TryPutToSleep())
-            spawner.place_piece_on_random_walkable_tile(monster, dungeon_level)
+    def _is_last_depth(self, depth):
+        return depth == self.level_count - 1
+
+
+# Levels generated from the same seed are reused from this cache if it is set.
+level_cache = levelcache.LevelCache() if settings.LEVEL_CACHE_FLAG else None
+_worker_pool = None
+
+
+def _get_worker_pool():
+    """
+    Gets the worker process the next level is pregenerated in, started on first use.
 
-        if depth == (len(self._dungeon_levels) - 1):
-            jericho = monster.new_jericho(self.game_state)
-            spawner.place_piece_on_random_walkable_tile(jericho, dungeon_level)
+    The pool belongs to this module, shutdown_worker_pool stops it and runs when the game exits.
+    """
+    global _worker_pool
+    if _worker_pool is None:
+        _worker_pool = multiprocessing.Pool(1)
+    return _worker_pool
 
-        place_items_in_dungeon(dungeon_level, self.game_state)
 
-        #dungeon_level.print_statistics()
+def shutdown_worker_pool():
+    """
+    Stops the worker process and drops the levels it is still generating.
+
+    Levels not pregenerated yet are generated in process when they are entered.
+    """
+    global _worker_pool
+    if _worker_pool is not None:
+        _worker_pool.terminate()
+        _worker_pool.join()
+        _worker_pool = None
+
+
+atexit.register(shutdown_worker_pool)
+
+
+def _generate_dungeon_level_snapshot(depth, seed, is_last_depth, cache):
+    """
+    Generates a dungeon level in the worker process and returns its snapshot.
+
+    The pieces of the level get their game state when the snapshot is loaded.
+    """
+    key = _get_level_cache_key(seed, depth, is_last_depth)
+    data = cache.get(key) if cache is not None else None
+    if data is None:
+        data = levelsnapshot.dumps(_generate_dungeon_level_with_seed(depth, seed, None, is_last_depth))
+        if cache is not None:
+            cache.put(key, data)
+    return data
+
+
+def _get_level_cache_key(seed, depth, is_last_depth):
+    return levelcache.get_key(seed, depth, is_last_depth,
+                              dungeongenerator.GENERATOR_VERSION, levelsnapshot.SNAPSHOT_VERSION)
+
+
+def _load_cached_dungeon_level(cache, seed, depth, is_last_depth, game_state):
+    """
+    Loads the level generated from seed at depth from the cache, None if it is not there.
+    """
+    key = _get_level_cache_key(seed, depth, is_last_depth)
+    data = cache.get(key)
+    if data is None:
+        return None
+    try:
+        return levelsnapshot.loads(data, game_state)
+    except levelsnapshot.SnapshotError:
+        cache.remove(key)
+        return None
+
+
+def _generate_dungeon_level_with_seed(depth, seed, game_state, is_last_depth):
+    """
+    Generates a dungeon level from its own random stream, the same seed always gives the same level.
+    """
+    random_state = random.getstate()
+    random.seed(seed)
+    try:
+        return generate_dungeon_level(depth, game_state, is_last_depth)
+    finally:
+        random.setstate(random_state)
 
-        dungeon_level.dungeon = self
-        return dungeon_level
 
+def generate_dungeon_level(depth, game_state, is_last_depth):
+    size = 600 + depth * 20
 
-def place_items_in_dungeon(dungeon_level, game_state):
-    spawner.place_health_potions(dungeon_level, game_state)
+    dungeon_level = time_it("dungeon_level_generation",
+                            (lambda: dungeongenerator.generate_dungeon_floor(size, depth)))
+    minimum_monsters = int(4 + depth * 1.2)
+    monsters_to_spawn = random.randrange(minimum_monsters, minimum_monsters + 3)
+    monsters = from_table_pick_n_items_for_depth(dungeon_table, monsters_to_spawn,
+                                                 depth, game_state)
+    print monsters
+    spawn_pool = spawner.get_spawn_pool(dungeon_level)
+    for new_monster in monsters:
+        sleep_chance = 0.25
+        if sleep_chance > random.random():
+            new_monster.set_child(TryPutToSleep())
+        spawn_pool.place_piece(new_monster, minimum_stairs_distance=MONSTER_MINIMUM_STAIRS_DISTANCE)
+
+    if is_last_depth:
+        jericho = spawner.new_from_template(monster.new_jericho, game_state)
+        spawn_pool.place_piece(jericho, minimum_stairs_distance=MONSTER_MINIMUM_STAIRS_DISTANCE)
+    dungeongenerator.stage_timer.lap("monsters")
+
+    place_items_in_dungeon(dungeon_level, game_state, spawn_pool)
+    dungeongenerator.stage_timer.lap("items")
+
+    #dungeon_level.print_statistics()
+
+    return dungeon_level
+
+
+def place_items_in_dungeon(dungeon_level, game_state, spawn_pool):
+    spawner.place_health_potions(dungeon_level, game_state, spawn_pool)
     equipments = from_table_pick_n_items_for_depth(dungeon_equipment_table,
                                                    random.randrange(int(2 + dungeon_level.depth * 0.5)),
                                                    dungeon_level.depth, game_state)
@@ -66,7 +229,7 @@ def place_items_in_dungeon(dungeon_level, game_state):
                                                      dungeon_level.depth, game_state)
     for loot_item in equipments + usable_items:
         print "item: ", loot_item.description.name
-        spawner.place_piece_on_random_walkable_tile(loot_item, dungeon_level)
+        spawn_pool.place_piece(loot_item)
 
 
 class ReflexiveDungeon(object):
@@ -0,0 +1,65 @@
+import unittest
+import dungeon
+import levelsnapshot
+
+
+class GameStateStub(object):
+    def __init__(self):
+        self.has_won = False
+
+    def draw_loading_screen(self, text):
+        pass
+
+
+def templates_of_entities(dungeon_level):
+    return [entity.template_id.value for entity in dungeon_level.entities]
+
+
+class TestComposition(unittest.TestCase):
+
+    def setUp(self):
+        self.dungeon = dungeon.Dungeon(GameStateStub())
+
+    def tearDown(self):
+        dungeon.shutdown_worker_pool()
+
+    def generate_in_process(self, depth):
+        return dungeon._generate_dungeon_level_with_seed(depth, self.dungeon._level_seeds[depth], None,
+                                                         self.dungeon._is_last_depth(depth))
+
+    def test_pregenerated_level_is_the_level_generated_in_process(self):
+        self.dungeon._pregenerate_dungeon_level(2)
+        self.dungeon._pregenerated_levels[2].wait()
+        pregenerated_level = self.dungeon.get_dungeon_level(2)
+        self.assertTrue(pregenerated_level.dungeon is self.dungeon)
+        self.assertEqual(levelsnapshot.dumps(pregenerated_level), levelsnapshot.dumps(self.generate_in_process(2)))
+
+    def test_broken_pregenerated_snapshot_falls_back_to_generating(self):
+        broken_snapshot = dungeon._get_worker_pool().apply_async(str, ("not a level snapshot",))
+        broken_snapshot.wait()
+        self.dungeon._pregenerated_levels[1] = broken_snapshot
+        dungeon_level = self.dungeon.get_dungeon_level(1)
+        self.assertEqual(levelsnapshot.dumps(dungeon_level), levelsnapshot.dumps(self.generate_in_process(1)))
+
+    def test_jericho_is_on_the_last_depth_only(self):
+        self.assertTrue(self.dungeon._is_last_depth(9))
+        self.assertEqual(templates_of_entities(self.generate_in_process(9)).count("new_jericho"), 1)
+        self.assertFalse("new_jericho" in templates_of_entities(self.generate_in_process(8)))
+
+    def test_levels_generated_all_at_once_are_the_levels_generated_in_process(self):
+        self.dungeon.level_count = 3
+        self.dungeon.generate_all_dungeon_levels(processes=2)
+        for depth in range(1, 3):
+            self.assertEqual(levelsnapshot.dumps(self.dungeon.get_dungeon_level(depth)),
+                             levelsnapshot.dumps(self.generate_in_process(depth)))
+        self.assertTrue("new_jericho" in templates_of_entities(self.dungeon.get_dungeon_level(2)))
+
+    def test_nothing_is_pregenerated_past_the_last_depth(self):
+        self.dungeon.level_count = 2
+        self.dungeon.get_dungeon_level(1)
+        self.assertEqual(self.dungeon._pregenerated_levels, {})
+
+    def test_shut_down_worker_pool_is_started_anew(self):
+        worker_pool = dungeon._get_worker_pool()
+        dungeon.shutdown_worker_pool()
+        self.assertFalse(dungeon._get_worker_pool() is worker_pool)
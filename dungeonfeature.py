@@ -18,8 +18,9 @@ import colors
 import icon
 
 
-def set_dungeon_feature_components(dungeon_feature):
+def set_dungeon_feature_components(dungeon_feature, template_id):
     dungeon_feature.set_child(DataPoint(DataTypes.GAME_PIECE_TYPE, GamePieceTypes.DUNGEON_FEATURE))
+    dungeon_feature.set_child(DataPoint(DataTypes.TEMPLATE_ID, template_id))
     dungeon_feature.set_child(Position())
     dungeon_feature.set_child(DungeonLevel())
     dungeon_feature.set_child(GraphicChar(None, colors.RED, icon.FOUNTAIN_FULL))
@@ -33,7 +34,7 @@ def new_stairs_down():
     Stairs Down allows the player to descend to the next level.
     """
     stairs = Composite()
-    set_dungeon_feature_components(stairs)
+    set_dungeon_feature_components(stairs, "new_stairs_down")
     stairs.set_child(Description("Stairs Down",
                                  ("A dark pass way downward.",
                                   "what horrors awaits there?")))
@@ -48,7 +49,7 @@ def new_stairs_up():
     Stairs up allows the player to ascend to the next level.
     """
     stairs = Composite()
-    set_dungeon_feature_components(stairs)
+    set_dungeon_feature_components(stairs, "new_stairs_up")
     stairs.set_child(Description("Stairs Up",
                                  ("A way back, when the ",
                                   "nightmare becomes too real.")))
@@ -62,7 +63,7 @@ def new_spider_web():
     Spider web the player or other entities can get caught in.
     """
     web = Composite()
-    set_dungeon_feature_components(web)
+    set_dungeon_feature_components(web, "new_spider_web")
     web.set_child(Description("Spider Web",
                               "A spider made this web, touch it and you might get stuck"))
     web.set_child(GraphicChar(None, colors.WHITE, icon.SPIDER+2))
@@ -108,7 +109,7 @@ def new_fountain():
     Drinking from the fountain makes the player stronger.
     """
     fountain = Composite()
-    set_dungeon_feature_components(fountain)
+    set_dungeon_feature_components(fountain, "new_fountain")
     fountain.set_child(Description("Fountain",
                                    ("A Fountain full of clean water",
                                     "surely you will become more",
@@ -136,6 +137,7 @@ class DrinkFromFountainAction(action.Action):
     def _dry_up_fountain(self):
         self.parent.graphic_char.icon = icon.FOUNTAIN_EMPTY
         self.parent.graphic_char.color_fg = colors.GRAY_D
+        self.parent.dungeon_level.value.get_tile(self.parent.position.value).signal_content_changed()
         self.parent.remove_component(self)
 
 
@@ -144,7 +146,7 @@ def new_blood_fountain():
     Drinking from the fountain makes the player stronger.
     """
     fountain = Composite()
-    set_dungeon_feature_components(fountain)
+    set_dungeon_feature_components(fountain, "new_blood_fountain")
     fountain.set_child(Description("Fountain Of Sacrifice",
                                    ("The fountain is filled thick red liquid.",
                                     "You have a feeling that it calls out for you.")))
@@ -218,7 +220,7 @@ class UpdateDungeonMaskWhenRemoved(AfterRemoveEffect):
 
 def new_plant():
     plant = Composite()
-    set_dungeon_feature_components(plant)
+    set_dungeon_feature_components(plant, "new_plant")
     plant.set_child(GraphicChar(None, colors.GREEN_D, icon.PLANT))
     plant.set_child(Flag("is_opaque"))
     plant.set_child(Flag(Flags.FLAMMABLE))
@@ -4,12 +4,26 @@ import random
 import terrain
 import rng
 import graph
+import roomgraph
 import direction
 import dungeonlevel
 import dungeonfeature
 import shapegenerator
+from shapemask import ShapeMask
 import geometry as geo
+import terrainlayer
 import tile
+from tilechunk import ChunkedTileMatrix
+from tools import StageTimer
+
+# Bump when a change makes the same seed generate a different level, cached levels depend on it.
+GENERATOR_VERSION = 4
+
+# Corridors added to the spanning tree of the rooms, to give the level loops.
+EXTRA_CORRIDORS_PER_ROOM = 0.25
+
+# Time spent in each stage of level generation, for benchmarks.
+stage_timer = StageTimer()
 
 
 def place_up_down_stairs_at_center(dungeon_level):
@@ -31,12 +45,13 @@ def _place_feature_replace_terrain_with_floor(feature, dungeon_level, position):
 
 
 def get_full_of_terrain_dungeon(terrain_class, width, height, depth):
-    dungeon = get_empty_dungeon(width, height, depth)
-    for y in range(height):
-        for x in range(width):
-            wall = terrain_class()
-            wall.mover.try_move((x, y), dungeon)
-    return dungeon
+    """
+    Creates a dungeon level filled with terrain_class.
+
+    The terrain is created lazily one chunk at a time as the chunks are touched.
+    """
+    tile_matrix = ChunkedTileMatrix(width, height, tile.new_sentinel_tile(terrain_class), terrain_class)
+    return dungeonlevel.DungeonLevel(tile_matrix, depth)
 
 
 def get_full_wall_dungeon(width, height, depth):
@@ -44,7 +59,8 @@ def get_full_wall_dungeon(width, height, depth):
 
 
 def get_empty_tile_matrix(width, height):
-    return [[tile.Tile() for x in range(width)] for y in range(height)]
+    return ChunkedTileMatrix.from_rows([[tile.Tile() for x in range(width)] for y in range(height)],
+                                       tile.unknown_tile)
 
 
 def get_empty_dungeon(width, height, depth):
@@ -56,7 +72,7 @@ def is_solid_ratio(dungeon_level):
     solid = 0
     for y in range(dungeon_level.height):
         for x in range(dungeon_level.width):
-            tile = dungeon_level.get_tile((x, y))
+            tile = dungeon_level.get_tile_or_unknown((x, y))
             if tile.get_terrain().has("is_solid"):
                 solid += 1
     result = float(solid) / float(dungeon_level.width * dungeon_level.height)
@@ -134,30 +150,12 @@ def dig_out_rect(rect, dungeon_level):
 
 
 def cellular_automata(dungeon_level):
-    for y in range(dungeon_level.height):
-        for x in range(dungeon_level.width):
-            position = (x, y)
-            neighbors = [geo.add_2d(position, direction_)
-                         for direction_ in direction.DIRECTIONS]
-
-            solid_neighbors = 0
-            for point in neighbors:
-                if (not dungeon_level.has_tile(point) or
-                        dungeon_level.get_tile(point).get_terrain().has("is_solid")):
-                    solid_neighbors += 1
-            _apply_cellular_automata_rule_on_tile(dungeon_level, position,
-                                                  solid_neighbors)
-
-
-def _apply_cellular_automata_rule_on_tile(dungeon_level, position,
-                                          number_of_solid_neighbors):
-    this_terrain = dungeon_level.get_tile(position).get_terrain()
-    solid_neighborhood_size = \
-        number_of_solid_neighbors + (1 if this_terrain.has("is_solid") else 0)
-    if solid_neighborhood_size >= 5:
-        terrain.Wall().mover.replace_move(position, dungeon_level)
-    else:
-        terrain.Floor().mover.replace_move(position, dungeon_level)
+    layer = terrainlayer.TerrainLayer.from_dungeon_level(dungeon_level)
+    next_layer = layer.cellular_automata_step()
+    for index, kind in enumerate(next_layer.kinds):
+        if kind != layer.kinds[index]:
+            position = (index % layer.width, index / layer.width)
+            terrainlayer.TERRAIN_KINDS[kind]().mover.replace_move(position, dungeon_level)
 
 
 def generate_dungeon_floor(open_area, depth):
@@ -171,7 +169,12 @@ def generate_dungeon_floor(open_area, depth):
         return generate_dungeon_exploded_rooms(depth, rooms, room_area, 0.5)
 
 
-def generate_dungeon_exploded_rooms(depth, rooms, room_area, rectangle_room_chance):
+def generate_dungeon_exploded_rooms(depth, rooms, room_area, rectangle_room_chance, spanning_tree_corridors=False):
+    """
+    Generates a level of rooms joined by corridors. The corridors are random until all rooms are
+    connected, or with spanning_tree_corridors the shortest tree joining the rooms plus a few more.
+    """
+    stage_timer.start()
     aprox_room_radius = math.sqrt(room_area) * 1.2
 
     room_distance = aprox_room_radius
@@ -182,22 +185,23 @@ def generate_dungeon_exploded_rooms(depth, rooms, room_area, rectangle_room_chan
 
     room_positions = random.sample(triangle_points, rooms)
     minor_room_positions = set()
-    room_graph = graph.Graph()
-    corridors_points = set()
-    for room_position in room_positions:
-        room_graph.add_point(room_position)
-    while not room_graph.is_connected():
-        edge = random.sample(room_positions, 2)
-        while room_graph.has_edge(edge[0], edge[1]):
-            edge = random.sample(room_positions, 2)
-        room_graph.add_edge(edge[0], edge[1])
+    portal_graph = roomgraph.RoomGraph()
+    corridors = ShapeMask.from_points([])
+    if spanning_tree_corridors:
+        corridor_edges = _get_spanning_tree_corridor_edges(room_positions)
+    else:
+        corridor_edges = _get_random_corridor_edges(room_positions)
+    for edge in corridor_edges:
         mid_point = random.sample(shapegenerator.get_opposite_rectangle_corners(edge[0], edge[1]), 1)[0]
         minor_room_positions.add(mid_point)
-        corridor = shapegenerator.three_point_rectangle_draw(edge[0], mid_point, edge[1])
-        corridors_points.update(corridor)
+        portal_graph.add_edge(edge[0], mid_point)
+        portal_graph.add_edge(mid_point, edge[1])
+        corridors = corridors.union(ShapeMask.from_rectangle(edge[0], mid_point))
+        corridors = corridors.union(ShapeMask.from_rectangle(mid_point, edge[1]))
+    stage_timer.lap("room_layout")
 
     #  Corridor and small corner room shape generation
-    open_points = corridors_points
+    open_points = set()
     used_roms_positions = []
     for position in room_positions:
         if random.random() > rectangle_room_chance:
@@ -211,10 +215,9 @@ def generate_dungeon_exploded_rooms(depth, rooms, room_area, rectangle_room_chan
     for position in minor_room_positions:
         room_points = shapegenerator.random_explosion(position, room_area / 4, direction.AXIS_DIRECTIONS)
         open_points.update(room_points)
-    open_points = shapegenerator.smooth_shape(open_points)
-    open_points = shapegenerator.smooth_shape(open_points)
+    open_shape = corridors.union(ShapeMask.from_points(open_points))
 
-    possible_door_points = set()
+    possible_door_shape = ShapeMask.from_points([])
     for position in set(room_positions) - set(used_roms_positions):
         width = random.randrange(3, 8)
         height = random.randrange(3, 8)
@@ -222,14 +225,9 @@ def generate_dungeon_exploded_rooms(depth, rooms, room_area, rectangle_room_chan
         offset_y = random.randrange(height)
         top_left_corner = geo.sub_2d(position, (offset_x, offset_y))
         bottom_right_corner = geo.add_2d(top_left_corner, (width, height))
-        room_points = shapegenerator.get_rectangle_shape(top_left_corner, bottom_right_corner)
-        surrounding_points = shapegenerator.get_rectangle_shape(geo.sub_2d(top_left_corner, (1, 1)),
-                                                                geo.add_2d(bottom_right_corner, (1, 1))) - room_points
-        open_points.update(room_points)
-        possible_door_points |= surrounding_points
-
-    # Redraw corridors to make sure no dead rooms appear.
-    open_points.update(corridors_points)
+        room_shape = ShapeMask.from_rectangle(top_left_corner, bottom_right_corner)
+        open_shape = open_shape.union(room_shape)
+        possible_door_shape = possible_door_shape.union(room_shape.dilate().difference(room_shape))
 
     plant_points = set()
     if rng.coin_flip() or rng.coin_flip():
@@ -252,44 +250,84 @@ def generate_dungeon_exploded_rooms(depth, rooms, room_area, rectangle_room_chan
                              random.randrange(room_y - variance, room_y + variance))
         chasm_points.update(shapegenerator.random_explosion(chasm_start_point,
                                                             room_area * 0.8, direction.AXIS_DIRECTIONS))
-    chasm_points = shapegenerator.smooth_shape(chasm_points)
-    chasm_points = shapegenerator.smooth_shape(chasm_points)
+    stage_timer.lap("shapes")
+    chasm_shape = ShapeMask.from_points(chasm_points).smooth().smooth()
+    stage_timer.lap("smoothing")
 
     # Normalize Points to dungeon
     frame = (2, 2)  # Just to be safe we won't try to draw outside Dungeon.
-    level_shape = shapegenerator.Shape(open_points)
-    plant_shape = shapegenerator.Shape(plant_points)
-    chasm_shape = shapegenerator.Shape(chasm_points)
-    possible_door_shape = shapegenerator.Shape(possible_door_points)
-    dungeon_rect = shapegenerator.Shape(open_points | chasm_points).calc_rect()
+    dungeon_rect = open_shape.union(chasm_shape).calc_rect()
     dungeon_rect_with_frame = dungeon_rect.expanded_by(frame)
-    normalized_chasm_points = chasm_shape.offset_points(geo.sub_2d(frame, dungeon_rect.top_left))
-    normalized_plant_points = plant_shape.offset_points(geo.sub_2d(frame, dungeon_rect.top_left))
-    normalized_possible_door_points = possible_door_shape.offset_points(geo.sub_2d(frame, dungeon_rect.top_left))
-    normalized_open_points = level_shape.offset_points(geo.sub_2d(frame, dungeon_rect.top_left))
-
-    # Apply shapes to dungeon
-    dungeon_level = get_full_wall_dungeon(dungeon_rect_with_frame.width, dungeon_rect_with_frame.height, depth)
-
-    brush = SinglePointBrush(ReplaceComponent(terrain.Chasm))
-    apply_brush_to_points(dungeon_level, normalized_chasm_points, brush)
+    normalize_offset = geo.sub_2d(frame, dungeon_rect.top_left)
+    normalized_chasm_points = chasm_shape.offset(normalize_offset).points()
+    normalized_plant_points = ShapeMask.from_points(plant_points).offset(normalize_offset).points()
+    normalized_possible_door_points = possible_door_shape.offset(normalize_offset).points()
+    normalized_open_points = open_shape.offset(normalize_offset).points()
+    stage_timer.lap("shapes")
+
+    # Apply shapes to the terrain layer, the tiles are created once it is done.
+    layer = terrainlayer.TerrainLayer(dungeon_rect_with_frame.width, dungeon_rect_with_frame.height)
+    layer.fill(normalized_chasm_points, terrainlayer.CHASM)
+    layer.fill(normalized_open_points, terrainlayer.FLOOR)
+    stage_timer.lap("brushes")
+
+    for point in normalized_possible_door_points:
+        if layer.is_suitable_for_door(point):
+            layer.fill([point], terrainlayer.DOOR)
+    plant_positions = [point for point in normalized_plant_points if layer.get(point) == terrainlayer.FLOOR]
+    stage_timer.lap("doors")
+
+    up_position, down_position, fountain_position, blood_fountain_position = \
+        random.sample(normalized_open_points, 4)
+    features = [(dungeonfeature.new_stairs_down(), down_position),
+                (dungeonfeature.new_stairs_up(), up_position),
+                (dungeonfeature.new_fountain(), fountain_position)]
+    if rng.coin_flip():
+        features.append((dungeonfeature.new_blood_fountain(), blood_fountain_position))
+    layer.fill([position for _, position in features], terrainlayer.FLOOR)
 
-    brush = SinglePointBrush(ReplaceComponent(terrain.Floor))
-    apply_brush_to_points(dungeon_level, normalized_open_points, brush)
+    dungeon_level = layer.new_dungeon_level(depth)
+    dungeon_level.room_graph = portal_graph.offset(normalize_offset)
+    stage_timer.lap("materialise")
 
-    brush = SinglePointBrush(ReplaceComponent(dungeonfeature.new_plant))
-    apply_brush_to_terrains_with_flag(dungeon_level, normalized_plant_points, brush, terrain.Floor.FLOOR_FLAG)
+    for position in plant_positions:
+        dungeonfeature.new_plant().mover.replace_move(position, dungeon_level)
+    for feature, position in features:
+        feature.mover.replace_move(position, dungeon_level)
+    stage_timer.lap("features")
 
-    door_brush = DoorIfSuitableBrush()
-    apply_brush_to_points(dungeon_level, normalized_possible_door_points, door_brush)
+    return dungeon_level
 
-    feature_positions = random.sample(normalized_open_points, 4)
-    place_up_down_stairs(dungeon_level, feature_positions[0], feature_positions[1])
-    _place_feature_replace_terrain_with_floor(dungeonfeature.new_fountain(), dungeon_level, feature_positions[2])
-    if rng.coin_flip():
-        _place_feature_replace_terrain_with_floor(dungeonfeature.new_blood_fountain(), dungeon_level, feature_positions[3])
 
-    return dungeon_level
+def _get_random_corridor_edges(room_positions):
+    """
+    Yields random new edges between rooms until all rooms are connected.
+    """
+    room_graph = graph.Graph()
+    for room_position in room_positions:
+        room_graph.add_point(room_position)
+    while not room_graph.is_connected():
+        edge = random.sample(room_positions, 2)
+        while room_graph.has_edge(edge[0], edge[1]):
+            edge = random.sample(room_positions, 2)
+        room_graph.add_edge(edge[0], edge[1])
+        yield edge
+
+
+def _get_spanning_tree_corridor_edges(room_positions):
+    """
+    Gets the edges of the shortest tree joining the rooms and some of the shortest other edges,
+    so the level has a few loops.
+    """
+    edges = graph.minimum_spanning_tree_edges(room_positions, geo.distance)
+    tree_edges = set(frozenset(edge) for edge in edges)
+    other_edges = sorted((geo.distance(point1, point2), point1, point2)
+                         for index, point1 in enumerate(room_positions)
+                         for point2 in room_positions[index + 1:]
+                         if not frozenset([point1, point2]) in tree_edges)
+    extra_corridors = int(len(room_positions) * EXTRA_CORRIDORS_PER_ROOM)
+    candidates = [(point1, point2) for _, point1, point2 in other_edges[:extra_corridors * 3]]
+    return edges + random.sample(candidates, min(extra_corridors, len(candidates)))
 
 
 def apply_brush_to_points(dungeon_level, points, brush):
@@ -1,32 +1,41 @@
 import random
 import direction
 import actionscheduler
-import libtcodpy
+import mapbackend
 import turn
-import util
 import geometry as geo
 import constants
+import graphic
+from levelmap import LevelMap
 import tile
 
 
 class DungeonLevel(object):
     def __init__(self, tile_matrix, depth):
-        self.width = len(tile_matrix[0])
-        self.height = len(tile_matrix)
-        self._dungeon_level_screen = DungeonLevelScreen(self)
+        """
+        Args:
+            tile_matrix (ChunkedTileMatrix): The tiles of the level.
+            depth (int): The depth of the level in the dungeon.
+        """
+        self.width = tile_matrix.width
+        self.height = tile_matrix.height
         self.tile_matrix = tile_matrix
+        self._dungeon_level_screen = DungeonLevelScreen(self)
         self.depth = depth
         self.actor_scheduler = actionscheduler.ActionScheduler()
         self.dungeon_features = []
         self.dungeon = None
         self.terrain_changed_timestamp = 0
-
-        self._walkable_destinations = util.WalkableDestinatinationsPath()
+        self.room_graph = None
+        self.level_map = LevelMap(self)
+        self.spawn_pool = None
 
     # TODO: Ugly Hack for improving save time. Improve this please.
     def __getstate__(self):
         print "dungeon level get"
-        return dict(self.__dict__)
+        state = dict(self.__dict__)
+        state["spawn_pool"] = None
+        return state
         if len(self.entities) == 0:
             return dict(self.__dict__)
         if any(entity.has("is_player") for entity in self.entities):
@@ -102,35 +111,87 @@ class DungeonLevel(object):
         return self.actor_scheduler.register(actor)
 
     def _remove_actor(self, actor):
+        self.level_map.remove_observer(actor)
         return self.actor_scheduler.release(actor)
 
     def has_tile(self, position):
         x, y = position
-        return (0 <= y < len(self.tile_matrix) and
-                0 <= x < len(self.tile_matrix[0]))
+        return self.tile_matrix.has(x, y)
 
     def get_tile(self, position):
+        """
+        Gets the tile at position, materialises its chunk if it is untouched.
+
+        Use this when the tile might be modified,
+        get_tile_or_unknown is enough for looking at the tile.
+        """
         x, y = position
-        return self.tile_matrix[y][x]
+        the_tile = self.tile_matrix.get(x, y)
+        if the_tile is None:
+            self._materialise_chunk_at(position)
+            the_tile = self.tile_matrix.get(x, y)
+        return the_tile
+
+    def _materialise_chunk_at(self, position):
+        x, y = position
+        terrain_factory = self.tile_matrix.terrain_factory
+        if terrain_factory is None:
+            self.tile_matrix.materialise_chunk(x, y, lambda: self.tile_matrix.sentinel_tile)
+            return
+        for chunk_position in self.tile_matrix.materialise_chunk(x, y, tile.Tile):
+            self.put_terrain_on_new_tile(terrain_factory(), chunk_position)
+
+    def put_terrain_on_new_tile(self, new_terrain, position):
+        """
+        Puts terrain on a tile that was just materialised and holds nothing yet.
+
+        Nothing is checked, the tile is known to be free and terrain
+        moving in does not change the level map, so no mover is needed.
+        """
+        x, y = position
+        self.tile_matrix.get(x, y).add(new_terrain)
+        new_terrain.position.value = position
+        new_terrain.dungeon_level.value = self
 
     def get_tile_or_unknown(self, position):
         return get_tile_or_unknown(position, self.tile_matrix)
 
+    def get_untouched_tile(self):
+        """
+        Gets the tile every position outside of the touched chunks reads as.
+        """
+        if self.tile_matrix.sentinel_tile is None:
+            return tile.unknown_tile
+        return self.tile_matrix.sentinel_tile
+
+    def get_seen_tile(self, position):
+        """
+        Gets the tile at position for someone seeing it, unknown if it is outside the level.
+
+        Seen tiles are materialised, so they are drawn and remembered with their real surroundings.
+        """
+        if self.has_tile(position):
+            return self.get_tile(position)
+        return tile.unknown_tile
+
     def get_tiles_surrounding_position(self, position):
         return [self.get_tile_or_unknown(geo.add_2d(offset, position))
                 for offset in direction.AXIS_DIRECTIONS]
 
     def tick(self, time):
+        self.level_map.flush_fov_requests()
         self.actor_scheduler.tick(time)
 
     def signal_terrain_changed(self, point):
         self.terrain_changed_timestamp = turn.current_turn
+        self.get_tile(point).signal_content_changed()
+        self.level_map.update_point(point)
         entities = [entity for entity in self.entities if entity.has("dungeon_mask")]
         for entity in entities:
             entity.dungeon_mask.signal_dirty_point(point)
 
     def print_dungeon(self):
-        for y, row in enumerate(self.tile_matrix):
+        for y, row in enumerate(self.tile_matrix.rows()):
             line = ""
             for x, tile in enumerate(row):
                 if not tile.get_terrain():
@@ -146,7 +207,11 @@ class DungeonLevel(object):
             print(line)
 
     def get_walkable_positions(self, entity, position):
-        return self._walkable_destinations.get_walkable_positions(entity, position, self)
+        """
+        Gets the positions entity could walk to from position, the list must not be modified.
+        """
+        regions = self.level_map.get_regions(entity.mover.terrain_signature())
+        return regions.get_region_positions(position)
 
     def get_random_walkable_position_in_dungeon(self, entity):
         return random.choice(self.get_random_walkable_positions_in_dungeon(entity))
@@ -175,7 +240,7 @@ class DungeonLevelScreen(object):
         self.dungeon_level = dungeon_level
         self.height = max(constants.GAME_STATE_HEIGHT, self.dungeon_level.height)
         self.width = max(constants.GAME_STATE_WIDTH, self.dungeon_level.width)
-        self.console = libtcodpy.console_new(self.width, self.height)
+        self.console = mapbackend.get_backend().new_console(self.width, self.height)
 
     def __getstate__(self):
         state = dict(self.__dict__)
@@ -186,7 +251,7 @@ class DungeonLevelScreen(object):
 
     def __setstate__(self, state):
         self.__dict__.update(state)
-        self.console = libtcodpy.console_new(self.width, self.height)
+        self.console = mapbackend.get_backend().new_console(self.width, self.height)
 
     def draw_everything(self, camera, tile_matrix):
         for y in range(self.height):
@@ -201,12 +266,14 @@ class DungeonLevelScreen(object):
         y_end = min(self.height, rectangle.bottom)
         x_start = max(0, rectangle.left)
         x_end = min(self.width, rectangle.right)
+        entity.memory_map.update_memory_from_fov(self.dungeon_level)
         for y in range(y_start, y_end):
             for x in range(x_start, x_end):
                 position = (x, y)
                 self._draw_tile(position, tile_matrix, entity)
 
     def redraw_screen_as_seen_by_entity(self, tile_matrix, entity):
+        entity.memory_map.update_memory_from_fov(self.dungeon_level)
         for y in range(self.height):
             for x in range(self.width):
                 position = (x, y)
@@ -214,33 +281,27 @@ class DungeonLevelScreen(object):
 
     def _draw_tile(self, position, tile_matrix, entity):
         if entity.dungeon_mask.can_see_point(position):
-            the_tile = get_tile_or_unknown(position, tile_matrix)
-            entity.memory_map.update_memory_of_tile(the_tile, position, self.dungeon_level.depth)
-            entity.memory_map.tile_seen(position)
+            the_tile = self.dungeon_level.get_seen_tile(position)
             the_tile.draw_seen(self.console, position)
         else:
-            memory_tile = entity.memory_map.get_memory_of_map(self.dungeon_level).get_tile_or_unknown(position)
+            icon = entity.memory_map.get_remembered_icon(position, self.dungeon_level.depth)
             if entity.memory_map.has_seen_position(position):
-                memory_tile.draw_unseen(self.console, position)
+                graphic.draw_unseen_icon_to_console(position, icon, self.console)
             else:
-                memory_tile.draw_unvisited(self.console, position)
+                graphic.draw_unvisited_icon_to_console(position, icon, self.console)
             real_tile = get_tile_or_unknown(position, tile_matrix)
             real_tile.get_top_pieces()[0].char_printer.clear_animation()
 
     def blit(self, source_position):
-        src_x, src_y = source_position
-        libtcodpy.console_blit(self.console, src_x, src_y, constants.GAME_STATE_WIDTH,
-                               constants.GAME_STATE_HEIGHT, 0, 0, 0)
+        mapbackend.get_backend().blit_console(self.console, source_position,
+                                              constants.GAME_STATE_WIDTH, constants.GAME_STATE_HEIGHT)
 
     def clear(self):
-        libtcodpy.console_clear(self.console)
+        mapbackend.get_backend().clear_console(self.console)
 
 
 def get_tile_or_unknown(position, tile_matrix):
     x, y = position
-    if x < 0 or y < 0:
-        return tile.unknown_tile
-    try:
-        return tile_matrix[y][x]
-    except IndexError:
+    if not tile_matrix.has(x, y):
         return tile.unknown_tile
+    return tile_matrix.peek(x, y)
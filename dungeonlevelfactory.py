@@ -3,21 +3,14 @@ import dungeonfeature
 import terrain
 import tile
 from dungeonlevel import DungeonLevel
+from tilechunk import ChunkedTileMatrix
 
 
 def get_empty_tile_matrix(width, height):
-    return [[tile.Tile()
-             for x in range(width)]
-            for y in range(height)]
-
-
-def unknown_level_map(width, height, depth):
-    tile_matrix = get_empty_tile_matrix(width, height)
-    dungeon_level = DungeonLevel(tile_matrix, depth)
-    for x in range(width):
-        for y in range(height):
-            tile_matrix[y][x] = tile.unknown_tile
-    return dungeon_level
+    return ChunkedTileMatrix.from_rows([[tile.Tile()
+                                         for x in range(width)]
+                                        for y in range(height)],
+                                       tile.unknown_tile)
 
 
 def dungeon_level_from_lines(lines):
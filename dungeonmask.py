@@ -6,60 +6,58 @@ from console import console
 import direction
 import geometry
 import icon
-import libtcodpy as libtcod
+import pathfinding
 import turn
 
+# How many steps ahead a repaired path rejoins the old one.
+REPAIR_WINDOW = 8
+
 
 class DungeonMask(Leaf):
     """
-    Holds the visibility mask and solidity mask of the entity
+    Holds the field of vision of the entity.
+
+    Transparency and walkability are not held here but shared by all
+    entities on the dungeon level through its LevelMap.
     """
 
     def __init__(self):
         super(DungeonMask, self).__init__()
-        self._dungeon_map = None
-        self.dungeon_map_needs_total_update = True
         self.last_sight_radius = -1
         self.component_type = "dungeon_mask"
-        self._dirty_point_list = []
-
-    @property
-    def dungeon_map(self):
-        if self._dungeon_map is None:
-            self.init_dungeon_map_if_has_dungeon_level()
-        return self._dungeon_map
-
-    @dungeon_map.setter
-    def dungeon_map(self, value):
-        self._dungeon_map = value
-
-    def __getstate__(self):
-        state = dict(self.__dict__)
-        del state["_dungeon_map"]
-        return state
+        self.fov_needs_update = True
+        self._fov_origin = None
+        self._fov_radius = -1
+        self._fov = bytearray()
+        self._requested_from = None
 
     def __setstate__(self, state):
         self.__dict__.update(state)
-        self.dungeon_map_needs_total_update = True
-        self.dungeon_map = None
+        self.fov_needs_update = True
+        self._requested_from = None
 
-    def init_dungeon_map_if_has_dungeon_level(self):
+    @property
+    def dungeon_map(self):
         """
-        Initiates the dungeon map of a dungeon_level, if available.
+        Gets the shared path map of the dungeon level for movers like the parent.
         """
-        if self.has_sibling("dungeon_level") and not self.parent.dungeon_level.value is None:
-            self._init_dungeon_map()
-            self.dungeon_map_needs_total_update = True
+        level_map = self._get_level_map()
+        if level_map is None:
+            return None
+        return level_map.get_map(self.parent.mover.terrain_signature())
 
-    def _init_dungeon_map(self):
-        """
-        Initiates the dungeon map of a dungeon_level.
-        """
-        self.dungeon_map = libtcod.map_new(self.parent.dungeon_level.value.width,
-                                           self.parent.dungeon_level.value.height)
+    def _get_level_map(self):
+        if not self.has_sibling("dungeon_level") or self.parent.dungeon_level.value is None:
+            return None
+        return self.parent.dungeon_level.value.level_map
 
     def signal_dirty_point(self, point):
-        self._dirty_point_list.append(point)
+        """
+        Marks the field of vision as old if the changed point is within it.
+        """
+        if (not self._fov_origin is None and
+                geometry.chess_distance(point, self._fov_origin) <= self._fov_radius):
+            self.fov_needs_update = True
 
     def can_see_point(self, point):
         """
@@ -68,8 +66,28 @@ class DungeonMask(Leaf):
         Args:
             point (int, int): The point to check.
         """
-        x, y = point
-        return libtcod.map_is_in_fov(self.dungeon_map, x, y)
+        self._flush_requested_fov()
+        if self._fov_origin is None:
+            return False
+        window_size = 2 * self._fov_radius + 1
+        window_x = point[0] - self._fov_origin[0] + self._fov_radius
+        window_y = point[1] - self._fov_origin[1] + self._fov_radius
+        if not (0 <= window_x < window_size and 0 <= window_y < window_size):
+            return False
+        index = window_y * window_size + window_x
+        return (self._fov[index >> 3] >> (index & 7)) & 1 == 1
+
+    def get_fov_window(self):
+        """
+        Gets the origin, radius and visibility bits of the current Field of Vision.
+        """
+        self._flush_requested_fov()
+        return self._fov_origin, self._fov_radius, self._fov
+
+    def _flush_requested_fov(self):
+        if not self._requested_from is None:
+            self._requested_from.flush_fov_requests()
+            self._requested_from = None
 
     def on_tick(self, _):
         sight_radius = self.parent.sight_radius.value
@@ -78,96 +96,82 @@ class DungeonMask(Leaf):
 
     def update_fov(self):
         """
-        Calculates the Field of Vision from the dungeon_map.
+        Requests the Field of Vision from the shared map of the dungeon level.
+
+        The request is computed in a batch with the requests of the other entities,
+        at the latest when this entity asks what it can see.
         """
-        x, y = self.parent.position.value
+        level_map = self._get_level_map()
+        if level_map is None:
+            return
         sight_radius = self.parent.sight_radius.value
-        libtcod.map_compute_fov(self.dungeon_map, x, y,
-                                sight_radius, True)
+        level_map.request_fov(self.parent, self.parent.position.value, sight_radius)
+        self._requested_from = level_map
         self.last_sight_radius = sight_radius
+        self.fov_needs_update = False
+
+    def set_fov(self, origin, radius, fov):
+        """
+        Sets the computed Field of Vision, visibility bits as given by LevelMap.get_fov.
+        """
+        self._fov = fov
+        self._fov_origin = origin
+        self._fov_radius = radius
 
     def print_walkable_map(self):
         """
         Prints a map of where this entity is allowed to walk.
         """
-        for y in range(libtcod.map_get_height(self.dungeon_map)):
-            line = ""
-            for x in range(libtcod.map_get_width(self.dungeon_map)):
-                if libtcod.map_is_walkable(self.dungeon_map, x, y):
-                    line += " "
-                else:
-                    line += "#"
-            print(line)
+        level_map = self._get_level_map()
+        walkable = level_map.get_walkable(self.parent.mover.terrain_signature())
+        self._print_layer(walkable, level_map.width, level_map.height)
 
     def print_is_transparent_map(self):
         """
         Prints a map of what this entity can see through.
         """
-        for y in range(libtcod.map_get_height(self.dungeon_map)):
+        level_map = self._get_level_map()
+        self._print_layer(level_map.transparent, level_map.width, level_map.height)
+
+    def print_visible_map(self):
+        """
+        Prints a map of what this entity sees right now.
+        """
+        level_map = self._get_level_map()
+        for y in range(level_map.height):
             line = ""
-            for x in range(libtcod.map_get_width(self.dungeon_map)):
-                if libtcod.map_is_transparent(self.dungeon_map, x, y):
+            for x in range(level_map.width):
+                if self.can_see_point((x, y)):
                     line += " "
                 else:
                     line += "#"
             print(line)
 
-    def print_visible_map(self):
-        """
-        Prints a map of what this entity sees right now.
-        """
-        for y in range(libtcod.map_get_height(self.dungeon_map)):
+    def _print_layer(self, layer, width, height):
+        for y in range(height):
             line = ""
-            for x in range(libtcod.map_get_width(self.dungeon_map)):
-                if libtcod.map_is_in_fov(self.dungeon_map, x, y):
+            for x in range(width):
+                if layer[y * width + x]:
                     line += " "
                 else:
                     line += "#"
             print(line)
 
     def before_tick(self, time):
-        self.update_dungeon_map_if_its_old()
+        self.update_fov_if_its_old()
 
-    def update_dungeon_map_if_its_old(self):
+    def update_fov_if_its_old(self):
         """
-        Updates the dungeon map it is older than the latest change.
+        Updates the field of vision if the terrain within it has changed.
         """
-        if self.dungeon_map_needs_total_update:
-            self.update_dungeon_map()
-            self.update_fov()
-        elif len(self._dirty_point_list) > 0:
-            for point in self._dirty_point_list:
-                x, y = point
-                self.update_dungeon_map_point(x, y)
-            self._dirty_point_list = []
+        if self.fov_needs_update:
             self.update_fov()
 
-    def update_dungeon_map_point(self, x, y):
-        dungeon_level = self.parent.dungeon_level.value
-        terrain = dungeon_level.get_tile_or_unknown((x, y)).get_terrain()
-        dungeon_feature = dungeon_level.get_tile_or_unknown((x, y)).get_dungeon_feature()
-        is_opaque = terrain.has("is_opaque") or (dungeon_feature and dungeon_feature.has("is_opaque"))
-        libtcod.map_set_properties(self.dungeon_map, x, y, 0 if is_opaque else 1,
-                                   self.parent.mover.can_pass_terrain(terrain))
-
-    def update_dungeon_map(self):
-        """
-        Updates the dungeon map.
-        """
-        dungeon_level = self.parent.dungeon_level.value
-        for y in range(dungeon_level.height):
-            for x in range(dungeon_level.width):
-                self.update_dungeon_map_point(x, y)
-        self.dungeon_map_needs_total_update = False
-        self._dirty_point_list = []
-
     def send_message(self, message):
         """
         Handles received messages.
         """
         if message == CompositeMessage.DUNGEON_LEVEL_CHANGED:
-            self.init_dungeon_map_if_has_dungeon_level()
-            self.update_dungeon_map()
             self.update_fov()
         if message == CompositeMessage.POSITION_CHANGED:
             self.update_fov()
@@ -176,42 +180,33 @@ class DungeonMask(Leaf):
 class Path(Leaf):
     """
     Composites holding this has a path that it may step through.
+
+    A flow field followed is shared by the level and not saved with the path,
+    the actor follows the field of the loaded level anew.
     """
 
     def __init__(self):
         super(Path, self).__init__()
-        self._path = None
         self.position_list = []
+        self.flow_field = None
+        self.destination = None
+        self.terrain_version = -1
+        self.danger_version = -1
         self.component_type = "path"
 
     def __getstate__(self):
         state = dict(self.__dict__)
-        del state["_path"]
+        state["flow_field"] = None
         return state
 
-    def __setstate__(self, state):
-        self.__dict__.update(state)
-        self._path = None
-
-    @property
-    def path(self):
-        if self._path is None:
-            self.init_path()
-        return self._path
-
-    def init_path(self):
-        """
-        Initiates the path using the dungeon map, from the DungeonMask module.
-        """
-        dungeon_map = self.parent.dungeon_mask.dungeon_map
-        self._path = libtcod.path_new_using_map(dungeon_map, 1.0)
-
     def has_path(self):
         """
         Returns True if the entity has a path to walk.
         """
         if len(self.position_list) > 0:
             return True
+        if not self.flow_field is None and self.flow_field.get_next_step(self.parent.position.value):
+            return True
         return False
 
     def try_step_path(self):
@@ -220,11 +215,53 @@ class Path(Leaf):
         """
         if not self.has_path():
             return 0
+        if not self.flow_field is None:
+            return self._try_step_flow_field()
         next_point = self.position_list.pop()
+        if next_point == self.parent.position.value and self.has_path():
+            next_point = self.position_list.pop()
         if not geometry.chess_distance(next_point, self.parent.position.value) == 1:
-            self.set_line_path(next_point)
+            self.position_list.extend(reversed(pathfinding.line(self.parent.position.value, next_point)))
             next_point = self.position_list.pop()
         energy_spent = self.parent.stepper.try_move_or_bump(next_point)
+        if energy_spent <= 0:
+            energy_spent = self.try_step_left_or_right(next_point)
+        if energy_spent <= 0 and self._try_repair(next_point):
+            energy_spent = self.parent.stepper.try_move_or_bump(self.position_list.pop())
+        if energy_spent <= 0:
+            self.clear()
+        return energy_spent
+
+    def _try_repair(self, blocked_point):
+        """
+        Replaces the start of the path with a short detour around the blocked point.
+
+        The detour rejoins the path at most REPAIR_WINDOW steps ahead,
+        the rest of the path is kept.
+        """
+        level_map = self._get_level_map()
+        if level_map is None or len(self.position_list) == 0:
+            return False
+        rejoin_index = max(0, len(self.position_list) - REPAIR_WINDOW)
+        walkable = level_map.get_walkable(self.parent.mover.terrain_signature())
+        detour = pathfinding.a_star(walkable, level_map.width, level_map.height, self.parent.position.value,
+                                    self.position_list[rejoin_index], blocked=[blocked_point])
+        if len(detour) == 0 or len(detour) > 2 * REPAIR_WINDOW:
+            return False
+        detour.reverse()
+        self.position_list = self.position_list[:rejoin_index] + detour
+        level_map.path_repairs += 1
+        return True
+
+    def _get_level_map(self):
+        dungeon_level = self.parent.dungeon_level.value
+        if dungeon_level is None:
+            return None
+        return dungeon_level.level_map
+
+    def _try_step_flow_field(self):
+        next_point = self.flow_field.get_next_step(self.parent.position.value)
+        energy_spent = self.parent.stepper.try_move_or_bump(next_point)
         if energy_spent <= 0:
             energy_spent = self.try_step_left_or_right(next_point)
             if energy_spent <= 0:
@@ -248,31 +285,74 @@ class Path(Leaf):
         return 0
 
     def compute_path(self, destination):
-        sx, sy = self.parent.position.value
-        dx, dy = destination
-        libtcod.path_compute(self.path, sx, sy, dx, dy)
+        """
+        Sets a path to destination.
+
+        The path keeps out of the tiles the stepper of the parent finds dangerous when it can.
+        The current path is kept if it leads to the same destination and no terrain
+        before the destination has become impassable or dangerous, otherwise it is computed anew.
+        """
+        level_map = self._get_level_map()
+        if level_map is None:
+            self.clear()
+            return
+        if self._is_path_to(destination, level_map):
+            return
+        self.clear()
+        path = level_map.compute_path(self.parent.mover.terrain_signature(), self.parent.position.value,
+                                      destination, self.parent.stepper.danger_signature())
+        path.reverse()
+        self.position_list = path
+        self.destination = destination
+        self.terrain_version = level_map.terrain_version
+        self.danger_version = level_map.danger_version
+        level_map.path_recomputes += 1
+
+    def _is_path_to(self, destination, level_map):
+        if (len(self.position_list) == 0 or not self.flow_field is None or
+                self.destination != destination or
+                geometry.chess_distance(self.position_list[-1], self.parent.position.value) != 1):
+            return False
+        if self.terrain_version != level_map.terrain_version:
+            walkable = level_map.get_walkable(self.parent.mover.terrain_signature())
+            for x, y in self.position_list:
+                if not walkable[y * level_map.width + x]:
+                    return False
+            self.terrain_version = level_map.terrain_version
+        danger_signature = self.parent.stepper.danger_signature()
+        if self.danger_version != level_map.danger_version and not danger_signature is None:
+            danger = level_map.get_danger(danger_signature)
+            for x, y in self.position_list[1:]:
+                if danger[y * level_map.width + x]:
+                    return False
+            self.danger_version = level_map.danger_version
+        return True
+
+    def follow_flow_field(self, flow_field):
+        """
+        Makes the path follow the flow field, each step is read from it when taken.
+        """
         self.clear()
-        x, y = libtcod.path_walk(self.path, True)
-        while not x is None:
-            self.position_list.insert(0, (x, y))
-            x, y = libtcod.path_walk(self.path, True)
+        self.flow_field = flow_field
 
     def set_line_path(self, destination):
-        sx, sy = self.parent.position.value
-        dx, dy = destination
-        libtcod.line_init(sx, sy, dx, dy)
-        self.clear()
-        x, y = libtcod.line_step()
-        while not x is None:
-            self.position_list.insert(0, (x, y))
-            x, y = libtcod.line_step()
+        path = pathfinding.line(self.parent.position.value, destination)
+        path.reverse()
+        self.position_list = path
+        self.flow_field = None
+        self.destination = destination
 
     def clear(self):
         self.position_list = []
+        self.flow_field = None
+        self.destination = None
 
     def draw(self, camera):
-        points = list(self.position_list)
-        points.reverse()
+        if self.flow_field is None:
+            points = list(self.position_list)
+            points.reverse()
+        else:
+            points = self.flow_field.get_route(self.parent.position.value)
         point = None
         for point in points:
             if not self.parent.mover.can_pass_terrain(
@@ -283,7 +363,3 @@ class Path(Leaf):
         if point:
             console.set_symbol(camera.dungeon_to_screen_position(point), "X")
             console.set_color_fg(camera.dungeon_to_screen_position(point), colors.LIGHT_ORANGE)
-
-    def send_message(self, message):
-        if message == CompositeMessage.DUNGEON_LEVEL_CHANGED:
-            self.init_path()
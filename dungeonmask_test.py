@@ -0,0 +1,98 @@
+import pickle
+import unittest
+from actor import Actor
+from compositecore import Composite
+from dungeonmask import DungeonMask
+import dungeonlevelfactory
+import flowfield
+from health import Health
+import monster
+from mover import Mover
+from position import Position, DungeonLevel
+import spawner
+from stats import GamePieceTypes, DataTypes, DataPoint
+from statusflags import StatusFlags
+
+
+def level_from_lines(lines):
+    return dungeonlevelfactory.dungeon_level_from_lines(lines)
+
+
+def new_observer():
+    entity = Composite()
+    entity.set_child(Mover())
+    entity.set_child(Position())
+    entity.set_child(DungeonLevel())
+    entity.set_child(StatusFlags())
+    entity.set_child(DataPoint(DataTypes.GAME_PIECE_TYPE, GamePieceTypes.ENTITY))
+    entity.set_child(DataPoint(DataTypes.SIGHT_RADIUS, 6))
+    entity.set_child(DungeonMask())
+    entity.set_child(Actor())
+    entity.set_child(Health(10))
+    return entity
+
+
+class TestComposition(unittest.TestCase):
+
+    def setUp(self):
+        self.dungeon_level = level_from_lines(["####################",
+                                               "#..................#",
+                                               "####################"])
+        self.observer = new_observer()
+        self.observer.mover.try_move((1, 1), self.dungeon_level)
+
+    def test_terrain_change_outside_the_view_keeps_the_view(self):
+        dungeon_mask = self.observer.dungeon_mask
+        self.assertTrue(dungeon_mask.can_see_point((2, 1)))
+        self.dungeon_level.signal_terrain_changed((15, 1))
+        self.assertFalse(dungeon_mask.fov_needs_update)
+        self.dungeon_level.signal_terrain_changed((5, 1))
+        self.assertTrue(dungeon_mask.fov_needs_update)
+
+    def test_observers_follow_the_moving_entity(self):
+        level_map = self.dungeon_level.level_map
+        self.assertTrue(self.observer in level_map.get_observers((3, 1)))
+        self.assertFalse(self.observer in level_map.get_observers((15, 1)))
+        self.observer.mover.try_move((17, 1))
+        self.assertFalse(self.observer in level_map.get_observers((3, 1)))
+        self.assertTrue(self.observer in level_map.get_observers((15, 1)))
+
+    def test_entity_leaving_the_level_observes_nothing(self):
+        level_map = self.dungeon_level.level_map
+        self.assertTrue(self.observer in level_map.get_observers((3, 1)))
+        self.observer.mover.try_remove_from_dungeon()
+        self.assertFalse(self.observer in level_map.get_observers((3, 1)))
+        self.assertFalse(self.observer in level_map.get_observers((1, 1)))
+
+    def test_identical_requests_are_computed_once(self):
+        other = new_observer()
+        other.mover.try_move((2, 1), self.dungeon_level)
+        level_map = self.dungeon_level.level_map
+        level_map.flush_fov_requests()
+        saved = level_map.fov_duplicate_requests
+        misses = level_map.fov_cache_misses
+        level_map.request_fov(self.observer, (9, 1), 2)
+        level_map.request_fov(other, (9, 1), 2)
+        level_map.flush_fov_requests()
+        self.assertEqual(level_map.fov_duplicate_requests, saved + 1)
+        self.assertEqual(level_map.fov_cache_misses, misses + 1)
+        self.assertTrue(other.dungeon_mask.can_see_point((10, 1)))
+
+    def test_newest_request_is_computed_when_the_entity_asks(self):
+        self.observer.mover.try_move((9, 1))
+        self.assertTrue(self.observer.dungeon_mask.can_see_point((14, 1)))
+        self.observer.dungeon_mask.update_fov()
+        self.dungeon_level.level_map.request_fov(self.observer, (9, 1), 1)
+        self.assertTrue(self.observer.dungeon_mask.can_see_point((10, 1)))
+        self.assertFalse(self.observer.dungeon_mask.can_see_point((14, 1)))
+
+    def test_followed_flow_field_is_not_saved(self):
+        ratman = spawner.new_from_template(monster.new_ratman, None)
+        ratman.mover.try_move((2, 1), self.dungeon_level)
+        field = self.dungeon_level.level_map.get_flow_field(flowfield.APPROACH,
+                                                            ratman.mover.terrain_signature(), (8, 1))
+        ratman.path.follow_flow_field(field)
+        self.assertTrue(ratman.path.has_path())
+        loaded_path = pickle.loads(pickle.dumps(ratman.path))
+        self.assertEqual(loaded_path.flow_field, None)
+        self.assertTrue(ratman.path.flow_field is field)
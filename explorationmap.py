@@ -0,0 +1,193 @@
+"""
+The exploration frontier of a remembered level and the distance to it.
+
+The frontier is the seen tiles next to unseen ones. It is kept up to date as tiles
+are seen, and so is the distance from every seen walkable tile to the closest
+walkable frontier tile or goal, so auto explore only has to step downhill.
+Only the tiles that were seen, changed walkability or stopped or started being
+goals since the last update are looked at again.
+"""
+from collections import deque
+import heapq
+
+from flowfield import FlowField
+
+_NEIGHBOURS = [(0, -1), (-1, 0), (1, 0), (0, 1), (-1, -1), (1, -1), (-1, 1), (1, 1)]
+
+
+class ExplorationMap(object):
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.frontier = set()
+        self.values = [None] * (width * height)
+        self.full_updates = 0
+        self.incremental_updates = 0
+        self._sources = set()
+        self._goals = set()
+        self._revealed = []
+        self._key = None
+        self.terrain_version = None
+
+    def signal_revealed(self, index):
+        """
+        Tells the map that the tile at index was seen for the first time.
+        """
+        self._revealed.append(index)
+
+    def get_field(self, seen, walkable, goals, key, changed=()):
+        """
+        Gets the flow field leading to the closest walkable frontier tile or goal.
+
+        Args:
+            seen: The seen bitset of the level, one bit per tile.
+            walkable: The walkability layer of the explorer.
+            goals: Indices of seen tiles that should be visited, like tiles with items.
+            key: Changes when another walkability layer is used, the distances are then computed anew.
+            changed: Indices of the tiles whose walkability may have changed since the last call,
+                None if they are not known, the distances are then computed anew.
+        """
+        goals = set(goals)
+        if key != self._key or changed is None:
+            self._rebuild(seen, walkable, goals)
+            self._key = key
+        elif self._revealed or changed or goals != self._goals:
+            self._update(seen, walkable, goals, changed)
+        return FlowField(self.width, self.height, self.values, None, key)
+
+    def _is_seen(self, seen, index):
+        return (seen[index >> 3] >> (index & 7)) & 1 == 1
+
+    def _is_frontier(self, seen, index):
+        if not self._is_seen(seen, index):
+            return False
+        x = index % self.width
+        y = index // self.width
+        for dx, dy in _NEIGHBOURS:
+            neighbour_x = x + dx
+            neighbour_y = y + dy
+            if (0 <= neighbour_x < self.width and 0 <= neighbour_y < self.height and
+                    not self._is_seen(seen, neighbour_y * self.width + neighbour_x)):
+                return True
+        return False
+
+    def _update_frontier_around(self, seen, index, touched):
+        x = index % self.width
+        y = index // self.width
+        for dx, dy in [(0, 0)] + _NEIGHBOURS:
+            neighbour_x = x + dx
+            neighbour_y = y + dy
+            if not (0 <= neighbour_x < self.width and 0 <= neighbour_y < self.height):
+                continue
+            neighbour = neighbour_y * self.width + neighbour_x
+            touched.add(neighbour)
+            if self._is_frontier(seen, neighbour):
+                self.frontier.add(neighbour)
+            else:
+                self.frontier.discard(neighbour)
+
+    def _is_source(self, walkable, goals, index):
+        return index in goals or (walkable[index] and index in self.frontier)
+
+    def _rebuild(self, seen, walkable, goals):
+        self.full_updates += 1
+        self.frontier = set(index for index in range(self.width * self.height)
+                            if self._is_frontier(seen, index))
+        self._revealed = []
+        self._goals = goals
+        self._sources = set(index for index in self.frontier if walkable[index])
+        self._sources.update(goals)
+        values = self.values
+        for index in range(len(values)):
+            values[index] = None
+        frontier = deque()
+        for index in self._sources:
+            values[index] = 0
+            frontier.append(index)
+        while frontier:
+            index = frontier.popleft()
+            value = values[index] + 1
+            for neighbour in self._passable_neighbours(seen, walkable, index):
+                if values[neighbour] is None:
+                    values[neighbour] = value
+                    frontier.append(neighbour)
+
+    def _update(self, seen, walkable, goals, changed):
+        """
+        Updates the distances around the tiles revealed, the tiles changed and the sources
+        changed since the last update.
+
+        Distances that may have been derived from a removed source or a tile that
+        can no longer be passed are cleared, then the distances are spread again from
+        the tiles around the cleared ones and from the new sources.
+        """
+        self.incremental_updates += 1
+        revealed = self._revealed
+        self._revealed = []
+        touched = set(changed)
+        for index in revealed:
+            self._update_frontier_around(seen, index, touched)
+        touched.update(goals ^ self._goals)
+        self._goals = goals
+        sources = self._sources
+        removed = []
+        added = []
+        for index in touched:
+            if self._is_source(walkable, goals, index):
+                if not index in sources:
+                    sources.add(index)
+                    added.append(index)
+            elif index in sources:
+                sources.remove(index)
+                removed.append(index)
+        blocked = [index for index in changed if not walkable[index] and not index in sources]
+        values = self.values
+
+        cleared = []
+        to_clear = deque()
+        for index in removed + blocked:
+            if not values[index] is None:
+                to_clear.append((index, values[index]))
+                values[index] = None
+                cleared.append(index)
+        while to_clear:
+            index, value = to_clear.popleft()
+            for neighbour in self._passable_neighbours(seen, walkable, index):
+                if values[neighbour] == value + 1 and not neighbour in sources:
+                    to_clear.append((neighbour, values[neighbour]))
+                    values[neighbour] = None
+                    cleared.append(neighbour)
+
+        heap = []
+        for index in added:
+            values[index] = 0
+            heap.append((0, index))
+        for index in cleared + revealed + list(changed):
+            for neighbour in self._passable_neighbours(seen, walkable, index):
+                if not values[neighbour] is None:
+                    heap.append((values[neighbour], neighbour))
+        heapq.heapify(heap)
+        while heap:
+            value, index = heapq.heappop(heap)
+            if value > values[index]:
+                continue
+            value += 1
+            for neighbour in self._passable_neighbours(seen, walkable, index):
+                if values[neighbour] is None or values[neighbour] > value:
+                    values[neighbour] = value
+                    heapq.heappush(heap, (value, neighbour))
+
+    def _passable_neighbours(self, seen, walkable, index):
+        width = self.width
+        x = index % width
+        y = index // width
+        result = []
+        for dx, dy in _NEIGHBOURS:
+            neighbour_x = x + dx
+            neighbour_y = y + dy
+            if not (0 <= neighbour_x < width and 0 <= neighbour_y < self.height):
+                continue
+            neighbour = neighbour_y * width + neighbour_x
+            if walkable[neighbour] and (seen[neighbour >> 3] >> (neighbour & 7)) & 1:
+                result.append(neighbour)
+        return result
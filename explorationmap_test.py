@@ -0,0 +1,93 @@
+import random
+import unittest
+from explorationmap import ExplorationMap
+
+
+def layer_from_lines(lines):
+    return bytearray(0 if c == "#" else 1 for line in lines for c in line)
+
+
+class TestComposition(unittest.TestCase):
+
+    def setUp(self):
+        self.lines = ["#######",
+                      "#.....#",
+                      "#####.#",
+                      "#.....#",
+                      "#.#####",
+                      "#.....#",
+                      "#######"]
+        self.walkable = layer_from_lines(self.lines)
+        self.seen = bytearray(7)
+
+    def see(self, exploration_map, points):
+        for x, y in points:
+            index = y * 7 + x
+            self.seen[index >> 3] |= 1 << (index & 7)
+            exploration_map.signal_revealed(index)
+
+    def test_field_leads_to_the_edge_of_the_seen_tiles(self):
+        exploration_map = ExplorationMap(7, 7)
+        self.see(exploration_map, [(x, y) for y in range(3) for x in range(7)])
+        field = exploration_map.get_field(self.seen, self.walkable, [], 0)
+        self.assertEqual(field.get_route((1, 1)), [(2, 1), (3, 1), (4, 1), (5, 2)])
+
+    def test_goals_are_explored(self):
+        exploration_map = ExplorationMap(7, 7)
+        self.see(exploration_map, [(x, y) for y in range(3) for x in range(7)])
+        field = exploration_map.get_field(self.seen, self.walkable, [1 * 7 + 2], 0)
+        self.assertEqual(field.get_route((1, 1)), [(2, 1)])
+
+    def test_fully_explored_level_has_no_step(self):
+        exploration_map = ExplorationMap(7, 7)
+        self.see(exploration_map, [(x, y) for y in range(7) for x in range(7)])
+        field = exploration_map.get_field(self.seen, self.walkable, [], 0)
+        self.assertEqual(field.get_next_step((1, 1)), None)
+
+    def test_revealing_tiles_gives_the_same_distances_as_rebuilding(self):
+        random.seed(0)
+        lines = ["#" * 12] + ["#" + "".join(random.choice("...#") for _ in range(10)) + "#"
+                              for _ in range(10)] + ["#" * 12]
+        walkable = layer_from_lines(lines)
+        seen = bytearray(18)
+        exploration_map = ExplorationMap(12, 12)
+        exploration_map.get_field(seen, walkable, [], 0)
+        points = [(x, y) for y in range(12) for x in range(12)]
+        random.shuffle(points)
+        for step, (x, y) in enumerate(points):
+            index = y * 12 + x
+            seen[index >> 3] |= 1 << (index & 7)
+            exploration_map.signal_revealed(index)
+            goals = [index] if step % 7 == 0 else []
+            values = list(exploration_map.get_field(seen, walkable, goals, 0).values)
+            rebuilt = ExplorationMap(12, 12).get_field(seen, walkable, goals, 0).values
+            self.assertEqual(values, rebuilt)
+
+    def test_changing_walkability_gives_the_same_distances_as_rebuilding(self):
+        random.seed(1)
+        lines = ["#" * 12] + ["#" + "".join(random.choice("...#") for _ in range(10)) + "#"
+                              for _ in range(10)] + ["#" * 12]
+        walkable = layer_from_lines(lines)
+        seen = bytearray(18)
+        for index in range(12 * 12):
+            if random.random() < 0.7:
+                seen[index >> 3] |= 1 << (index & 7)
+        exploration_map = ExplorationMap(12, 12)
+        exploration_map.get_field(seen, walkable, [], 0)
+        for step in range(200):
+            index = random.randrange(12 * 12)
+            walkable[index] = 1 - walkable[index]
+            goals = [index] if step % 5 == 0 else []
+            values = list(exploration_map.get_field(seen, walkable, goals, 0, [index]).values)
+            rebuilt = ExplorationMap(12, 12).get_field(seen, walkable, goals, 0).values
+            self.assertEqual(values, rebuilt)
+        self.assertEqual(exploration_map.full_updates, 1)
+
+    def test_unknown_changes_rebuild_the_distances(self):
+        exploration_map = ExplorationMap(7, 7)
+        self.see(exploration_map, [(x, y) for y in range(3) for x in range(7)])
+        exploration_map.get_field(self.seen, self.walkable, [], 0)
+        exploration_map.get_field(self.seen, self.walkable, [], 0, [])
+        self.assertEqual(exploration_map.full_updates, 1)
+        exploration_map.get_field(self.seen, self.walkable, [], 0, None)
+        self.assertEqual(exploration_map.full_updates, 2)
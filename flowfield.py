@@ -0,0 +1,127 @@
+"""
+Flow fields, maps of the steps left to a goal that every mover on a level can share.
+
+A mover follows a field by stepping to its neighbour with the lowest value,
+so finding the next step takes constant time however far away the goal is.
+"""
+import geometry
+import pathfinding
+
+APPROACH = "approach"
+FLEE = "flee"
+KEEP_AT_DISTANCE = "keep_at_distance"
+
+# The approach values are scaled by this for fleeing, the steep field makes
+# fleeing movers prefer running past the goal to getting cornered.
+FLEE_FACTOR = -1.2
+
+# Fields around a goal that moves, like the player, only reach this many steps
+# from it, so moving the goal doesn't search the whole level. Movers further away
+# find their way by path instead.
+APPROACH_REACH = 24
+
+_NEIGHBOURS = [(0, -1), (-1, 0), (1, 0), (0, 1), (-1, -1), (1, -1), (-1, 1), (1, 1)]
+
+
+class FlowField(object):
+    def __init__(self, width, height, values, goal, terrain_version):
+        self.width = width
+        self.height = height
+        self.values = values
+        self.goal = goal
+        self.terrain_version = terrain_version
+
+    def get_value(self, point):
+        """
+        Gets the value of the field at point, None if it can't reach the goal.
+        """
+        x, y = point
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            return None
+        return self.values[y * self.width + x]
+
+    def get_next_step(self, point):
+        """
+        Gets the neighbour of point with the lowest value lower than the value of point.
+
+        Returns:
+            The point to step to, None if no neighbour is lower.
+        """
+        best_value = self.get_value(point)
+        if best_value is None:
+            return None
+        x, y = point
+        best_step = None
+        for dx, dy in _NEIGHBOURS:
+            value = self.get_value((x + dx, y + dy))
+            if not value is None and value < best_value:
+                best_value = value
+                best_step = (x + dx, y + dy)
+        return best_step
+
+    def get_route(self, point):
+        """
+        Gets the points stepped through when following the field from point.
+        """
+        route = []
+        step = self.get_next_step(point)
+        while not step is None:
+            route.append(step)
+            step = self.get_next_step(step)
+        return route
+
+
+def new_approach_field(walkable, width, height, goal, terrain_version, reach=None):
+    """
+    Creates a field leading to goal, from the tiles at most reach steps away if reach is given.
+    """
+    distances = pathfinding.dijkstra(walkable, width, height, [goal], reach)
+    values = [None if distance == pathfinding.UNREACHABLE else distance for distance in distances]
+    return FlowField(width, height, values, goal, terrain_version)
+
+
+def new_flee_field(approach_field, walkable, reach=None):
+    """
+    Creates a field leading away from the goal of the approach field,
+    only over the tiles at most reach steps from the goal if reach is given.
+    """
+    width = approach_field.width
+    height = approach_field.height
+    bounds = _get_bounds(approach_field.goal, reach, width, height)
+    left, top, right, bottom = bounds
+    approach_values = approach_field.values
+    initial = [None] * (width * height)
+    for y in range(top, bottom):
+        for index in range(y * width + left, y * width + right):
+            if not approach_values[index] is None:
+                initial[index] = approach_values[index] * FLEE_FACTOR
+    values = pathfinding.relax(walkable, width, height, initial, bounds)
+    return FlowField(width, height, values, approach_field.goal, approach_field.terrain_version)
+
+
+def new_keep_at_distance_field(walkable, width, height, goal, distance, terrain_version, reach=None):
+    """
+    Creates a field leading to the tiles at chess distance distance from goal,
+    only over the tiles at most reach steps from those if reach is given.
+    """
+    initial = [None] * (width * height)
+    goal_x, goal_y = goal
+    for y in range(max(goal_y - distance, 0), min(goal_y + distance + 1, height)):
+        for x in range(max(goal_x - distance, 0), min(goal_x + distance + 1, width)):
+            index = y * width + x
+            if walkable[index] and geometry.chess_distance((x, y), goal) == distance:
+                initial[index] = 0
+    bounds = _get_bounds(goal, None if reach is None else distance + reach, width, height)
+    values = pathfinding.relax(walkable, width, height, initial, bounds)
+    return FlowField(width, height, values, goal, terrain_version)
+
+
+def _get_bounds(center, radius, width, height):
+    """
+    Gets the rectangle of the tiles at most radius from center clipped to the map,
+    the whole map if radius is None.
+    """
+    if radius is None:
+        return 0, 0, width, height
+    x, y = center
+    return max(x - radius, 0), max(y - radius, 0), min(x + radius + 1, width), min(y + radius + 1, height)
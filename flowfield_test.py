@@ -0,0 +1,72 @@
+import unittest
+import flowfield
+
+
+def layer_from_lines(lines):
+    return bytearray(0 if c == "#" else 1 for line in lines for c in line)
+
+
+class TestComposition(unittest.TestCase):
+
+    def setUp(self):
+        self.lines = ["#######",
+                      "#.....#",
+                      "#####.#",
+                      "#.....#",
+                      "#.#####",
+                      "#.....#",
+                      "#######"]
+        self.walkable = layer_from_lines(self.lines)
+
+    def test_approach_field_leads_to_goal(self):
+        field = flowfield.new_approach_field(self.walkable, 7, 7, (1, 1), 0)
+        route = field.get_route((5, 5))
+        self.assertEqual(route[-1], (1, 1))
+        self.assertEqual(len(route), 12)
+        self.assertEqual(field.get_value((5, 5)), 12)
+
+    def test_walls_can_not_reach_the_goal(self):
+        field = flowfield.new_approach_field(self.walkable, 7, 7, (1, 1), 0)
+        self.assertEqual(field.get_value((0, 0)), None)
+        self.assertEqual(field.get_next_step((0, 0)), None)
+
+    def test_no_step_from_goal(self):
+        field = flowfield.new_approach_field(self.walkable, 7, 7, (1, 1), 0)
+        self.assertEqual(field.get_next_step((1, 1)), None)
+
+    def test_flee_field_leads_away_from_goal(self):
+        approach_field = flowfield.new_approach_field(self.walkable, 7, 7, (1, 1), 0)
+        field = flowfield.new_flee_field(approach_field, self.walkable)
+        self.assertEqual(field.get_route((3, 1))[-1], (5, 5))
+
+    def test_keep_at_distance_field_leads_to_distance(self):
+        walkable = layer_from_lines(["#######",
+                                     "#.....#",
+                                     "#.....#",
+                                     "#.....#",
+                                     "#.....#",
+                                     "#.....#",
+                                     "#######"])
+        field = flowfield.new_keep_at_distance_field(walkable, 7, 7, (1, 1), 3, 0)
+        self.assertEqual(field.get_value((4, 2)), 0)
+        self.assertEqual(field.get_route((1, 2)), [(1, 3), (1, 4)])
+        self.assertEqual(field.get_route((5, 5)), [(4, 4)])
+
+    def test_approach_field_only_reaches_reach_steps(self):
+        field = flowfield.new_approach_field(self.walkable, 7, 7, (1, 1), 0, 6)
+        self.assertEqual(field.get_value((3, 3)), 6)
+        self.assertEqual(field.get_value((2, 3)), None)
+        self.assertEqual(field.get_next_step((2, 3)), None)
+
+    def test_flee_field_only_reaches_reach_steps(self):
+        walkable = bytearray([1] * (30 * 3))
+        approach_field = flowfield.new_approach_field(walkable, 30, 3, (1, 1), 0, 6)
+        field = flowfield.new_flee_field(approach_field, walkable, 6)
+        self.assertEqual(field.get_next_step((4, 1))[0], 5)
+        self.assertEqual(field.get_value((8, 1)), None)
+
+    def test_keep_at_distance_field_only_reaches_reach_steps_from_the_distance(self):
+        walkable = bytearray([1] * (30 * 3))
+        field = flowfield.new_keep_at_distance_field(walkable, 30, 3, (1, 1), 3, 0, 4)
+        self.assertEqual(field.get_route((7, 1)), [(6, 1), (5, 1), (4, 1)])
+        self.assertEqual(field.get_value((9, 1)), None)
@@ -0,0 +1,169 @@
+"""
+Field of view by restrictive precise angle shadowcasting, the same algorithm as
+libtcod's default FOV_RESTRICTIVE.
+
+The map is given as a transparency layer, one byte per tile in row order,
+the result is written to a window of side 2 * radius + 1 centered on the origin.
+Like libtcod's the view is bounded by the square of the radius and not by a circle.
+"""
+
+# The quadrants in the order libtcod scans them, later quadrants look at the tiles lit by earlier ones.
+_QUADRANTS = [(1, 1), (1, -1), (-1, 1), (-1, -1)]
+
+
+def compute_fov(transparent, width, height, origin, radius, light_walls=True, fov_buffer=None):
+    """
+    Computes the tiles visible from origin.
+
+    Args:
+        transparent: The transparency layer, non zero if the tile can be seen through.
+        width (int): The width of the map.
+        height (int): The height of the map.
+        origin (int, int): The point to look from.
+        radius (int): How far can be seen, must be positive.
+        light_walls (bool): If opaque tiles in the view are visible, they block what is behind them either way.
+        fov_buffer (bytearray): Reused for the result if it has the size of the window.
+
+    Returns:
+        A bytearray of the window around origin, 1 if the tile is visible.
+    """
+    window_size = 2 * radius + 1
+    if fov_buffer is None or len(fov_buffer) != window_size * window_size:
+        fov_buffer = bytearray(window_size * window_size)
+    else:
+        fov_buffer[:] = bytearray(len(fov_buffer))
+    x, y = origin
+    if not (0 <= x < width and 0 <= y < height):
+        return fov_buffer
+    view = _View(transparent, width, height, origin, radius, fov_buffer)
+    fov_buffer[radius * window_size + radius] = 1
+    for dx, dy in _QUADRANTS:
+        view.cast_octant(y, height, dy, width, x, width, dx, 1)
+        view.cast_octant(x, width, dx, 1, y, height, dy, width)
+    if not light_walls:
+        view.hide_opaque_tiles()
+    return fov_buffer
+
+
+class _View(object):
+    def __init__(self, transparent, width, height, origin, radius, fov_buffer):
+        self.transparent = transparent
+        self.width = width
+        self.height = height
+        self.origin = origin
+        self.radius = radius
+        self.fov_buffer = fov_buffer
+        self.window_size = 2 * radius + 1
+
+    def cast_octant(self, origin_line, line_count, line_sign, line_stride,
+                    origin_cell, cell_count, cell_sign, cell_stride):
+        """
+        Lights one octant line by line outwards from the origin.
+
+        The lines are rows or columns, a tile is at line * line_stride + cell * cell_stride
+        of the layer. Every opaque tile seen shadows an angle range of the later lines,
+        a tile of a later line is visible unless its angle range is shadowed or
+        neither of the two tiles between it and the origin was seen through.
+        """
+        transparent = self.transparent
+        radius = self.radius
+        start_angles = []
+        end_angles = []
+        obstacles_in_last_line = 0
+        min_angle = 0.0
+        iteration = 1
+        line = origin_line + line_sign
+        done = not (0 <= line < line_count)
+        while not done:
+            slopes_per_cell = 1.0 / iteration
+            half_slopes = slopes_per_cell * 0.5
+            processed_cell = int((min_angle + half_slopes) / slopes_per_cell)
+            min_cell = max(0, origin_cell - iteration)
+            max_cell = min(cell_count - 1, origin_cell + iteration)
+            cell = origin_cell + processed_cell * cell_sign
+            done = True
+            while min_cell <= cell <= max_cell:
+                index = line * line_stride + cell * cell_stride
+                visible = True
+                extended = False
+                centre_slope = processed_cell * slopes_per_cell
+                start_slope = centre_slope - half_slopes
+                end_slope = centre_slope + half_slopes
+                if obstacles_in_last_line > 0:
+                    behind = index - line_sign * line_stride
+                    if not self._is_seen_through(behind) and \
+                            not self._is_seen_through(behind - cell_sign * cell_stride):
+                        visible = False
+                    else:
+                        for obstacle in range(obstacles_in_last_line):
+                            if start_slope <= end_angles[obstacle] and end_slope >= start_angles[obstacle]:
+                                if transparent[index]:
+                                    if start_angles[obstacle] < centre_slope < end_angles[obstacle]:
+                                        visible = False
+                                        break
+                                elif start_slope >= start_angles[obstacle] and end_slope <= end_angles[obstacle]:
+                                    visible = False
+                                    break
+                                else:
+                                    start_angles[obstacle] = min(start_angles[obstacle], start_slope)
+                                    end_angles[obstacle] = max(end_angles[obstacle], end_slope)
+                                    extended = True
+                if visible:
+                    self._light(index)
+                    done = False
+                    if not transparent[index]:
+                        if min_angle >= start_slope:
+                            min_angle = end_slope
+                            if processed_cell == iteration:
+                                done = True
+                        elif not extended:
+                            start_angles.append(start_slope)
+                            end_angles.append(end_slope)
+                processed_cell += 1
+                cell += cell_sign
+            if iteration == radius:
+                done = True
+            iteration += 1
+            obstacles_in_last_line = len(start_angles)
+            line += line_sign
+            if not (0 <= line < line_count):
+                done = True
+
+    def hide_opaque_tiles(self):
+        cx, cy = self.origin
+        radius = self.radius
+        for window_index, is_visible in enumerate(self.fov_buffer):
+            if not is_visible:
+                continue
+            window_y, window_x = divmod(window_index, self.window_size)
+            x = cx + window_x - radius
+            y = cy + window_y - radius
+            if (x, y) != self.origin and not self.transparent[y * self.width + x]:
+                self.fov_buffer[window_index] = 0
+
+    def _light(self, index):
+        self.fov_buffer[self._get_window_index(index)] = 1
+
+    def _is_seen_through(self, index):
+        """
+        Checks if the tile at index of the layer is lit and transparent.
+
+        The index is not checked against the lines of the map, like libtcod's
+        a step back from the first tile of a line lands on the other end of the line before.
+        """
+        if not (0 <= index < self.width * self.height) or not self.transparent[index]:
+            return False
+        window_index = self._get_window_index(index)
+        return window_index >= 0 and self.fov_buffer[window_index] == 1
+
+    def _get_window_index(self, index):
+        """
+        Gets the index in the window of the tile at index of the layer, -1 if it is outside of the window.
+        """
+        y, x = divmod(index, self.width)
+        cx, cy = self.origin
+        window_x = x - cx + self.radius
+        window_y = y - cy + self.radius
+        if not (0 <= window_x < self.window_size and 0 <= window_y < self.window_size):
+            return -1
+        return window_y * self.window_size + window_x
@@ -0,0 +1,52 @@
+import unittest
+import fov
+
+
+def layer_from_lines(lines):
+    return bytearray(0 if c == "#" else 1 for line in lines for c in line)
+
+
+def visible_lines(fov_buffer, radius):
+    window_size = 2 * radius + 1
+    return ["".join("v" if fov_buffer[y * window_size + x] else "." for x in range(window_size))
+            for y in range(window_size)]
+
+
+class TestComposition(unittest.TestCase):
+
+    def setUp(self):
+        self.lines = ["#######",
+                      "#.....#",
+                      "#.....#",
+                      "#..#..#",
+                      "#.....#",
+                      "#.....#",
+                      "#######"]
+        self.transparent = layer_from_lines(self.lines)
+
+    def test_origin_is_always_visible(self):
+        result = fov.compute_fov(self.transparent, 7, 7, (1, 1), 1)
+        self.assertEqual(result[1 * 3 + 1], 1)
+
+    def test_walls_are_lit_but_block_what_is_behind_them(self):
+        result = visible_lines(fov.compute_fov(self.transparent, 7, 7, (3, 1), 3), 3)
+        self.assertEqual(result, [".......",
+                                  ".......",
+                                  "vvvvvvv",
+                                  "vvvvvvv",
+                                  "vvvvvvv",
+                                  "vvvvvvv",
+                                  "vvv.vvv"])
+
+    def test_walls_are_not_lit_without_light_walls(self):
+        result = visible_lines(fov.compute_fov(self.transparent, 7, 7, (3, 1), 3, light_walls=False), 3)
+        self.assertEqual(result[2], ".......")
+        self.assertEqual(result[5], ".vv.vv.")
+
+    def test_origin_outside_of_map_sees_nothing(self):
+        result = fov.compute_fov(self.transparent, 7, 7, (-5, 1), 2)
+        self.assertEqual(sum(result), 0)
+
+    def test_buffer_of_the_right_size_is_reused(self):
+        fov_buffer = bytearray(5 * 5)
+        self.assertIs(fov.compute_fov(self.transparent, 7, 7, (3, 3), 2, fov_buffer=fov_buffer), fov_buffer)
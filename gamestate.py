@@ -338,6 +338,8 @@ class GameState(GameStateBase):
     def __init__(self, player_name=""):
         super(GameState, self).__init__(player_name)
         self.dungeon = Dungeon(self)
+        if settings.GENERATE_ALL_LEVELS_FLAG:
+            self.dungeon.generate_all_dungeon_levels()
         self._init_player_position()
 
     def _init_player_position(self):
@@ -0,0 +1,139 @@
+"""
+Benchmarks dungeon generation stage by stage, headless.
+
+Generates a number of levels at every depth and prints the median and 95th percentile
+time of each generation stage, and the peak memory of the process after each depth.
+The results can be written as a JSON baseline, and later runs compared against it.
+
+Run from the game directory:
+    python generationbenchmark.py --levels 20 --write-baseline generation_baseline.json
+    python generationbenchmark.py --levels 20 --compare generation_baseline.json
+The comparison exits with status 1 if a stage got slower than the baseline allows.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+
+import dungeon
+import dungeongenerator
+import mapbackend
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows, peak memory is not reported there.
+    resource = None
+
+DEPTHS = range(1, 10)
+LEVELS_PER_DEPTH = 10
+TOTAL = "total"
+# A stage has regressed when its median is both this many times and this many seconds slower.
+REGRESSION_FACTOR = 1.25
+REGRESSION_MIN_SECONDS = 0.002
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+
+def generate_level(depth, seed):
+    """
+    Generates a level with its monsters and items, the generation logging is discarded.
+    """
+    random.seed(seed)
+    dungeongenerator.stage_timer.reset()
+    stdout = sys.stdout
+    sys.stdout = open(os.devnull, "w")
+    try:
+        dungeon.generate_dungeon_level(depth, None, False)
+    finally:
+        sys.stdout.close()
+        sys.stdout = stdout
+    return dict(dungeongenerator.stage_timer.elapsed)
+
+
+def benchmark_depth(depth, levels):
+    """
+    Returns the median and 95th percentile time of each stage at depth, in seconds.
+    """
+    samples = {}
+    for index in range(levels):
+        elapsed = generate_level(depth, depth * 1000 + index)
+        elapsed[TOTAL] = sum(elapsed.values())
+        for stage, seconds in elapsed.iteritems():
+            samples.setdefault(stage, []).append(seconds)
+    return dict((stage, {"median": percentile(times, 0.5), "p95": percentile(times, 0.95)})
+                for stage, times in samples.iteritems())
+
+
+def get_peak_memory_kb():
+    """
+    Gets the peak memory of the process, None where it can't be measured.
+    """
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def print_depth(depth, stages, peak_memory_kb):
+    if peak_memory_kb is None:
+        print "depth {0}:".format(depth)
+    else:
+        print "depth {0}:  peak memory: {1} kB".format(depth, peak_memory_kb)
+    for stage in sorted(stages, key=lambda name: (name == TOTAL, name)):
+        print "    {0:12} median: {1:8.2f}ms  p95: {2:8.2f}ms".format(
+            stage, stages[stage]["median"] * 1000, stages[stage]["p95"] * 1000)
+
+
+def find_regressions(results, baseline):
+    regressions = []
+    for depth, stages in results["depths"].iteritems():
+        baseline_stages = baseline["depths"].get(depth, {})
+        for stage, timing in stages.iteritems():
+            if not stage in baseline_stages:
+                continue
+            median = timing["median"]
+            baseline_median = baseline_stages[stage]["median"]
+            if median > baseline_median * REGRESSION_FACTOR and median - baseline_median > REGRESSION_MIN_SECONDS:
+                regressions.append("depth {0} {1}: {2:.2f}ms, baseline {3:.2f}ms".format(
+                    depth, stage, median * 1000, baseline_median * 1000))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks dungeon generation stage by stage.")
+    parser.add_argument("--levels", type=int, default=LEVELS_PER_DEPTH, help="levels generated per depth")
+    parser.add_argument("--write-baseline", metavar="FILE", help="write the results as a JSON baseline")
+    parser.add_argument("--compare", metavar="FILE", help="compare the results with a JSON baseline")
+    arguments = parser.parse_args()
+
+    mapbackend.set_backend(mapbackend.PythonBackend())
+    results = {"levels_per_depth": arguments.levels, "depths": {}, "peak_memory_kb": {}}
+    for depth in DEPTHS:
+        stages = benchmark_depth(depth, arguments.levels)
+        peak_memory_kb = get_peak_memory_kb()
+        results["depths"][str(depth)] = stages
+        results["peak_memory_kb"][str(depth)] = peak_memory_kb
+        print_depth(depth, stages, peak_memory_kb)
+
+    if arguments.write_baseline:
+        baseline_file = open(arguments.write_baseline, "w")
+        json.dump(results, baseline_file, indent=2, sort_keys=True)
+        baseline_file.close()
+    if arguments.compare:
+        baseline_file = open(arguments.compare)
+        baseline = json.load(baseline_file)
+        baseline_file.close()
+        regressions = find_regressions(results, baseline)
+        for regression in regressions:
+            print "regression:", regression
+        if regressions:
+            sys.exit(1)
+        print "no regressions against", arguments.compare
+
+
+if __name__ == "__main__":
+    main()
@@ -2,14 +2,23 @@ class Graph(object):
     def __init__(self):
         self._points = {}
         self._edges = set()
+        self._parents = {}
+        self._component_sizes = {}
+        self._component_count = 0
 
     def add_point(self, point):
+        if point in self._points:
+            return
         self._points[point] = Vertex(point)
+        self._parents[point] = point
+        self._component_sizes[point] = 1
+        self._component_count += 1
 
     def add_edge(self, point1, point2):
         self._points[point1].add_neighbor(self._points[point2])
         self._points[point2].add_neighbor(self._points[point1])
         self._edges.add(frozenset([point1, point2]))
+        self._union(point1, point2)
 
     def has_point(self, point):
         return point in self._points
@@ -17,18 +26,68 @@ class Graph(object):
     def has_edge(self, point1, point2):
         return frozenset([point1, point2]) in self._edges
 
+    def get_component_count(self):
+        """
+        Gets the number of groups of points that are joined by edges.
+        """
+        return self._component_count
+
     def is_connected(self):
-        if len(self._points) < 1:
-            return True
-        first = self._points.values()[0]
-        visited = set()
-        visited.add(first)
-        next_to_visit = set(first.get_neighbors())
-        while len(next_to_visit) > 0:
-            current_point = next_to_visit.pop()
-            visited.add(current_point)
-            next_to_visit.update(set(current_point.get_neighbors()) - visited)
-        return len(self._points) == len(visited)
+        return self._component_count <= 1
+
+    def are_connected(self, point1, point2):
+        """
+        Checks if there is a path of edges between the points.
+        """
+        return self._find(point1) == self._find(point2)
+
+    def _find(self, point):
+        parents = self._parents
+        while parents[point] != point:
+            parents[point] = parents[parents[point]]
+            point = parents[point]
+        return point
+
+    def _union(self, point1, point2):
+        root1 = self._find(point1)
+        root2 = self._find(point2)
+        if root1 == root2:
+            return
+        if self._component_sizes[root1] < self._component_sizes[root2]:
+            root1, root2 = root2, root1
+        self._parents[root2] = root1
+        self._component_sizes[root1] += self._component_sizes.pop(root2)
+        self._component_count -= 1
+
+
+def minimum_spanning_tree_edges(points, distance):
+    """
+    Gets the edges of the shortest tree joining all points.
+
+    Args:
+        points: The points to join.
+        distance: Gets the length of the edge between two points.
+
+    Returns:
+        A list of point pairs, shortest first.
+    """
+    points = list(points)
+    candidate_edges = sorted((distance(point1, point2), index1, index2)
+                             for index1, point1 in enumerate(points)
+                             for index2, point2 in enumerate(points[index1 + 1:], index1 + 1))
+    tree = Graph()
+    for point in points:
+        tree.add_point(point)
+    edges = []
+    for _, index1, index2 in candidate_edges:
+        if tree.is_connected():
+            break
+        point1 = points[index1]
+        point2 = points[index2]
+        if not tree.are_connected(point1, point2):
+            tree.add_edge(point1, point2)
+            edges.append((point1, point2))
+    return edges
 
 
 class Vertex(object):
@@ -51,4 +110,7 @@ class Vertex(object):
         return hash(self.payload)
 
     def __eq__(self, other):
-        return hash(self) == hash(other)
+        return isinstance(other, Vertex) and self.payload == other.payload
+
+    def __ne__(self, other):
+        return not self == other
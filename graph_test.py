@@ -0,0 +1,35 @@
+import unittest
+import geometry
+import graph
+
+
+class TestGraph(unittest.TestCase):
+
+    def setUp(self):
+        self.graph = graph.Graph()
+        for point in [(0, 0), (1, 0), (2, 0), (3, 0)]:
+            self.graph.add_point(point)
+
+    def test_edges_join_components(self):
+        self.assertEqual(self.graph.get_component_count(), 4)
+        self.graph.add_edge((0, 0), (1, 0))
+        self.graph.add_edge((2, 0), (3, 0))
+        self.assertEqual(self.graph.get_component_count(), 2)
+        self.assertFalse(self.graph.is_connected())
+        self.assertTrue(self.graph.are_connected((2, 0), (3, 0)))
+        self.graph.add_edge((3, 0), (0, 0))
+        self.assertTrue(self.graph.is_connected())
+        self.assertTrue(self.graph.are_connected((1, 0), (2, 0)))
+
+    def test_edge_within_component_keeps_count(self):
+        self.graph.add_edge((0, 0), (1, 0))
+        self.graph.add_edge((1, 0), (0, 0))
+        self.assertEqual(self.graph.get_component_count(), 3)
+
+    def test_minimum_spanning_tree_uses_shortest_edges(self):
+        points = [(0, 0), (10, 0), (1, 0), (11, 1)]
+        edges = graph.minimum_spanning_tree_edges(points, geometry.distance)
+        self.assertEqual(len(edges), 3)
+        self.assertEqual(set(frozenset(edge) for edge in edges),
+                         set([frozenset([(0, 0), (1, 0)]), frozenset([(10, 0), (11, 1)]),
+                              frozenset([(1, 0), (10, 0)])]))
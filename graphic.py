@@ -1,5 +1,6 @@
 import console
 import colors
+import direction
 from compositecore import Leaf
 import settings
 
@@ -89,21 +90,14 @@ class CharPrinter(Leaf):
         Draws the char as it looks like outside the field of view.
         """
         self._tick_animation()
-        console.console.set_colors_and_symbol(screen_position,
-                                              colors.UNSEEN_FG,
-                                              colors.UNSEEN_BG,
-                                              self.parent.graphic_char.icon,
-                                              console=the_console)
+        draw_unseen_icon_to_console(screen_position, self.parent.graphic_char.icon, the_console)
+
     def draw_unvisited(self, screen_position, the_console=0):
         """
         Draws the char as it looks like outside the field of view.
         """
         self._tick_animation()
-        console.console.set_colors_and_symbol(screen_position,
-                                              colors.DARK_PURPLE,
-                                              colors.UNSEEN_BG,
-                                              self.parent.graphic_char.icon,
-                                              console=the_console)
+        draw_unvisited_icon_to_console(screen_position, self.parent.graphic_char.icon, the_console)
 
     def append_graphic_char_temporary_frames(self, graphic_char_frames, animation_delay=settings.ANIMATION_DELAY):
         """
@@ -139,6 +133,22 @@ class CharPrinter(Leaf):
         return copy
 
 
+def draw_unseen_icon_to_console(position, icon, the_console=0):
+    """
+    Draws an icon as it looks like outside the field of view.
+    """
+    console.console.set_colors_and_symbol(position, colors.UNSEEN_FG, colors.UNSEEN_BG,
+                                          icon, console=the_console)
+
+
+def draw_unvisited_icon_to_console(position, icon, the_console=0):
+    """
+    Draws an icon as it looks like when it is known but never seen.
+    """
+    console.console.set_colors_and_symbol(position, colors.DARK_PURPLE, colors.UNSEEN_BG,
+                                          icon, console=the_console)
+
+
 def draw_graphic_char_to_console(position, graphic_char, the_console=0):
     """
     Draws the char on the given position on the console.
@@ -187,6 +197,14 @@ class GraphicCharTerrainCorners(GraphicChar):
                 neighbours_mask |= 2 ** index
         self._icon = self._wall_symbol_row + neighbours_mask
 
+    def set_surrounded_by_sticky_terrain(self):
+        """
+        Fixes the symbol to the one used when all neighbours are sticky,
+        for terrain that is not placed in any dungeon level.
+        """
+        self._icon = self._wall_symbol_row + 2 ** len(direction.AXIS_DIRECTIONS) - 1
+        self.has_calculated = True
+
     def _get_neighbour_terrains(self):
         tiles = (self.parent.dungeon_level.value.
                  get_tiles_surrounding_position(self.parent.position.value))
@@ -12,7 +12,6 @@ import gametime
 import inputhandler
 import menufactory
 import positionexaminer
-import util
 from weapon import new_dagger, new_spear, new_morning_star, new_sword, RangeWeaponType, new_kris, new_katar, new_cestus, new_iron_hand, new_claw, new_rapier, new_scimitar, new_club, new_flail, new_hammer, new_chain_and_ball, new_halberd, new_trident, new_whip, new_axe, new_gun, new_sling, new_flame_orb
 
 DEV_EQUIPMENT_FACTORY_LIST =  \
@@ -207,10 +206,9 @@ class InputActor(Actor):
         if closest_enemy and not closest_enemy.position.value == self.parent.position.value:
             self.parent.path.compute_path(closest_enemy.position.value)
         else:
-            destination = util.get_closest_unseen_walkable_position(self.parent, self.parent.position.value,
-                                                                    self.parent.dungeon_level.value)
-            if destination:
-                self.parent.path.compute_path(destination)
+            exploration_field = self.parent.memory_map.get_exploration_field(self.parent.dungeon_level.value)
+            if exploration_field.get_next_step(self.parent.position.value):
+                self.parent.path.follow_flow_field(exploration_field)
                 return
             fountain = next((f for f in
                             self.parent.dungeon_level.value.dungeon_features
@@ -0,0 +1,114 @@
+"""
+An on-disk cache of generated dungeon levels.
+
+Generation is deterministic, a seed, a depth and a generator version always give
+the same level. The cache keeps the snapshot of each level it is given in a file
+named by the hash of these, so a level is only generated once across runs.
+When the files grow past the size limit the least recently used are removed.
+"""
+import hashlib
+import os
+
+DEFAULT_DIRECTORY = "level_cache"
+DEFAULT_MAX_SIZE = 32 * 1024 * 1024
+FILE_EXTENSION = ".snapshot"
+
+
+def get_key(*parts):
+    """
+    Gets the key of the level generated from parts, everything the level depends on.
+    """
+    return hashlib.sha1(":".join(str(part) for part in parts)).hexdigest()
+
+
+class LevelCache(object):
+    def __init__(self, directory=DEFAULT_DIRECTORY, max_size=DEFAULT_MAX_SIZE):
+        self.directory = directory
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """
+        Gets the snapshot stored under key, None if there is none.
+        """
+        file_name = self._get_file_name(key)
+        try:
+            snapshot_file = open(file_name, "rb")
+        except IOError:
+            self.misses += 1
+            return None
+        try:
+            data = snapshot_file.read()
+        finally:
+            snapshot_file.close()
+        try:
+            os.utime(file_name, None)
+        except OSError:
+            # Another process evicted the file after it was read.
+            pass
+        self.hits += 1
+        return data
+
+    def put(self, key, data):
+        """
+        Stores a snapshot under key, then removes the least recently used snapshots
+        until the cache fits its size limit.
+
+        A key always holds the same level, if it is stored already, by this
+        or another process, the stored snapshot is kept.
+        """
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+        file_name = self._get_file_name(key)
+        if os.path.isfile(file_name):
+            return
+        temporary_file_name = "{0}.{1}.tmp".format(file_name, os.getpid())
+        snapshot_file = open(temporary_file_name, "wb")
+        try:
+            snapshot_file.write(data)
+        finally:
+            snapshot_file.close()
+        try:
+            os.rename(temporary_file_name, file_name)
+        except OSError:
+            # On Windows rename fails if another process stored the key meanwhile.
+            os.remove(temporary_file_name)
+            if not os.path.isfile(file_name):
+                raise
+        self._evict()
+
+    def remove(self, key):
+        """
+        Removes the snapshot stored under key, for snapshots that turn out to be unreadable.
+        """
+        try:
+            os.remove(self._get_file_name(key))
+        except OSError:
+            pass
+
+    def _get_file_name(self, key):
+        return os.path.join(self.directory, key + FILE_EXTENSION)
+
+    def _evict(self):
+        files = []
+        total_size = 0
+        for file_name in os.listdir(self.directory):
+            if not file_name.endswith(FILE_EXTENSION):
+                continue
+            path = os.path.join(self.directory, file_name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            files.append((stat.st_mtime, path, stat.st_size))
+            total_size += stat.st_size
+        files.sort()
+        for _, path, size in files:
+            if total_size <= self.max_size:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total_size -= size
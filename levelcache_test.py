@@ -0,0 +1,49 @@
+import os
+import shutil
+import tempfile
+import unittest
+import levelcache
+
+
+class TestComposition(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cache = levelcache.LevelCache(os.path.join(self.directory, "cache"), max_size=10)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_key_depends_on_every_part(self):
+        self.assertEqual(levelcache.get_key(1, 2, False), levelcache.get_key(1, 2, False))
+        self.assertNotEqual(levelcache.get_key(1, 2, False), levelcache.get_key(2, 2, False))
+        self.assertNotEqual(levelcache.get_key(1, 2, False), levelcache.get_key(1, 2, True))
+
+    def test_get_returns_what_was_put(self):
+        self.assertEqual(self.cache.get("a"), None)
+        self.cache.put("a", "12345")
+        self.assertEqual(self.cache.get("a"), "12345")
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+
+    def test_least_recently_used_is_evicted(self):
+        self.cache.put("a", "1234")
+        self.cache.put("b", "1234")
+        os.utime(self.cache._get_file_name("a"), (0, 0))
+        os.utime(self.cache._get_file_name("b"), (1, 1))
+        self.cache.get("a")
+        self.cache.put("c", "1234")
+        self.assertEqual(self.cache.get("b"), None)
+        self.assertEqual(self.cache.get("a"), "1234")
+        self.assertEqual(self.cache.get("c"), "1234")
+
+    def test_stored_key_is_kept(self):
+        self.cache.put("a", "1234")
+        self.cache.put("a", "5678")
+        self.assertEqual(self.cache.get("a"), "1234")
+        self.assertEqual(os.listdir(os.path.join(self.directory, "cache")), ["a" + levelcache.FILE_EXTENSION])
+
+    def test_evicted_file_is_a_miss(self):
+        self.cache.put("a", "1234")
+        self.cache.remove("a")
+        self.cache.remove("a")
+        self.assertEqual(self.cache.get("a"), None)
@@ -0,0 +1,491 @@
+from collections import OrderedDict, deque
+import flowfield
+import geometry
+import mapbackend
+from mover import can_pass_terrain_with_signature, is_cloud_dangerous_with_signature
+import pathfinding
+from regionmap import RegionMap
+import roomgraph
+
+REGION_SHIFT = 3  # Terrain versions are kept per 8x8 region.
+FOV_CACHE_SIZE = 64
+DANGER_COST = 16  # How many extra steps a path takes to keep out of a dangerous tile.
+TERRAIN_CHANGE_LOG_SIZE = 256  # Changed tiles kept for layers catching up on terrain changes.
+_NO_OBSERVERS = frozenset()
+
+
+class LevelMap(object):
+    """
+    Transparency and walkability of a dungeon level, shared by all entities on it.
+
+    There is one transparency layer per level and one walkability layer per
+    terrain signature of the movers on the level. Each walkability layer has a map of
+    its connected regions. The layers are built the first time they are asked for
+    and kept up to date by update_point.
+
+    Long paths are planned over the room graph of the level when it has one.
+
+    There is a danger layer per danger signature of the cautious movers on the level,
+    built from the clouds on it and updated as clouds spread and dissipate, chasms are
+    already left out by the walkability layers. Paths of cautious movers that would go
+    through danger are planned again weighted by it, so they go around it.
+
+    Flow fields toward a goal, usually the player, are shared by all movers with
+    the same terrain signature and computed again only when the goal or terrain changes.
+
+    Field of view results are memoised in a small LRU cache. Every region of the
+    level has a terrain version, the version of a view window is the newest version
+    of the regions it covers, so a change outside the window never invalidates it.
+    Regions also have an entity version, that changes when entities move.
+
+    Field of view requests are batched, every request made during a turn is
+    computed when the batch is flushed and identical views are computed once.
+
+    It also keeps a reverse visibility index from every tile to the entities
+    whose field of view covers it.
+    """
+
+    def __init__(self, dungeon_level):
+        self.dungeon_level = dungeon_level
+        self.width = dungeon_level.width
+        self.height = dungeon_level.height
+        self._transparent = None
+        self._walkable = {}
+        self._fov_map = None
+        self._maps = {}
+        self._regions = {}
+        self._flow_fields = {}
+        self._room_maps = {}
+        self._danger = {}
+        self._danger_counts = {}
+        self.danger_version = 0
+        self.flow_field_updates = 0
+        self.path_recomputes = 0
+        self.path_repairs = 0
+        self.hierarchical_paths = 0
+        self.danger_paths = 0
+        self.search_stats = pathfinding.SearchStats()
+        self.terrain_version = 0
+        self._terrain_changes = deque(maxlen=TERRAIN_CHANGE_LOG_SIZE)
+        self._region_columns = (self.width >> REGION_SHIFT) + 1
+        self._region_versions = [0] * (self._region_columns * ((self.height >> REGION_SHIFT) + 1))
+        self.entity_version = 0
+        self._entity_region_versions = [0] * len(self._region_versions)
+        self._fov_cache = OrderedDict()
+        self.fov_cache_hits = 0
+        self.fov_cache_misses = 0
+        self._fov_scratch = bytearray()
+        self._fov_requests = {}
+        self.fov_duplicate_requests = 0
+        self._observers = {}
+        self._observed = {}
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state["_transparent"] = None
+        state["_walkable"] = {}
+        state["_fov_map"] = None
+        state["_maps"] = {}
+        state["_regions"] = {}
+        state["_flow_fields"] = {}
+        state["_room_maps"] = {}
+        state["_danger"] = {}
+        state["_danger_counts"] = {}
+        state["_fov_cache"] = OrderedDict()
+        state["_fov_scratch"] = bytearray()
+        state["_fov_requests"] = {}
+        state["_observers"] = {}
+        state["_observed"] = {}
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+
+    @property
+    def transparent(self):
+        """
+        Gets the transparency layer, one byte per tile, 1 if the tile can be seen through.
+        """
+        if self._transparent is None:
+            self._transparent = self._new_layer(self._is_tile_transparent)
+        return self._transparent
+
+    def get_walkable(self, terrain_signature):
+        """
+        Gets the walkability layer of movers with the terrain signature,
+        one byte per tile, 1 if the tile can be passed.
+        """
+        if not terrain_signature in self._walkable:
+            self._walkable[terrain_signature] = self._new_layer(
+                lambda the_tile: self._is_tile_walkable(the_tile, terrain_signature))
+        return self._walkable[terrain_signature]
+
+    def get_map(self, terrain_signature):
+        """
+        Gets the path map of movers with the terrain signature.
+        """
+        if not terrain_signature in self._maps:
+            self._maps[terrain_signature] = mapbackend.get_backend().new_path_map(
+                self.width, self.height, self.get_walkable(terrain_signature))
+        return self._maps[terrain_signature]
+
+    def get_regions(self, terrain_signature):
+        """
+        Gets the connected regions of the walkability layer of movers with the terrain signature.
+        """
+        if not terrain_signature in self._regions:
+            candidates = None
+            if not self._is_tile_walkable(self.dungeon_level.get_untouched_tile(), terrain_signature):
+                candidates = (y * self.width + x for x, y in self._get_touched_points())
+            self._regions[terrain_signature] = RegionMap(self.width, self.height,
+                                                         self.get_walkable(terrain_signature), candidates)
+        return self._regions[terrain_signature]
+
+    def get_danger(self, danger_signature):
+        """
+        Gets the danger layer of movers with the danger signature, one byte per tile,
+        DANGER_COST if the tile is dangerous to them and 0 otherwise.
+        """
+        if not danger_signature in self._danger:
+            danger = bytearray(self.width * self.height)
+            for y in range(self.height):
+                for x in range(self.width):
+                    danger[y * self.width + x] = self._get_danger_cost((x, y), danger_signature)
+            self._danger[danger_signature] = danger
+            self._danger_counts[danger_signature] = sum(1 for cost in danger if cost)
+        return self._danger[danger_signature]
+
+    def update_danger(self, point):
+        """
+        Updates the danger layers at the point after a cloud entered or left it.
+        """
+        x, y = point
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            return
+        index = y * self.width + x
+        for danger_signature, danger in self._danger.iteritems():
+            cost = self._get_danger_cost(point, danger_signature)
+            if danger[index] != cost:
+                self._danger_counts[danger_signature] += 1 if cost else -1
+                danger[index] = cost
+                self.danger_version += 1
+
+    def compute_path(self, terrain_signature, start, destination, danger_signature=None):
+        """
+        Computes a path from start to destination for movers with the terrain signature.
+
+        If the level has a room graph, long paths are planned over its rooms and only
+        the rooms on the route are searched. If the path found goes through danger to
+        movers with the danger signature, it is searched for again on the danger layer
+        and may go through danger only to save more than DANGER_COST steps.
+
+        Returns:
+            The points of the path without start, empty if there is none.
+        """
+        path = self._compute_path_ignoring_danger(terrain_signature, start, destination)
+        if not danger_signature is None and self._is_path_dangerous(path, danger_signature):
+            self.danger_paths += 1
+            return pathfinding.a_star(self.get_walkable(terrain_signature), self.width, self.height,
+                                      start, destination, costs=self.get_danger(danger_signature),
+                                      stats=self.search_stats)
+        return path
+
+    def _compute_path_ignoring_danger(self, terrain_signature, start, destination):
+        room_map = self._get_room_map(terrain_signature)
+        if (not room_map is None and
+                geometry.chess_distance(start, destination) >= roomgraph.LONG_PATH_DISTANCE):
+            path = room_map.compute_path(start, destination)
+            if path:
+                self.hierarchical_paths += 1
+                return path
+        return self.get_map(terrain_signature).compute_path(start, destination)
+
+    def _is_path_dangerous(self, path, danger_signature):
+        danger = self.get_danger(danger_signature)
+        if self._danger_counts[danger_signature] == 0:
+            return False
+        width = self.width
+        return any(danger[y * width + x] for x, y in path)
+
+    def _get_room_map(self, terrain_signature):
+        """
+        Gets the rooms of the walkability layer of movers with the terrain signature,
+        None if the level has no room graph.
+        """
+        if self.dungeon_level.room_graph is None:
+            return None
+        if not terrain_signature in self._room_maps:
+            self._room_maps[terrain_signature] = roomgraph.RoomMap(
+                self.width, self.height, self.get_walkable(terrain_signature),
+                self.dungeon_level.room_graph.get_nodes(), self.search_stats)
+        return self._room_maps[terrain_signature]
+
+    def get_flow_field(self, kind, terrain_signature, goal, distance=None):
+        """
+        Gets a flow field of movers with the terrain signature.
+
+        Args:
+            kind: flowfield.APPROACH, flowfield.FLEE or flowfield.KEEP_AT_DISTANCE.
+            terrain_signature: The terrain signature of the movers following the field.
+            goal (int, int): The point to approach, flee from or keep at distance.
+            distance (int): The distance to keep, only used by KEEP_AT_DISTANCE.
+        """
+        key = (kind, terrain_signature, distance)
+        field = self._flow_fields.get(key)
+        if field is None or field.goal != goal or field.terrain_version != self.terrain_version:
+            field = self._new_flow_field(kind, terrain_signature, goal, distance)
+            self._flow_fields[key] = field
+            self.flow_field_updates += 1
+        return field
+
+    def _new_flow_field(self, kind, terrain_signature, goal, distance):
+        walkable = self.get_walkable(terrain_signature)
+        if kind == flowfield.APPROACH:
+            return flowfield.new_approach_field(walkable, self.width, self.height, goal, self.terrain_version,
+                                                flowfield.APPROACH_REACH)
+        elif kind == flowfield.FLEE:
+            approach_field = flowfield.new_approach_field(walkable, self.width, self.height, goal,
+                                                          self.terrain_version, flowfield.APPROACH_REACH)
+            return flowfield.new_flee_field(approach_field, walkable, flowfield.APPROACH_REACH)
+        elif kind == flowfield.KEEP_AT_DISTANCE:
+            return flowfield.new_keep_at_distance_field(walkable, self.width, self.height,
+                                                        goal, distance, self.terrain_version,
+                                                        flowfield.APPROACH_REACH)
+        raise Exception("Unknown flow field kind: " + str(kind))
+
+    @property
+    def fov_map(self):
+        """
+        Gets the map field of view is computed on.
+        """
+        if self._fov_map is None:
+            self._fov_map = mapbackend.get_backend().new_fov_map(self.width, self.height, self.transparent)
+        return self._fov_map
+
+    def get_terrain_changes(self, terrain_version):
+        """
+        Gets the indices of the tiles changed since the terrain version, oldest first.
+
+        Returns:
+            The list of indices, None if the changes are no longer kept.
+        """
+        if terrain_version is None:
+            return None
+        count = self.terrain_version - terrain_version
+        if count == 0:
+            return []
+        if not 0 < count <= len(self._terrain_changes):
+            return None
+        return list(self._terrain_changes)[-count:]
+
+    def update_point(self, point):
+        """
+        Updates every layer at the point after its terrain or dungeon feature has changed.
+        """
+        x, y = point
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            return
+        index = y * self.width + x
+        self.terrain_version += 1
+        self._terrain_changes.append(index)
+        self._region_versions[(y >> REGION_SHIFT) * self._region_columns +
+                              (x >> REGION_SHIFT)] = self.terrain_version
+        if not self._transparent is None:
+            self._transparent[index] = self._is_transparent(point)
+        for terrain_signature, walkable in self._walkable.iteritems():
+            is_walkable = self._is_walkable(point, terrain_signature)
+            if walkable[index] != is_walkable and terrain_signature in self._room_maps:
+                self._room_maps[terrain_signature].set_walkable(x, y, is_walkable)
+            walkable[index] = is_walkable
+        if not self._fov_map is None:
+            self._fov_map.set_transparent(x, y, self.transparent[index])
+        for terrain_signature, path_map in self._maps.iteritems():
+            path_map.set_walkable(x, y, self._walkable[terrain_signature][index])
+        for region_map in self._regions.itervalues():
+            region_map.update_point(point)
+
+    def get_fov(self, origin, radius, light_walls=True):
+        """
+        Gets the field of view from origin as visibility bits.
+
+        The bits cover the square window of side 2 * radius + 1 centered on origin, in row order,
+        tile i of the window is visible if bit i & 7 of byte i >> 3 is set.
+        They are shared with everyone asking for the same view and must not be modified.
+        """
+        key = (origin, radius, light_walls, self._window_version(origin, radius, self._region_versions))
+        fov = self._fov_cache.pop(key, None)
+        if fov is None:
+            self.fov_cache_misses += 1
+            if len(self._fov_cache) >= FOV_CACHE_SIZE:
+                self._fov_cache.popitem(last=False)
+            self._fov_scratch = self.compute_fov(origin, radius, self._fov_scratch, light_walls)
+            fov = pack_bits(self._fov_scratch)
+        else:
+            self.fov_cache_hits += 1
+        self._fov_cache[key] = fov
+        return fov
+
+    def compute_fov(self, origin, radius, fov_buffer, light_walls=True):
+        """
+        Computes the field of view from origin and writes it to fov_buffer, one byte per tile.
+
+        The buffer is reused if it already has the size of the window,
+        otherwise a new one is returned.
+        """
+        return self.fov_map.compute_fov(origin, radius, light_walls, fov_buffer)
+
+    def request_fov(self, observer, origin, radius, light_walls=True):
+        """
+        Queues the field of view of an observer, it is computed when the batch is flushed.
+
+        A newer request of the same observer replaces the queued one.
+        """
+        self._fov_requests[observer] = (origin, radius, light_walls)
+
+    def flush_fov_requests(self):
+        """
+        Computes the queued fields of view and hands them to the dungeon masks of the observers.
+
+        Each distinct request is computed once, one view at a time through get_fov,
+        requests identical to another one in the batch only share its result.
+        """
+        if not self._fov_requests:
+            return
+        requests = self._fov_requests
+        self._fov_requests = {}
+        views = {}
+        for observer, request in requests.iteritems():
+            if request in views:
+                self.fov_duplicate_requests += 1
+            else:
+                views[request] = self.get_fov(*request)
+            origin, radius, _ = request
+            self._set_observer_view(observer, origin, radius, views[request])
+            observer.dungeon_mask.set_fov(origin, radius, views[request])
+
+    def _set_observer_view(self, observer, origin, radius, fov):
+        """
+        Sets the field of view of an observer in the reverse visibility index.
+        """
+        old_view = self._observed.get(observer)
+        if not old_view is None and old_view[0] == origin and old_view[1] is fov:
+            return
+        self._remove_observer_view(observer)
+        x, y = origin
+        observed = []
+        index = 0
+        for window_y in range(y - radius, y + radius + 1):
+            for window_x in range(x - radius, x + radius + 1):
+                if ((fov[index >> 3] >> (index & 7)) & 1 and
+                        0 <= window_x < self.width and 0 <= window_y < self.height):
+                    observed.append(window_y * self.width + window_x)
+                index += 1
+        for tile_index in observed:
+            if tile_index in self._observers:
+                self._observers[tile_index].add(observer)
+            else:
+                self._observers[tile_index] = set([observer])
+        self._observed[observer] = (origin, fov, observed)
+
+    def remove_observer(self, observer):
+        """
+        Removes an observer from the reverse visibility index and drops its queued field of view.
+        """
+        self._fov_requests.pop(observer, None)
+        self._remove_observer_view(observer)
+
+    def _remove_observer_view(self, observer):
+        _, _, observed = self._observed.pop(observer, (None, None, []))
+        for tile_index in observed:
+            observers = self._observers[tile_index]
+            observers.discard(observer)
+            if not observers:
+                del self._observers[tile_index]
+
+    def get_observers(self, point):
+        """
+        Gets the entities whose field of view covers the point, the set must not be modified.
+        """
+        self.flush_fov_requests()
+        x, y = point
+        return self._observers.get(y * self.width + x, _NO_OBSERVERS)
+
+    def signal_entity_moved(self, point):
+        """
+        Marks the region of the point as changed after an entity entered or left it.
+        """
+        x, y = point
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            return
+        self.entity_version += 1
+        self._entity_region_versions[(y >> REGION_SHIFT) * self._region_columns +
+                                     (x >> REGION_SHIFT)] = self.entity_version
+
+    def get_entity_window_version(self, origin, radius):
+        """
+        Gets the newest version of the regions covered by the window,
+        it changes when an entity enters or leaves the window.
+        """
+        return self._window_version(origin, radius, self._entity_region_versions)
+
+    def _window_version(self, origin, radius, region_versions):
+        x, y = origin
+        left = max(x - radius, 0) >> REGION_SHIFT
+        right = min(x + radius, self.width - 1) >> REGION_SHIFT
+        top = max(y - radius, 0) >> REGION_SHIFT
+        bottom = min(y + radius, self.height - 1) >> REGION_SHIFT
+        version = 0
+        for region_y in range(top, bottom + 1):
+            row = region_y * self._region_columns
+            for region_x in range(left, right + 1):
+                version = max(version, region_versions[row + region_x])
+        return version
+
+    def _new_layer(self, tile_value):
+        """
+        Creates a layer of one byte per tile holding tile_value of the tile.
+
+        Untouched chunks all read as the sentinel tile, so only touched chunks are
+        visited and the cost follows the carved area rather than the level size.
+        """
+        layer = bytearray([tile_value(self.dungeon_level.get_untouched_tile())]) * (self.width * self.height)
+        for point in self._get_touched_points():
+            x, y = point
+            layer[y * self.width + x] = tile_value(self.dungeon_level.get_tile_or_unknown(point))
+        return layer
+
+    def _get_touched_points(self):
+        for left, top, right, bottom in self.dungeon_level.tile_matrix.touched_chunk_bounds():
+            for y in range(top, bottom):
+                for x in range(left, right):
+                    yield x, y
+
+    def _is_transparent(self, point):
+        return self._is_tile_transparent(self.dungeon_level.get_tile_or_unknown(point))
+
+    def _is_tile_transparent(self, the_tile):
+        terrain = the_tile.get_terrain()
+        dungeon_feature = the_tile.get_dungeon_feature()
+        is_opaque = terrain.has("is_opaque") or (dungeon_feature and dungeon_feature.has("is_opaque"))
+        return 0 if is_opaque else 1
+
+    def _is_walkable(self, point, terrain_signature):
+        return self._is_tile_walkable(self.dungeon_level.get_tile_or_unknown(point), terrain_signature)
+
+    def _is_tile_walkable(self, the_tile, terrain_signature):
+        return 1 if can_pass_terrain_with_signature(the_tile.get_terrain(), terrain_signature) else 0
+
+    def _get_danger_cost(self, point, danger_signature):
+        cloud = self.dungeon_level.get_tile_or_unknown(point).get_first_cloud()
+        return DANGER_COST if cloud and is_cloud_dangerous_with_signature(cloud, danger_signature) else 0
+
+
+def pack_bits(fov_buffer):
+    """
+    Packs a field of view of one byte per tile into visibility bits.
+    """
+    bits = bytearray((len(fov_buffer) + 7) >> 3)
+    for index, is_visible in enumerate(fov_buffer):
+        if is_visible:
+            bits[index >> 3] |= 1 << (index & 7)
+    return bits
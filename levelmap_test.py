@@ -0,0 +1,175 @@
+import unittest
+from attacker import DamageTypes
+import cloud
+import dungeongenerator
+import dungeonlevelfactory
+import levelmap
+from mover import NO_TERRAIN_CAPABILITIES
+from roomgraph import RoomGraph
+import terrain
+from tilechunk import CHUNK_SIZE
+
+
+WALKER_DANGER = (False, frozenset())
+POISON_TOLERANT_DANGER = (False, frozenset([DamageTypes.POISON]))
+
+
+def level_from_lines(lines):
+    return dungeonlevelfactory.dungeon_level_from_lines(lines)
+
+
+def danger_at(level_map, danger_signature, point):
+    x, y = point
+    return level_map.get_danger(danger_signature)[y * level_map.width + x]
+
+
+class TestComposition(unittest.TestCase):
+
+    def setUp(self):
+        self.dungeon_level = level_from_lines(["#######",
+                                               "#.....#",
+                                               "#.###.#",
+                                               "#.....#",
+                                               "#######"])
+        self.level_map = self.dungeon_level.level_map
+
+    def add_cloud(self, new_cloud, position):
+        new_cloud.mover.try_move(position, self.dungeon_level)
+        return new_cloud
+
+    def compute_path(self, danger_signature):
+        return self.level_map.compute_path(NO_TERRAIN_CAPABILITIES, (1, 1), (5, 1), danger_signature)
+
+    def test_danger_layer_follows_clouds_entering_and_leaving(self):
+        self.assertEqual(danger_at(self.level_map, WALKER_DANGER, (3, 1)), 0)
+        fire = self.add_cloud(cloud.new_fire_cloud(None, 10), (3, 1))
+        self.assertEqual(danger_at(self.level_map, WALKER_DANGER, (3, 1)), levelmap.DANGER_COST)
+        fire.mover.try_move((3, 3))
+        self.assertEqual(danger_at(self.level_map, WALKER_DANGER, (3, 1)), 0)
+        self.assertEqual(danger_at(self.level_map, WALKER_DANGER, (3, 3)), levelmap.DANGER_COST)
+        fire.mover.try_remove_from_dungeon()
+        self.assertEqual(danger_at(self.level_map, WALKER_DANGER, (3, 3)), 0)
+
+    def test_only_untolerated_damage_types_are_dangerous(self):
+        self.add_cloud(cloud.new_poison_cloud(None, 10), (3, 1))
+        self.add_cloud(cloud.new_steam_cloud(None, 10), (3, 3))
+        self.assertEqual(danger_at(self.level_map, WALKER_DANGER, (3, 1)), levelmap.DANGER_COST)
+        self.assertEqual(danger_at(self.level_map, POISON_TOLERANT_DANGER, (3, 1)), 0)
+        self.assertEqual(danger_at(self.level_map, WALKER_DANGER, (3, 3)), 0)
+
+    def test_path_goes_around_danger_on_its_route(self):
+        self.add_cloud(cloud.new_poison_cloud(None, 10), (3, 1))
+        path = self.compute_path(WALKER_DANGER)
+        self.assertFalse((3, 1) in path)
+        self.assertEqual(path[-1], (5, 1))
+        self.assertEqual(self.level_map.danger_paths, 1)
+
+    def test_path_ignores_danger_off_its_route(self):
+        self.add_cloud(cloud.new_poison_cloud(None, 10), (3, 3))
+        self.assertEqual(self.compute_path(WALKER_DANGER), [(2, 1), (3, 1), (4, 1), (5, 1)])
+        self.assertEqual(self.level_map.danger_paths, 0)
+
+    def test_path_goes_through_tolerated_danger(self):
+        self.add_cloud(cloud.new_poison_cloud(None, 10), (3, 1))
+        self.assertEqual(self.compute_path(POISON_TOLERANT_DANGER), [(2, 1), (3, 1), (4, 1), (5, 1)])
+        self.assertEqual(self.level_map.danger_paths, 0)
+
+    def test_room_map_is_patched_when_terrain_changes(self):
+        dungeon_level = level_from_lines(["######################",
+                                          "#....................#",
+                                          "#....................#",
+                                          "######################"])
+        dungeon_level.room_graph = RoomGraph()
+        dungeon_level.room_graph.add_edge((3, 1), (18, 1))
+        level_map = dungeon_level.level_map
+        self.assertEqual(len(level_map.compute_path(NO_TERRAIN_CAPABILITIES, (1, 1), (20, 1))), 19)
+        room_map = level_map._get_room_map(NO_TERRAIN_CAPABILITIES)
+
+        terrain.Wall().mover.replace_move((10, 1), dungeon_level)
+        dungeon_level.signal_terrain_changed((10, 1))
+        path = level_map.compute_path(NO_TERRAIN_CAPABILITIES, (1, 1), (20, 1))
+        self.assertTrue(level_map._get_room_map(NO_TERRAIN_CAPABILITIES) is room_map)
+        self.assertFalse((10, 1) in path)
+        self.assertEqual(len(path), 19)
+        self.assertEqual(level_map.hierarchical_paths, 2)
+
+    def test_layers_are_shared_and_follow_terrain_changes(self):
+        walkable = self.level_map.get_walkable(NO_TERRAIN_CAPABILITIES)
+        self.assertTrue(self.level_map.get_walkable(NO_TERRAIN_CAPABILITIES) is walkable)
+        index = 1 * self.level_map.width + 3
+        self.assertEqual((walkable[index], self.level_map.transparent[index]), (1, 1))
+        terrain.Wall().mover.replace_move((3, 1), self.dungeon_level)
+        self.dungeon_level.signal_terrain_changed((3, 1))
+        self.assertEqual((walkable[index], self.level_map.transparent[index]), (0, 0))
+        self.assertFalse((3, 1) in self.compute_path(None))
+
+    def test_layers_of_a_lazy_level_only_visit_touched_chunks(self):
+        dungeon_level = dungeongenerator.get_full_wall_dungeon(CHUNK_SIZE * 4, CHUNK_SIZE * 4, 1)
+        for x in range(CHUNK_SIZE + 2, CHUNK_SIZE + 6):
+            terrain.Floor().mover.replace_move((x, CHUNK_SIZE + 3), dungeon_level)
+        level_map = dungeon_level.level_map
+        index = (CHUNK_SIZE + 3) * level_map.width + CHUNK_SIZE + 2
+        walkable = level_map.get_walkable(NO_TERRAIN_CAPABILITIES)
+        self.assertEqual((walkable[index], level_map.transparent[index]), (1, 1))
+        self.assertEqual(sum(walkable), 4)
+        self.assertEqual(sum(level_map.transparent), 4)
+        regions = level_map.get_regions(NO_TERRAIN_CAPABILITIES)
+        self.assertEqual(len(regions.get_region_positions((CHUNK_SIZE + 2, CHUNK_SIZE + 3))), 4)
+        self.assertEqual(dungeon_level.tile_matrix.number_of_materialised_chunks(), 1)
+
+    def test_doors_are_walkable_only_for_movers_opening_them(self):
+        dungeon_level = level_from_lines(["#####",
+                                          "#.+.#",
+                                          "#####"])
+        index = 1 * 5 + 2
+        self.assertEqual(dungeon_level.level_map.get_walkable((False, False))[index], 0)
+        self.assertEqual(dungeon_level.level_map.get_walkable((False, True))[index], 1)
+
+    def test_same_view_is_served_from_the_cache(self):
+        fov = self.level_map.get_fov((3, 1), 2)
+        self.assertTrue(self.level_map.get_fov((3, 1), 2) is fov)
+        self.assertEqual((self.level_map.fov_cache_hits, self.level_map.fov_cache_misses), (1, 1))
+        self.assertFalse(self.level_map.get_fov((3, 1), 3) is fov)
+
+    def test_terrain_change_invalidates_only_views_covering_its_region(self):
+        dungeon_level = level_from_lines(["##############################",
+                                          "#............................#",
+                                          "##############################"])
+        level_map = dungeon_level.level_map
+        fov = level_map.get_fov((2, 1), 2)
+        dungeon_level.signal_terrain_changed((25, 1))
+        self.assertTrue(level_map.get_fov((2, 1), 2) is fov)
+        terrain.Wall().mover.replace_move((3, 1), dungeon_level)
+        dungeon_level.signal_terrain_changed((3, 1))
+        new_fov = level_map.get_fov((2, 1), 2)
+        self.assertNotEqual(new_fov, fov)
+        self.assertEqual(level_map.fov_cache_misses, 2)
+
+    def test_least_recently_used_view_is_dropped(self):
+        for radius in range(1, levelmap.FOV_CACHE_SIZE + 1):
+            self.level_map.get_fov((1, 1), radius)
+        self.level_map.get_fov((1, 1), 1)
+        self.level_map.get_fov((1, 1), levelmap.FOV_CACHE_SIZE + 1)
+        misses = self.level_map.fov_cache_misses
+        self.level_map.get_fov((1, 1), 1)
+        self.assertEqual(self.level_map.fov_cache_misses, misses)
+        self.level_map.get_fov((1, 1), 2)
+        self.assertEqual(self.level_map.fov_cache_misses, misses + 1)
+
+    def test_packed_bits_hold_every_tile(self):
+        fov_buffer = bytearray([1, 0, 0, 1, 1, 0, 0, 0, 1, 1, 0])
+        bits = levelmap.pack_bits(fov_buffer)
+        self.assertEqual(len(bits), 2)
+        self.assertEqual([(bits[index >> 3] >> (index & 7)) & 1 for index in range(len(fov_buffer))],
+                         list(fov_buffer))
+
+    def test_terrain_changes_are_kept_since_a_version(self):
+        terrain_version = self.level_map.terrain_version
+        self.assertEqual(self.level_map.get_terrain_changes(terrain_version), [])
+        self.dungeon_level.signal_terrain_changed((3, 1))
+        self.dungeon_level.signal_terrain_changed((1, 2))
+        self.assertEqual(self.level_map.get_terrain_changes(terrain_version), [1 * 7 + 3, 2 * 7 + 1])
+        self.assertEqual(self.level_map.get_terrain_changes(None), None)
+        for _ in range(levelmap.TERRAIN_CHANGE_LOG_SIZE):
+            self.dungeon_level.signal_terrain_changed((3, 3))
+        self.assertEqual(self.level_map.get_terrain_changes(terrain_version), None)
@@ -0,0 +1,360 @@
+"""
+Compact binary snapshots of dungeon levels.
+
+A snapshot holds the terrain layer as one byte per tile, the dungeon features
+and the monsters and items as template ids plus the state that differs from a
+freshly created piece of the same template. Items carried by a monster follow
+the record of the monster and refer back to it.
+
+The player and clouds are left out on purpose, the player is placed on the level
+when it is entered and clouds fade in a few turns. Every other piece needs a
+template id, dumps raises SnapshotError for a piece it could not load again.
+
+Layout, all values in the byte order given by the header:
+    header:     magic, version, byte order, width, height, depth
+    terrain:    width * height terrain kind bytes
+    templates:  count, then length prefixed template id strings
+    features:   count, then FEATURE_RECORD_LENGTH ints per feature
+    pieces:     count, then PIECE_RECORD_LENGTH ints per monster or item
+    rooms:      count, then ROOM_EDGE_RECORD_LENGTH ints per room graph edge, -1 if there is no graph
+"""
+from array import array
+import gc
+import mmap
+import random
+import struct
+import sys
+
+import dungeonfeature
+from equipment import EquipmentSlots
+import item
+import monster
+from monsteractor import TryPutToSleep
+import monstertables
+import roomgraph
+import spawner
+from stats import DataTypes, GamePieceTypes
+from terrainlayer import TerrainLayer, get_terrain_kind, WALL
+
+MAGIC = "TLRL"
+SNAPSHOT_VERSION = 3
+
+_HEADER = struct.Struct("<4sHBiii")
+_COUNT = struct.Struct("<i")
+_LITTLE_ENDIAN = 0
+_BIG_ENDIAN = 1
+
+# Feature record: template index, x, y, flags
+FEATURE_RECORD_LENGTH = 4
+# Piece record: template index, x, y, hp, max hp, flags, charges, stack size, owner record index
+PIECE_RECORD_LENGTH = 9
+NO_VALUE = -1
+# Room graph edge record: x, y, other x, other y
+ROOM_EDGE_RECORD_LENGTH = 4
+NO_ROOM_GRAPH = -1
+
+USED_UP_FLAG = 1
+SLEEPING_FLAG = 2
+EQUIPPED_FLAG = 4
+
+
+class SnapshotError(Exception):
+    """
+    Raised when data can't be read as a level snapshot,
+    or when a level holds a piece that can't be written to one.
+    """
+    pass
+
+
+def _get_templates():
+    """
+    Gets all factories a snapshot piece may be created from, by template id.
+    """
+    tables = [monstertables.dungeon_table, monstertables.dungeon_equipment_table,
+              monstertables.dungeon_usable_item_table]
+    creators = [table_item.creator for table in tables for table_item in table]
+    creators += [item.new_health_potion, monster.new_ratman, monster.new_jericho]
+    return dict((creator.__name__, creator) for creator in creators)
+
+
+def _get_feature_templates():
+    creators = [dungeonfeature.new_stairs_down, dungeonfeature.new_stairs_up,
+                dungeonfeature.new_spider_web, dungeonfeature.new_fountain,
+                dungeonfeature.new_blood_fountain, dungeonfeature.new_plant]
+    return dict((creator.__name__, creator) for creator in creators)
+
+
+def _is_used_up(feature):
+    return (feature.template_id.value in ["new_fountain", "new_blood_fountain"] and
+            not feature.has("drink_action") and not feature.has("sacrifice_fountain_action"))
+
+
+def _piece_flags(piece):
+    flags = 0
+    if piece.has("try_put_to_sleep") or piece.has("sleeping"):
+        flags |= SLEEPING_FLAG
+    return flags
+
+
+def _health_of(piece):
+    if not piece.has("health"):
+        return NO_VALUE, NO_VALUE
+    return piece.health.hp.value, piece.health.hp.max_value
+
+
+def _charges_of(piece):
+    if not piece.has("charge"):
+        return NO_VALUE
+    return piece.charge.charges
+
+
+def _stack_size_of(piece):
+    if not piece.has("stacker"):
+        return NO_VALUE
+    return piece.stacker.size
+
+
+def _carried_items(entity):
+    """
+    Gets the items entity carries as (item, is_equipped) pairs, in a stable order.
+    """
+    carried = []
+    if entity.has("equipment"):
+        for slot in EquipmentSlots.ALL:
+            if entity.equipment.slot_is_equiped(slot):
+                carried.append((entity.equipment.get(slot), True))
+    if entity.has("inventory"):
+        carried.extend((carried_item, False) for carried_item in entity.inventory.items)
+    return carried
+
+
+def dumps(dungeon_level):
+    """
+    Returns the snapshot of the dungeon level as a string.
+
+    Raises SnapshotError if a monster, item or dungeon feature has no template id.
+    """
+    width = dungeon_level.width
+    height = dungeon_level.height
+    terrain_layer = array("B", [WALL]) * (width * height)
+    template_ids = []
+    template_indices = {}
+    features = array("i")
+    pieces = array("i")
+
+    def template_index(piece):
+        if not piece.has(DataTypes.TEMPLATE_ID):
+            raise SnapshotError("A piece without template id can't be written to a snapshot.")
+        template_id = piece.template_id.value
+        if not template_id in template_indices:
+            template_indices[template_id] = len(template_ids)
+            template_ids.append(template_id)
+        return template_indices[template_id]
+
+    def add_piece(piece, x, y, flags, owner):
+        hp, max_hp = _health_of(piece)
+        pieces.extend([template_index(piece), x, y, hp, max_hp, flags,
+                       _charges_of(piece), _stack_size_of(piece), owner])
+
+    for y in range(height):
+        for x in range(width):
+            the_tile = dungeon_level.get_tile_or_unknown((x, y))
+            the_terrain = the_tile.get_terrain()
+            if the_terrain:
+                terrain_layer[y * width + x] = get_terrain_kind(the_terrain)
+            for feature in the_tile.get_dungeon_features():
+                index = template_index(feature)
+                flags = USED_UP_FLAG if _is_used_up(feature) else 0
+                features.extend([index, x, y, flags])
+            for piece in (the_tile.game_pieces[GamePieceTypes.ENTITY] +
+                          the_tile.game_pieces[GamePieceTypes.ITEM]):
+                if not piece.has("is_player"):
+                    owner = len(pieces) / PIECE_RECORD_LENGTH
+                    add_piece(piece, x, y, _piece_flags(piece), NO_VALUE)
+                    for carried_item, is_equipped in _carried_items(piece):
+                        add_piece(carried_item, x, y, EQUIPPED_FLAG if is_equipped else 0, owner)
+
+    byte_order = _LITTLE_ENDIAN if sys.byteorder == "little" else _BIG_ENDIAN
+    chunks = [_HEADER.pack(MAGIC, SNAPSHOT_VERSION, byte_order, width, height, dungeon_level.depth),
+              terrain_layer.tostring(),
+              _COUNT.pack(len(template_ids))]
+    for template_id in template_ids:
+        chunks.append(_COUNT.pack(len(template_id)))
+        chunks.append(template_id)
+    chunks.append(_COUNT.pack(len(features) / FEATURE_RECORD_LENGTH))
+    chunks.append(features.tostring())
+    chunks.append(_COUNT.pack(len(pieces) / PIECE_RECORD_LENGTH))
+    chunks.append(pieces.tostring())
+    if dungeon_level.room_graph is None:
+        chunks.append(_COUNT.pack(NO_ROOM_GRAPH))
+    else:
+        room_edges = array("i")
+        # Sorted, so the same level always gives the same snapshot.
+        for point, other_point in sorted(dungeon_level.room_graph.get_edges()):
+            room_edges.extend(point + other_point)
+        chunks.append(_COUNT.pack(len(room_edges) / ROOM_EDGE_RECORD_LENGTH))
+        chunks.append(room_edges.tostring())
+    return "".join(chunks)
+
+
+def save(dungeon_level, file_name):
+    """
+    Writes the snapshot of the dungeon level to a file.
+    """
+    snapshot_file = open(file_name, "wb")
+    snapshot_file.write(dumps(dungeon_level))
+    snapshot_file.close()
+
+
+def load(file_name, game_state):
+    """
+    Loads a dungeon level from a snapshot file, the file is memory-mapped.
+    """
+    snapshot_file = open(file_name, "rb")
+    try:
+        data = mmap.mmap(snapshot_file.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            return loads(data, game_state)
+        finally:
+            data.close()
+    finally:
+        snapshot_file.close()
+
+
+def loads(data, game_state):
+    """
+    Rebuilds a dungeon level from snapshot data, a string or a memory map.
+
+    Raises SnapshotError if the data is not a snapshot of this version
+    or refers to templates, features or owners it doesn't hold.
+    """
+    reader = _SnapshotReader(data)
+    magic, version, byte_order, width, height, depth = reader.unpack(_HEADER)
+    if magic != MAGIC:
+        raise SnapshotError("Data is not a level snapshot.")
+    if version != SNAPSHOT_VERSION:
+        raise SnapshotError("Level snapshot version {0} is not supported, "
+                            "expected {1}.".format(version, SNAPSHOT_VERSION))
+    swap = byte_order != (_LITTLE_ENDIAN if sys.byteorder == "little" else _BIG_ENDIAN)
+
+    terrain_layer = reader.array("B", width * height, False)
+    template_ids = [reader.string() for _ in range(reader.count())]
+    features = reader.array("i", reader.count() * FEATURE_RECORD_LENGTH, swap)
+    pieces = reader.array("i", reader.count() * PIECE_RECORD_LENGTH, swap)
+    room_edge_count = reader.count()
+    room_edges = reader.array("i", max(room_edge_count, 0) * ROOM_EDGE_RECORD_LENGTH, swap)
+
+    layer = TerrainLayer(width, height)
+    layer.kinds = bytearray(terrain_layer.tostring())
+    # A level is thousands of new composites that all stay alive, collecting
+    # garbage while they are created only walks them again and again.
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    # Templates may roll random state, which is overwritten from the snapshot,
+    # loading must not change the random stream of the game.
+    random_state = random.getstate()
+    try:
+        dungeon_level = layer.new_dungeon_level(depth)
+        _add_features(dungeon_level, features, template_ids)
+        _add_pieces(dungeon_level, pieces, template_ids, game_state)
+    except (KeyError, IndexError) as error:
+        raise SnapshotError("Level snapshot refers to a missing record: {0!r}.".format(error))
+    finally:
+        random.setstate(random_state)
+        if gc_was_enabled:
+            gc.enable()
+    if room_edge_count != NO_ROOM_GRAPH:
+        dungeon_level.room_graph = _get_room_graph(room_edges)
+    return dungeon_level
+
+
+def _add_features(dungeon_level, features, template_ids):
+    feature_templates = _get_feature_templates()
+    for index in range(0, len(features), FEATURE_RECORD_LENGTH):
+        template_index, x, y, flags = features[index:index + FEATURE_RECORD_LENGTH]
+        feature = feature_templates[template_ids[template_index]]()
+        feature.mover.replace_move((x, y), dungeon_level)
+        if flags & USED_UP_FLAG:
+            action = feature.drink_action if feature.has("drink_action") else feature.sacrifice_fountain_action
+            action._dry_up_fountain()
+
+
+def _add_pieces(dungeon_level, pieces, template_ids, game_state):
+    templates = _get_templates()
+    loaded_pieces = []
+    for index in range(0, len(pieces), PIECE_RECORD_LENGTH):
+        (template_index, x, y, hp, max_hp, flags,
+         charges, stack_size, owner) = pieces[index:index + PIECE_RECORD_LENGTH]
+        piece = spawner.new_from_template(templates[template_ids[template_index]], game_state)
+        loaded_pieces.append(piece)
+        if hp != NO_VALUE and piece.has("health"):
+            piece.health.hp.max_value = max_hp
+            piece.health.hp.value = hp
+        if charges != NO_VALUE and piece.has("charge"):
+            piece.charge.charges = charges
+        if stack_size != NO_VALUE and piece.has("stacker"):
+            piece.stacker.size = stack_size
+        if flags & SLEEPING_FLAG:
+            piece.set_child(TryPutToSleep())
+        if owner == NO_VALUE:
+            _drop_carried_items(piece)
+            piece.mover.try_move((x, y), dungeon_level)
+        elif flags & EQUIPPED_FLAG:
+            loaded_pieces[owner].equipment.force_equip(piece)
+        else:
+            loaded_pieces[owner].inventory.add_item_no_stack(piece)
+
+
+def _drop_carried_items(entity):
+    """
+    Removes the items a template gave entity, the snapshot holds the ones it carried.
+    """
+    for carried_item, is_equipped in _carried_items(entity):
+        if is_equipped:
+            for slot in EquipmentSlots.ALL:
+                if entity.equipment.get(slot) is carried_item:
+                    entity.equipment.unequip(slot)
+        else:
+            entity.inventory.remove_item(carried_item)
+
+
+def _get_room_graph(room_edges):
+    room_graph = roomgraph.RoomGraph()
+    for index in range(0, len(room_edges), ROOM_EDGE_RECORD_LENGTH):
+        x, y, other_x, other_y = room_edges[index:index + ROOM_EDGE_RECORD_LENGTH]
+        room_graph.add_edge((x, y), (other_x, other_y))
+    return room_graph
+
+
+class _SnapshotReader(object):
+    def __init__(self, data):
+        self._data = data
+        self._offset = 0
+
+    def unpack(self, packer):
+        if self._offset + packer.size > len(self._data):
+            raise SnapshotError("Level snapshot is truncated.")
+        values = packer.unpack_from(self._data, self._offset)
+        self._offset += packer.size
+        return values
+
+    def count(self):
+        return self.unpack(_COUNT)[0]
+
+    def string(self):
+        length = self.count()
+        return self._read(length)
+
+    def array(self, type_code, length, swap):
+        result = array(type_code)
+        result.fromstring(self._read(length * result.itemsize))
+        if swap:
+            result.byteswap()
+        return result
+
+    def _read(self, length):
+        if self._offset + length > len(self._data):
+            raise SnapshotError("Level snapshot is truncated.")
+        data = self._data[self._offset:self._offset + length]
+        self._offset += length
+        return data
@@ -0,0 +1,114 @@
+import random
+import unittest
+import cloud
+import dungeonlevelfactory
+import item
+import levelsnapshot
+import monster
+import spawner
+from stats import GamePieceTypes
+import weapon
+
+
+def level_from_lines(lines):
+    return dungeonlevelfactory.dungeon_level_from_lines(lines)
+
+
+def pieces_on_level(dungeon_level):
+    pieces = []
+    for y in range(dungeon_level.height):
+        for x in range(dungeon_level.width):
+            the_tile = dungeon_level.get_tile((x, y))
+            pieces.extend(the_tile.game_pieces[GamePieceTypes.ENTITY] + the_tile.game_pieces[GamePieceTypes.ITEM])
+    return pieces
+
+
+def pieces_by_template(dungeon_level):
+    return dict((piece.template_id.value, piece) for piece in pieces_on_level(dungeon_level))
+
+
+class TestComposition(unittest.TestCase):
+
+    def setUp(self):
+        self.dungeon_level = level_from_lines(["#####",
+                                               "#...#",
+                                               "#...#",
+                                               "#####"])
+
+    def round_trip(self):
+        return levelsnapshot.loads(levelsnapshot.dumps(self.dungeon_level), None)
+
+    def test_terrain_survives_round_trip(self):
+        loaded_level = self.round_trip()
+        self.assertEqual((loaded_level.width, loaded_level.height), (5, 4))
+        self.assertTrue(loaded_level.get_tile((0, 0)).get_terrain().has("is_solid"))
+        self.assertFalse(loaded_level.get_tile((1, 1)).get_terrain().has("is_solid"))
+
+    def test_rolled_charges_and_stack_sizes_survive_round_trip(self):
+        device = spawner.new_from_template(item.new_zap_device, None)
+        device.charge.charges = 6
+        ammunition = spawner.new_from_template(item.new_ammunition, None)
+        ammunition.stacker.size = 9
+        device.mover.try_move((1, 1), self.dungeon_level)
+        ammunition.mover.try_move((2, 1), self.dungeon_level)
+
+        loaded_pieces = pieces_by_template(self.round_trip())
+        self.assertEqual(loaded_pieces["new_zap_device"].charge.charges, 6)
+        self.assertEqual(loaded_pieces["new_zap_device"].position.value, (1, 1))
+        self.assertEqual(loaded_pieces["new_ammunition"].stacker.size, 9)
+
+    def test_carried_items_survive_round_trip(self):
+        ratman = spawner.new_from_template(monster.new_ratman, None)
+        ratman.health.hp.value = 1
+        dagger = spawner.new_from_template(weapon.new_dagger, None)
+        device = spawner.new_from_template(item.new_zap_device, None)
+        device.charge.charges = 5
+        ratman.equipment.force_equip(dagger)
+        ratman.inventory.add_item_no_stack(device)
+        ratman.mover.try_move((3, 2), self.dungeon_level)
+
+        loaded_level = self.round_trip()
+        self.assertEqual([piece.template_id.value for piece in pieces_on_level(loaded_level)], ["new_ratman"])
+        loaded_ratman = pieces_by_template(loaded_level)["new_ratman"]
+        self.assertEqual(loaded_ratman.health.hp.value, 1)
+        self.assertEqual([carried.template_id.value for carried in loaded_ratman.inventory.items],
+                         ["new_zap_device"])
+        self.assertEqual(loaded_ratman.inventory.items[0].charge.charges, 5)
+        equipped = [piece for piece in loaded_ratman.equipment._equipment.values() if piece]
+        self.assertEqual([piece.template_id.value for piece in equipped], ["new_dagger"])
+
+    def test_loading_does_not_change_random_stream(self):
+        for _ in range(3):
+            device = spawner.new_from_template(item.new_zap_device, None)
+            device.mover.try_move((1, 2), self.dungeon_level)
+        data = levelsnapshot.dumps(self.dungeon_level)
+        random.seed(3)
+        expected = random.random()
+        random.seed(3)
+        levelsnapshot.loads(data, None)
+        self.assertEqual(random.random(), expected)
+
+    def test_other_data_is_rejected(self):
+        self.assertRaises(levelsnapshot.SnapshotError, levelsnapshot.loads, "not a snapshot at all", None)
+        data = levelsnapshot.dumps(self.dungeon_level)
+        self.assertRaises(levelsnapshot.SnapshotError, levelsnapshot.loads, data[:-3], None)
+
+    def test_snapshot_of_unknown_template_is_rejected(self):
+        spawner.new_from_template(item.new_zap_device, None).mover.try_move((1, 1), self.dungeon_level)
+        data = levelsnapshot.dumps(self.dungeon_level).replace("new_zap_device", "new_zap_devicX")
+        self.assertRaises(levelsnapshot.SnapshotError, levelsnapshot.loads, data, None)
+
+    def test_clouds_are_left_out(self):
+        self.assertTrue(cloud.new_poison_cloud(None, 10).mover.try_move((2, 2), self.dungeon_level))
+        loaded_level = self.round_trip()
+        self.assertEqual(loaded_level.get_tile((2, 2)).game_pieces[GamePieceTypes.CLOUD], [])
+
+    def test_piece_without_template_id_is_rejected(self):
+        monster.new_ratman(None).mover.try_move((1, 1), self.dungeon_level)
+        self.assertRaises(levelsnapshot.SnapshotError, levelsnapshot.dumps, self.dungeon_level)
+
+    def test_carried_item_without_template_id_is_rejected(self):
+        ratman = spawner.new_from_template(monster.new_ratman, None)
+        ratman.inventory.add_item_no_stack(item.new_zap_device(None))
+        ratman.mover.try_move((1, 1), self.dungeon_level)
+        self.assertRaises(levelsnapshot.SnapshotError, levelsnapshot.dumps, self.dungeon_level)
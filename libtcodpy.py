@@ -39,26 +39,59 @@ try:  #import NumPy if available
 except ImportError:
     numpy_available = False
 
+class _MissingLibrary(object):
+    """
+    Stands in for the native library when it can't be loaded.
+
+    The module can still be imported, so the engine runs headless, calling any
+    libtcod function raises the error the library failed to load with.
+    """
+    def __init__(self, error):
+        self.error = error
+
+    def __getattr__(self, name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        function = _MissingFunction(self.error)
+        setattr(self, name, function)
+        return function
+
+
+class _MissingFunction(object):
+    def __init__(self, error):
+        self.error = error
+
+    def __call__(self, *args):
+        raise self.error
+
+
 LINUX=False
 MAC=False
 MINGW=False
 MSVC=False
-if sys.platform.find('linux') != -1:
-    _lib = ctypes.cdll['./libtcod.so']
-    LINUX=True
-elif sys.platform.find('darwin') != -1:
-    _lib = ctypes.cdll['./libtcod.dylib']
-    MAC = True
-elif sys.platform.find('haiku') != -1:
-    _lib = ctypes.cdll['./libtcod.so']
-    HAIKU = True
-else:
-    try:
-        _lib = ctypes.cdll['./libtcod-mingw.dll']
-        MINGW=True
-    except WindowsError:
-        _lib = ctypes.cdll['./libtcod-VS.dll']
-        MSVC=True
+try:
+    if sys.platform.find('linux') != -1:
+        _lib = ctypes.cdll['./libtcod.so']
+        LINUX=True
+    elif sys.platform.find('darwin') != -1:
+        _lib = ctypes.cdll['./libtcod.dylib']
+        MAC = True
+    elif sys.platform.find('haiku') != -1:
+        _lib = ctypes.cdll['./libtcod.so']
+        HAIKU = True
+    else:
+        try:
+            _lib = ctypes.cdll['./libtcod-mingw.dll']
+            MINGW=True
+        except WindowsError:
+            _lib = ctypes.cdll['./libtcod-VS.dll']
+            MSVC=True
+    available = True
+except OSError as load_error:
+    _lib = _MissingLibrary(load_error)
+    available = False
+
+if MINGW or MSVC:
     # On Windows, ctypes doesn't work well with function returning structs,
     # so we have to user the _wrapper functions instead
     _lib.TCOD_color_multiply = _lib.TCOD_color_multiply_wrapper
@@ -7,11 +7,14 @@ import statestack
 import menufactory
 
 
-logging.basicConfig(filename="debug.log", level=logging.DEBUG, filemode="w")
-init.init_libtcod()
+# Dungeon levels are generated in worker processes, which import this module
+# again on platforms without fork, they must not start a game of their own.
+if __name__ == "__main__":
+    logging.basicConfig(filename="debug.log", level=logging.DEBUG, filemode="w")
+    init.init_libtcod()
 
-main_state_stack = statestack.StateStack()
-main_menu = menufactory.title_screen(main_state_stack, gamestate.GameState, gamestate.TestGameState)
-main_state_stack.push(main_menu)
-main_state_stack.main_loop()
-main_state_stack.main_loop()
\ No newline at end of file
+    main_state_stack = statestack.StateStack()
+    main_menu = menufactory.title_screen(main_state_stack, gamestate.GameState, gamestate.TestGameState)
+    main_state_stack.push(main_menu)
+    main_state_stack.main_loop()
+    main_state_stack.main_loop()
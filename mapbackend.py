@@ -0,0 +1,184 @@
+"""
+Backends computing field of view and paths on the layers of a LevelMap,
+and holding the off screen consoles dungeon levels are drawn to.
+
+The libtcod backend is used when the native library can be loaded, otherwise
+the pure Python backend is, so the engine can run headless and in tests.
+Both backends use libtcod's restrictive shadowcasting and give the same field of view.
+The Python backend finds paths by jump point search, the libtcod backend by
+libtcod's A*. Long paths are planned over the room graph of the level and
+searched for by jump point search whichever backend is in use, see roomgraph.
+The Python backend has no consoles, levels can't be drawn with it.
+"""
+import fov
+import pathfinding
+
+
+class PythonBackend(object):
+    """
+    Computes field of view and paths in pure Python.
+    """
+    name = "python"
+
+    def new_fov_map(self, width, height, transparent):
+        return PythonFovMap(width, height, transparent)
+
+    def new_path_map(self, width, height, walkable):
+        return PythonPathMap(width, height, walkable)
+
+    def new_console(self, width, height):
+        return None
+
+    def blit_console(self, console, source_position, width, height):
+        pass
+
+    def clear_console(self, console):
+        pass
+
+
+class PythonFovMap(object):
+    def __init__(self, width, height, transparent):
+        self.width = width
+        self.height = height
+        self.transparent = transparent
+
+    def set_transparent(self, x, y, is_transparent):
+        self.transparent[y * self.width + x] = is_transparent
+
+    def compute_fov(self, origin, radius, light_walls, fov_buffer):
+        return fov.compute_fov(self.transparent, self.width, self.height,
+                               origin, radius, light_walls, fov_buffer)
+
+
+class PythonPathMap(object):
+    """
+    Finds paths by jump point search, every step, also diagonal, costs the same.
+    """
+    def __init__(self, width, height, walkable):
+        self.width = width
+        self.height = height
+        self.walkable = walkable
+
+    def set_walkable(self, x, y, is_walkable):
+        self.walkable[y * self.width + x] = is_walkable
+
+    def compute_path(self, start, destination):
+        return pathfinding.jump_point_search(self.walkable, self.width, self.height, start, destination)
+
+
+class LibtcodBackend(object):
+    """
+    Computes field of view and paths with the native libtcod library.
+
+    Raises OSError or ImportError on creation if libtcod can't be loaded.
+    """
+    name = "libtcod"
+
+    def __init__(self):
+        import libtcodpy
+        if not libtcodpy.available:
+            raise OSError("The libtcod library could not be loaded.")
+        self.libtcod = libtcodpy
+
+    def new_fov_map(self, width, height, transparent):
+        return LibtcodFovMap(self.libtcod, width, height, transparent)
+
+    def new_path_map(self, width, height, walkable):
+        return LibtcodPathMap(self.libtcod, width, height, walkable)
+
+    def new_console(self, width, height):
+        return self.libtcod.console_new(width, height)
+
+    def blit_console(self, console, source_position, width, height):
+        source_x, source_y = source_position
+        self.libtcod.console_blit(console, source_x, source_y, width, height, 0, 0, 0)
+
+    def clear_console(self, console):
+        self.libtcod.console_clear(console)
+
+
+class LibtcodFovMap(object):
+    def __init__(self, libtcod, width, height, transparent):
+        self.libtcod = libtcod
+        self.width = width
+        self.height = height
+        self.map = _new_libtcod_map(libtcod, width, height, transparent, None)
+
+    def set_transparent(self, x, y, is_transparent):
+        self.libtcod.map_set_properties(self.map, x, y, is_transparent, 0)
+
+    def compute_fov(self, origin, radius, light_walls, fov_buffer):
+        window_size = 2 * radius + 1
+        if fov_buffer is None or len(fov_buffer) != window_size * window_size:
+            fov_buffer = bytearray(window_size * window_size)
+        x, y = origin
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            fov_buffer[:] = bytearray(len(fov_buffer))
+            return fov_buffer
+        self.libtcod.map_compute_fov(self.map, x, y, radius, light_walls)
+        index = 0
+        for window_y in range(y - radius, y + radius + 1):
+            for window_x in range(x - radius, x + radius + 1):
+                fov_buffer[index] = (0 <= window_x < self.width and 0 <= window_y < self.height and
+                                     self.libtcod.map_is_in_fov(self.map, window_x, window_y))
+                index += 1
+        return fov_buffer
+
+
+class LibtcodPathMap(object):
+    def __init__(self, libtcod, width, height, walkable):
+        self.libtcod = libtcod
+        self.width = width
+        self.height = height
+        self.map = _new_libtcod_map(libtcod, width, height, None, walkable)
+        self.path = libtcod.path_new_using_map(self.map, 1.0)
+
+    def set_walkable(self, x, y, is_walkable):
+        self.libtcod.map_set_properties(self.map, x, y, 0, is_walkable)
+
+    def compute_path(self, start, destination):
+        libtcod = self.libtcod
+        start_x, start_y = start
+        destination_x, destination_y = destination
+        libtcod.path_compute(self.path, start_x, start_y, destination_x, destination_y)
+        result = []
+        x, y = libtcod.path_walk(self.path, True)
+        while not x is None:
+            result.append((x, y))
+            x, y = libtcod.path_walk(self.path, True)
+        return result
+
+
+def _new_libtcod_map(libtcod, width, height, transparent, walkable):
+    libtcod_map = libtcod.map_new(width, height)
+    for y in range(height):
+        for x in range(width):
+            index = y * width + x
+            libtcod.map_set_properties(libtcod_map, x, y,
+                                       0 if transparent is None else transparent[index],
+                                       0 if walkable is None else walkable[index])
+    return libtcod_map
+
+
+_backend = None
+
+
+def get_backend():
+    """
+    Gets the backend in use, libtcod if it can be loaded.
+    """
+    global _backend
+    if _backend is None:
+        try:
+            _backend = LibtcodBackend()
+        except (ImportError, OSError):
+            _backend = PythonBackend()
+    return _backend
+
+
+def set_backend(backend):
+    """
+    Sets the backend new level maps will use.
+    """
+    global _backend
+    _backend = backend
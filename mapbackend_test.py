@@ -0,0 +1,154 @@
+import random
+import unittest
+import dungeonlevelfactory
+import mapbackend
+import pathfinding
+from mover import NO_TERRAIN_CAPABILITIES
+
+TEST_LEVELS = ["test.level", "small.level", "big.level"]
+
+PILLAR_ROOM = ["###########",
+               "#.........#",
+               "#.........#",
+               "#....#....#",
+               "#.........#",
+               "#.........#",
+               "###########"]
+
+DOOR_ROOMS = ["###########",
+              "#...#.....#",
+              "#...#.....#",
+              "#.........#",
+              "#...#.....#",
+              "#...#.....#",
+              "###########"]
+
+CORNER = ["#######",
+          "#.....#",
+          "####..#",
+          "####..#",
+          "####..#",
+          "#######"]
+
+# Map, origin, radius and the tiles libtcod's restrictive shadowcasting sees, "v" if visible.
+FOV_FIXTURES = [(PILLAR_ROOM, (1, 1), 8, ["vvvvvvvvvv.",
+                                          "vvvvvvvvvv.",
+                                          "vvvvvvvvvv.",
+                                          "vvvvvv.vvv.",
+                                          "vvvvvv...v.",
+                                          "vvvvvvvv...",
+                                          "vvvvvvvvv.."]),
+                (PILLAR_ROOM, (5, 2), 2, ["...vvvvv...",
+                                          "...vvvvv...",
+                                          "...vvvvv...",
+                                          "...vvvvv...",
+                                          "...vv.vv...",
+                                          "...........",
+                                          "..........."]),
+                (DOOR_ROOMS, (2, 3), 8, ["vvvvv......",
+                                         "vvvvv.....v",
+                                         "vvvvv.vvvvv",
+                                         "vvvvvvvvvvv",
+                                         "vvvvv.vvvvv",
+                                         "vvvvv.....v",
+                                         "vvvvv......"]),
+                (CORNER, (1, 1), 6, ["vvvvvvv",
+                                     "vvvvvvv",
+                                     "vvvv.vv",
+                                     ".......",
+                                     ".......",
+                                     "......."])]
+
+
+def layer_from_lines(lines):
+    return bytearray(0 if c == "#" else 1 for line in lines for c in line)
+
+
+def visible_lines(fov_map, lines, origin, radius):
+    fov_buffer = fov_map.compute_fov(origin, radius, True, None)
+    window_size = 2 * radius + 1
+    x, y = origin
+    return ["".join("v" if (abs(map_x - x) <= radius and abs(map_y - y) <= radius and
+                            fov_buffer[(map_y - y + radius) * window_size + map_x - x + radius]) else "."
+                    for map_x in range(len(lines[0])))
+            for map_y in range(len(lines))]
+
+
+class TestComposition(unittest.TestCase):
+    """
+    The pure Python backend should give the same results as libtcod on the test levels.
+    """
+
+    def setUp(self):
+        self.python_backend = mapbackend.PythonBackend()
+        try:
+            self.libtcod_backend = mapbackend.LibtcodBackend()
+        except (ImportError, OSError):
+            self.skipTest("libtcod can't be loaded, there is nothing to compare with.")
+        self.level_maps = [dungeonlevelfactory.dungeon_level_from_file(file_name).level_map
+                           for file_name in TEST_LEVELS]
+
+    def test_field_of_view_is_the_same_as_libtcod(self):
+        for level_map in self.level_maps:
+            python_fov_map = self.python_backend.new_fov_map(level_map.width, level_map.height,
+                                                             level_map.transparent)
+            libtcod_fov_map = self.libtcod_backend.new_fov_map(level_map.width, level_map.height,
+                                                               level_map.transparent)
+            for y in range(level_map.height):
+                for x in range(level_map.width):
+                    for radius in [1, 6, 12]:
+                        self.assertEqual(python_fov_map.compute_fov((x, y), radius, True, None),
+                                         libtcod_fov_map.compute_fov((x, y), radius, True, None))
+
+    def test_path_is_shortest_and_not_longer_than_libtcod(self):
+        """
+        libtcod's straight line heuristic overestimates when diagonal steps cost one,
+        so its paths are sometimes longer than the shortest path jump point search finds.
+        """
+        random.seed(0)
+        for level_map in self.level_maps:
+            walkable = level_map.get_walkable(NO_TERRAIN_CAPABILITIES)
+            python_path_map = self.python_backend.new_path_map(level_map.width, level_map.height, walkable)
+            libtcod_path_map = self.libtcod_backend.new_path_map(level_map.width, level_map.height, walkable)
+            floor = [(index % level_map.width, index / level_map.width)
+                     for index, is_walkable in enumerate(walkable) if is_walkable]
+            for _ in range(50):
+                start, destination = random.choice(floor), random.choice(floor)
+                distances = pathfinding.dijkstra(walkable, level_map.width, level_map.height, [start])
+                shortest = distances[destination[1] * level_map.width + destination[0]]
+                python_path = python_path_map.compute_path(start, destination)
+                self.assertEqual(len(python_path), shortest)
+                self.assertTrue(len(python_path) <= len(libtcod_path_map.compute_path(start, destination)))
+
+    def test_a_star_path_length_is_the_same_as_libtcod(self):
+        random.seed(0)
+        for level_map in self.level_maps:
+            walkable = level_map.get_walkable(NO_TERRAIN_CAPABILITIES)
+            libtcod_path_map = self.libtcod_backend.new_path_map(level_map.width, level_map.height, walkable)
+            floor = [(index % level_map.width, index / level_map.width)
+                     for index, is_walkable in enumerate(walkable) if is_walkable]
+            for _ in range(50):
+                start, destination = random.choice(floor), random.choice(floor)
+                self.assertEqual(len(pathfinding.a_star(walkable, level_map.width, level_map.height,
+                                                        start, destination)),
+                                 len(libtcod_path_map.compute_path(start, destination)))
+
+
+class TestFieldOfView(unittest.TestCase):
+    """
+    Fixed views of libtcod's restrictive shadowcasting, they hold the Python backend
+    to libtcod when the library can't be loaded to compare with.
+    """
+
+    def setUp(self):
+        self.backends = [mapbackend.PythonBackend()]
+        try:
+            self.backends.append(mapbackend.LibtcodBackend())
+        except (ImportError, OSError):
+            pass
+
+    def test_views_are_the_ones_of_libtcod(self):
+        for backend in self.backends:
+            for lines, origin, radius, expected in FOV_FIXTURES:
+                fov_map = backend.new_fov_map(len(lines[0]), len(lines), layer_from_lines(lines))
+                self.assertEqual(visible_lines(fov_map, lines, origin, radius), expected)
@@ -0,0 +1,63 @@
+"""
+Benchmarks the field of view and path finding of the map backends against each other.
+
+Run from the game directory: python mapbackendbenchmark.py
+"""
+import random
+import time
+
+import dungeongenerator
+import dungeonlevelfactory
+import mapbackend
+from mover import NO_TERRAIN_CAPABILITIES
+
+FOV_RADIUS = 6
+SAMPLES = 200
+
+
+def get_backends():
+    backends = [mapbackend.PythonBackend()]
+    try:
+        backends.append(mapbackend.LibtcodBackend())
+    except (ImportError, OSError):
+        print "libtcod could not be loaded, only the Python backend is benchmarked."
+    return backends
+
+
+def benchmark_level(name, level_map, backends):
+    walkable = level_map.get_walkable(NO_TERRAIN_CAPABILITIES)
+    floor = [(index % level_map.width, index / level_map.width)
+             for index, is_walkable in enumerate(walkable) if is_walkable]
+    origins = [random.choice(floor) for _ in range(SAMPLES)]
+    routes = [(random.choice(floor), random.choice(floor)) for _ in range(SAMPLES)]
+    print "{0}: {1}x{2}".format(name, level_map.width, level_map.height)
+
+    results = []
+    for backend in backends:
+        fov_map = backend.new_fov_map(level_map.width, level_map.height, level_map.transparent)
+        start = time.clock()
+        views = [str(fov_map.compute_fov(origin, FOV_RADIUS, True, None)) for origin in origins]
+        fov_time = time.clock() - start
+
+        path_map = backend.new_path_map(level_map.width, level_map.height, walkable)
+        start = time.clock()
+        path_lengths = [len(path_map.compute_path(*route)) for route in routes]
+        path_time = time.clock() - start
+
+        print "    {0:8} fov: {1:.4f}s  path: {2:.4f}s".format(backend.name, fov_time, path_time)
+        results.append((views, path_lengths))
+
+    if len(results) > 1:
+        print "    same fov:", results[0][0] == results[1][0]
+        print "    same path lengths:", results[0][1] == results[1][1]
+
+
+def main():
+    random.seed(0)
+    backends = get_backends()
+    benchmark_level("big.level", dungeonlevelfactory.dungeon_level_from_file("big.level").level_map, backends)
+    benchmark_level("generated", dungeongenerator.generate_dungeon_floor(800, 5).level_map, backends)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,78 +1,202 @@
+from array import array
+
 from compositecore import Leaf, CompositeMessage
-from dungeonlevelfactory import unknown_level_map
-from stats import Flag
-from tile import Tile
+from explorationmap import ExplorationMap
+
+UNKNOWN_GLYPH = 0
 
 
 class MemoryMap(Leaf):
     """
     A representation of the dungeon as seen by an entity.
+
+    Each depth is remembered as an array of glyph ids and a bitset of the seen tiles,
+    only remembered items and dungeon features are kept as references.
     """
     def __init__(self):
         super(MemoryMap, self).__init__()
         self.component_type = "memory_map"
-        self._memory_map = []
-
-    def get_memory_of_map(self, dungeon_level):
-        self._init_memory_map_if_not_set(dungeon_level)
-        return self._memory_map[dungeon_level.depth]
+        self._memory_map = {}
+        self._glyphs = [(' ', None, None)]
+        self._glyph_ids = {(' ', None, None): UNKNOWN_GLYPH}
 
     def has_seen_position(self, position):
-        memory = self._memory_map[self.parent.dungeon_level.value.depth]
-        tile = memory.get_tile_or_unknown(position)
-        return tile.get_terrain() and tile.get_terrain().has("tile_seen")
+        memory = self._get_current_depth_memory()
+        x, y = position
+        if not (0 <= x < memory.width and 0 <= y < memory.height):
+            return False
+        index = y * memory.width + x
+        return (memory.seen[index >> 3] >> (index & 7)) & 1 == 1
 
     def tile_seen(self, position):
-        memory = self._memory_map[self.parent.dungeon_level.value.depth]
-        tile = memory.get_tile_or_unknown(position)
-        if tile.get_terrain() and not tile.get_terrain().has("tile_seen"):
-            tile.get_terrain().set_child(Flag("tile_seen"))
+        memory = self._get_current_depth_memory()
+        x, y = position
+        if 0 <= x < memory.width and 0 <= y < memory.height:
+            memory.mark_seen(y * memory.width + x)
+
+    def update_memory_from_fov(self, dungeon_level):
+        """
+        Writes the memory of the tiles in the field of view of the parent that changed.
+
+        Only tiles that came into view since the last update,
+        or whose content version changed while in view are written.
+        While the field of view stays the same only the tiles in view are checked.
+        """
+        origin, radius, fov = self.parent.dungeon_mask.get_fov_window()
+        memory = self._init_memory_map_if_not_set(dungeon_level)
+        if origin is None:
+            memory.visible = {}
+            memory.window = None
+            return
+        window = (origin, radius, fov)
+        if memory.window == window:
+            self._update_memory_of_visible_tiles(memory)
+            return
+        width = memory.width
+        height = memory.height
+        window_size = 2 * radius + 1
+        origin_x, origin_y = origin
+        old_visible = memory.visible
+        visible = {}
+        window_index = 0
+        for y in range(origin_y - radius, origin_y + radius + 1):
+            for x in range(origin_x - radius, origin_x + radius + 1):
+                if ((fov[window_index >> 3] >> (window_index & 7)) & 1 and
+                        0 <= x < width and 0 <= y < height):
+                    index = y * width + x
+                    tile = dungeon_level.get_seen_tile((x, y))
+                    remembered = old_visible.get(index)
+                    if (remembered is None or not remembered[0] is tile or
+                            remembered[1] != tile.content_version):
+                        self._remember_tile(memory, index, tile)
+                        memory.mark_seen(index)
+                        remembered = (tile, tile.content_version)
+                    visible[index] = remembered
+                window_index += 1
+        memory.visible = visible
+        memory.window = window
+
+    def _update_memory_of_visible_tiles(self, memory):
+        visible = memory.visible
+        for index, (tile, content_version) in visible.iteritems():
+            if tile.content_version != content_version:
+                self._remember_tile(memory, index, tile)
+                visible[index] = (tile, tile.content_version)
+
+    def get_remembered_icon(self, position, depth):
+        """
+        Gets the icon remembered at position, the icon of unknown terrain if nothing is.
+        """
+        return self._glyphs[self._get_remembered_glyph(position, depth)][0]
+
+    def get_remembered_glyph(self, position, depth):
+        """
+        Gets the icon, foreground and background color remembered at position.
+        """
+        return self._glyphs[self._get_remembered_glyph(position, depth)]
+
+    def get_remembered_piece(self, position, depth):
+        """
+        Gets the item or dungeon feature remembered at position, None if there is none.
+        """
+        memory = self._memory_map.get(depth)
+        if memory is None:
+            return None
+        x, y = position
+        return memory.pieces.get(y * memory.width + x)
+
+    def _get_remembered_glyph(self, position, depth):
+        memory = self._memory_map.get(depth)
+        if memory is None:
+            return UNKNOWN_GLYPH
+        x, y = position
+        if not (0 <= x < memory.width and 0 <= y < memory.height):
+            return UNKNOWN_GLYPH
+        return memory.glyphs[y * memory.width + x]
+
+    def _get_current_depth_memory(self):
+        return self._init_memory_map_if_not_set(self.parent.dungeon_level.value)
 
     def _init_memory_map_if_not_set(self, dungeon_level):
         """
-        Lazily initiates unknown dungeon to the depth needed.
+        Lazily initiates the memory of the depth of the dungeon level.
         """
-        depth = dungeon_level.depth
-        while len(self._memory_map) <= depth:
-            self._memory_map.append(None)
-        if self._memory_map[depth] is None:
-            self._memory_map[depth] =\
-                unknown_level_map(dungeon_level.width,
-                                  dungeon_level.height,
-                                  dungeon_level.depth)
+        memory = self._memory_map.get(dungeon_level.depth)
+        if memory is None:
+            memory = _DepthMemory(dungeon_level.width, dungeon_level.height)
+            self._memory_map[dungeon_level.depth] = memory
+        return memory
+
+    def _get_glyph_id(self, graphic_char):
+        key = (graphic_char.icon, _color_key(graphic_char.color_fg), _color_key(graphic_char.color_bg))
+        glyph_id = self._glyph_ids.get(key)
+        if glyph_id is None:
+            glyph_id = len(self._glyphs)
+            self._glyphs.append((graphic_char.icon, graphic_char.color_fg, graphic_char.color_bg))
+            self._glyph_ids[key] = glyph_id
+        return glyph_id
 
     def update_memory_of_tile(self, tile, position, depth):
         """
         Writes the entity memory of a tile, to the memory map.
         """
         self._init_memory_map_if_not_set(self.parent.dungeon_level.value)
+        memory = self._memory_map[depth]
         x, y = position
-        self._memory_map[depth].tile_matrix[y][x] = tile.copy()
+        if not (0 <= x < memory.width and 0 <= y < memory.height):
+            return
+        self._remember_tile(memory, y * memory.width + x, tile)
+
+    def _remember_tile(self, memory, index, tile):
+        top_piece = tile.get_top_pieces()[0]
+        if top_piece.has("is_unknown"):
+            memory.glyphs[index] = UNKNOWN_GLYPH
+        else:
+            memory.glyphs[index] = self._get_glyph_id(top_piece.graphic_char)
+        piece = tile.get_first_item() or tile.get_dungeon_feature()
+        if piece:
+            memory.pieces[index] = piece
+        elif index in memory.pieces:
+            del memory.pieces[index]
 
     def gain_knowledge_of_terrain_of_tile(self, tile, position, depth):
         """
-        Writes the entity memory of a tile, to the memory map.
+        Writes the entity memory of the terrain of a tile, to the memory map.
 
+        Only positions with nothing remembered are written.
         If position is out of range, do nothing
         """
-        x, y = position
         self._init_memory_map_if_not_set(self.parent.dungeon_level.value)
-        try:
-            if (not self._memory_map[depth].tile_matrix[y][x].get_terrain() or
-                    self._memory_map[depth].tile_matrix[y][x].get_terrain().has("is_unknown")):
-                new_tile = Tile()
-                new_tile.add(tile.get_terrain())
-                self._memory_map[depth].tile_matrix[y][x] = new_tile
-        except IndexError:
-            pass
+        memory = self._memory_map[depth]
+        x, y = position
+        if not (0 <= x < memory.width and 0 <= y < memory.height):
+            return
+        index = y * memory.width + x
+        terrain = tile.get_terrain()
+        if memory.glyphs[index] == UNKNOWN_GLYPH and terrain and not terrain.has("is_unknown"):
+            memory.glyphs[index] = self._get_glyph_id(terrain.graphic_char)
+
+    def get_exploration_field(self, dungeon_level):
+        """
+        Gets the flow field leading the parent to the closest unexplored part of the dungeon level.
+
+        Seen tiles next to unseen ones and remembered items picked up automatically are explored.
+        """
+        memory = self._init_memory_map_if_not_set(dungeon_level)
+        terrain_signature = self.parent.mover.terrain_signature()
+        level_map = dungeon_level.level_map
+        walkable = level_map.get_walkable(terrain_signature)
+        goals = [index for index, piece in memory.pieces.iteritems() if piece.has("player_auto_pick_up")]
+        exploration = memory.exploration
+        changed = level_map.get_terrain_changes(exploration.terrain_version)
+        exploration.terrain_version = level_map.terrain_version
+        return exploration.get_field(memory.seen, walkable, goals, terrain_signature, changed)
 
     def number_of_seen_tiles(self, depth):
-        seen_tiles = []
-        for row in self._memory_map[depth].tile_matrix:
-            for t in row:
-                if t and not t.get_terrain():
-                    seen_tiles.append(t)
-        return len(seen_tiles)
+        memory = self._memory_map.get(depth)
+        if memory is None:
+            return 0
+        return memory.seen_count
 
     def send_message(self, message):
         """
@@ -80,3 +204,35 @@ class MemoryMap(Leaf):
         """
         if message == CompositeMessage.DUNGEON_LEVEL_CHANGED:
             self._init_memory_map_if_not_set(self.parent. dungeon_level.value)
+
+
+class _DepthMemory(object):
+    """
+    The memory of one depth, a glyph id per tile and one seen bit per tile.
+
+    The tiles in view at the last update are kept with their content version,
+    so unchanged tiles are not written again, with the field of view they were seen in.
+    """
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.glyphs = array('H', [UNKNOWN_GLYPH]) * (width * height)
+        self.seen = bytearray((width * height + 7) >> 3)
+        self.seen_count = 0
+        self.pieces = {}
+        self.visible = {}
+        self.window = None
+        self.exploration = ExplorationMap(width, height)
+
+    def mark_seen(self, index):
+        bit = 1 << (index & 7)
+        if not self.seen[index >> 3] & bit:
+            self.seen[index >> 3] |= bit
+            self.seen_count += 1
+            self.exploration.signal_revealed(index)
+
+
+def _color_key(color):
+    if color is None:
+        return None
+    return color.r, color.g, color.b
@@ -0,0 +1,77 @@
+import unittest
+import dungeonlevelfactory
+import item
+from memorymap import MemoryMap
+import monster
+import spawner
+import tile
+
+
+def level_from_lines(lines):
+    return dungeonlevelfactory.dungeon_level_from_lines(lines)
+
+
+class TestComposition(unittest.TestCase):
+
+    def setUp(self):
+        self.dungeon_level = level_from_lines(["#######",
+                                               "#.....#",
+                                               "#.....#",
+                                               "#######"])
+        self.ratman = spawner.new_from_template(monster.new_ratman, None)
+        self.ratman.set_child(MemoryMap())
+        self.ratman.mover.try_move((1, 1), self.dungeon_level)
+        self.memory_map = self.ratman.memory_map
+
+    def remember(self):
+        self.memory_map.update_memory_from_fov(self.dungeon_level)
+
+    def test_tiles_in_view_are_remembered(self):
+        self.remember()
+        self.assertTrue(self.memory_map.has_seen_position((5, 2)))
+        self.assertEqual(self.memory_map.get_remembered_icon((5, 2), self.dungeon_level.depth),
+                         self.dungeon_level.get_tile((5, 2)).get_terrain().graphic_char.icon)
+        self.assertEqual(self.memory_map.number_of_seen_tiles(self.dungeon_level.depth), 28)
+
+    def test_tile_changed_in_unchanged_view_is_remembered_anew(self):
+        self.remember()
+        device = spawner.new_from_template(item.new_zap_device, None)
+        device.mover.try_move((4, 2), self.dungeon_level)
+        self.remember()
+        self.assertTrue(self.memory_map.get_remembered_piece((4, 2), self.dungeon_level.depth) is device)
+        device.mover.try_remove_from_dungeon()
+        self.remember()
+        self.assertEqual(self.memory_map.get_remembered_piece((4, 2), self.dungeon_level.depth), None)
+
+    def test_seen_tile_outside_the_level_is_unknown(self):
+        self.assertTrue(self.dungeon_level.get_seen_tile((-1, 0)) is tile.unknown_tile)
+        self.assertTrue(self.dungeon_level.get_seen_tile((2, 1)) is self.dungeon_level.get_tile((2, 1)))
+        self.assertEqual(self.memory_map.get_remembered_icon((9, 9), self.dungeon_level.depth), " ")
+
+    def test_memory_is_kept_after_leaving_the_view(self):
+        dungeon_level = level_from_lines(["####################",
+                                          "#..................#",
+                                          "####################"])
+        dungeon_level.depth = 2
+        device = spawner.new_from_template(item.new_zap_device, None)
+        device.mover.try_move((3, 1), dungeon_level)
+        self.ratman.mover.try_move((1, 1), dungeon_level)
+        self.memory_map.update_memory_from_fov(dungeon_level)
+        remembered_glyph = self.memory_map.get_remembered_glyph((3, 1), dungeon_level.depth)
+
+        self.ratman.mover.try_move((17, 1))
+        device.mover.try_remove_from_dungeon()
+        self.memory_map.update_memory_from_fov(dungeon_level)
+        self.assertFalse(self.ratman.dungeon_mask.can_see_point((3, 1)))
+        self.assertTrue(self.memory_map.has_seen_position((3, 1)))
+        self.assertTrue(self.memory_map.get_remembered_piece((3, 1), dungeon_level.depth) is device)
+        self.assertEqual(self.memory_map.get_remembered_glyph((3, 1), dungeon_level.depth), remembered_glyph)
+        self.assertFalse(self.memory_map.has_seen_position((9, 1)))
+
+    def test_glyphs_are_interned(self):
+        self.remember()
+        depth = self.dungeon_level.depth
+        self.assertTrue(self.memory_map.get_remembered_glyph((2, 1), depth) is
+                        self.memory_map.get_remembered_glyph((5, 2), depth))
+        self.assertFalse(self.memory_map.get_remembered_glyph((2, 1), depth) ==
+                         self.memory_map.get_remembered_glyph((0, 0), depth))
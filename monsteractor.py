@@ -11,6 +11,7 @@ import geometry as geo
 from graphic import GraphicChar
 from health import DamageTakenEffect
 import direction
+import flowfield
 from messenger import msg
 import rng
 from stats import DataPoint, DataTypes
@@ -92,28 +93,56 @@ class MonsterActor(Actor):
                     if not entity is self)
 
     def can_see_player(self):
-        seen_entities = self.parent.vision.get_seen_entities()
-        return any(entity.has("is_player")
-                   for entity in seen_entities)
+        return not self._get_player_in_sight() is None
 
     def get_player_if_seen(self):
-        seen_entities = self.parent.vision.get_seen_entities()
-        found_player = next((entity for entity in seen_entities
-                             if (entity.has("is_player"))), None)
+        found_player = self._get_player_in_sight()
         if (not found_player is None and
                 not found_player.status_flags.has_status(StatusFlags.INVISIBILE)):
             return found_player
         return None
 
+    def _get_player_in_sight(self):
+        """
+        Gets the player if it is within the field of view of the parent,
+        looked up in the reverse visibility index of the dungeon level.
+        """
+        dungeon_level = self.parent.dungeon_level.value
+        game_state = self.parent.game_state.value if self.parent.has("game_state") else None
+        if dungeon_level is None or game_state is None:
+            return None
+        player = game_state.player
+        if player is None or not player.dungeon_level.value is dungeon_level:
+            return None
+        if self.parent in dungeon_level.level_map.get_observers(player.position.value):
+            return player
+        return None
+
     def set_path_to_player_if_seen(self):
         player = self.get_player_if_seen()
         if player is None:
             return False
         if self.parent.monster_actor_state.value == MonsterActorState.HUNTING:
-            self.parent.path.compute_path(player.position.value)
+            field = self.get_flow_field(flowfield.APPROACH, player.position.value)
+            if field is None:
+                return False
+            if field.get_value(self.parent.position.value) is None:
+                self.parent.path.compute_path(player.position.value)
+            else:
+                self.parent.path.follow_flow_field(field)
             return True
         return False
 
+    def get_flow_field(self, kind, goal, distance=None):
+        """
+        Gets the flow field of the dungeon level shared by movers like the parent.
+        """
+        dungeon_level = self.parent.dungeon_level.value
+        if dungeon_level is None:
+            return None
+        return dungeon_level.level_map.get_flow_field(kind, self.parent.mover.terrain_signature(),
+                                                      goal, distance)
+
     def notice_player_check(self):
         player = self.get_player_if_seen()
         if player is None:
@@ -257,14 +286,15 @@ class KeepPlayerAtDistanceActor(MonsterActor):
         if current_distance_to_optimal == 0:
             return True
 
-        for d in direction.get_shuffled_directions():
-            possible_step = geo.add_2d(d, self.parent.position.value)
-            if (self.distance_to_optimal_distance(possible_step, player.position.value)
-                    < current_distance_to_optimal):
-                energy_used = self.parent.stepper.try_step_in_direction(d)
-                if energy_used > 0:
-                    self.newly_spent_energy += energy_used
-                    return True
+        field = self.get_flow_field(flowfield.KEEP_AT_DISTANCE, player.position.value, self.optimal_distance)
+        next_step = None if field is None else field.get_next_step(self.parent.position.value)
+        if next_step is None:
+            return False
+        d = geo.sub_2d(next_step, self.parent.position.value)
+        energy_used = self.parent.stepper.try_step_in_direction(d)
+        if energy_used > 0:
+            self.newly_spent_energy += energy_used
+            return True
         return False
 
 
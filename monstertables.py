@@ -1,6 +1,7 @@
 import random
 import item
 import monster
+import spawner
 from weapon import new_dagger, new_sword, new_gun, new_sling, new_kris, new_katar, new_cestus, new_iron_hand, new_spear, new_claw, new_morning_star, new_rapier, new_scimitar, new_club, new_flail, new_hammer, new_chain_and_ball, new_trident, new_whip, new_axe
 
 
@@ -14,6 +15,9 @@ class DungeonTableItem(object):
         else:
             self.minimum_depth = -1
 
+    def create(self, game_state):
+        return spawner.new_from_template(self.creator, game_state)
+
 
 # Weighted by the factor.
 dungeon_table = \
@@ -38,7 +42,7 @@ def filter_monster_table_by_depth(table, depth):
 
 def from_table_pick_n_items_for_depth(table, n, depth, game_state):
     filtered_table = filter_monster_table_by_depth(table, depth)
-    return [random.choice(filtered_table).creator(game_state) for _ in range(n)]
+    return [random.choice(filtered_table).create(game_state) for _ in range(n)]
 
 
 dungeon_armor_table = \
@@ -4,11 +4,31 @@ from compositecore import Leaf
 import direction
 import geometry
 from position import DungeonLevel
-from stats import max_instances_of_composite_on_tile, IntelligenceLevel
+from stats import max_instances_of_composite_on_tile, IntelligenceLevel, GamePieceTypes
 from statusflags import StatusFlags
 import trigger
 
 
+# Terrain signature: (is flying, can open doors)
+NO_TERRAIN_CAPABILITIES = (False, False)
+
+
+def can_pass_terrain_with_signature(terrain_to_pass, terrain_signature):
+    """
+    Checks if a mover with the given terrain signature can move through a terrain.
+    """
+    if terrain_to_pass is None:
+        return True
+    is_flying, can_open_doors = terrain_signature
+    if terrain_to_pass.has("is_chasm") and is_flying:
+        return True
+    if can_open_doors and terrain_to_pass.has("is_door"):
+        return True
+    if not terrain_to_pass.has("is_solid") and not terrain_to_pass.has("is_chasm"):
+        return True
+    return False
+
+
 class Mover(Leaf):
     """
     Component for moving and checking if a move is legal.
@@ -97,6 +117,10 @@ class Mover(Leaf):
         """
         self._remove_from_old_tile()
         dungeon_level.get_tile(new_position).add(self.parent)
+        if self.parent.game_piece_type.value == GamePieceTypes.ENTITY:
+            dungeon_level.level_map.signal_entity_moved(new_position)
+        elif self.parent.game_piece_type.value == GamePieceTypes.CLOUD:
+            dungeon_level.level_map.update_danger(new_position)
         self.parent.position.value = new_position
         if not self.has_sibling("dungeon_level"):
             self.parent.set_child(DungeonLevel())
@@ -137,18 +161,20 @@ class Mover(Leaf):
         """
         Checks if the parent can move through a terrain.
         """
-        if terrain_to_pass is None:
-            return True
-        if self.has_sibling("status_flags"):
-            status_flags = self.parent.status_flags
-            if terrain_to_pass.has("is_chasm") and status_flags.has_status(StatusFlags.FLYING):
-                return True
-            if (status_flags.has_status(StatusFlags.CAN_OPEN_DOORS) and
-                    terrain_to_pass.has("is_door")):
-                return True
-        if not terrain_to_pass.has("is_solid") and not terrain_to_pass.has("is_chasm"):
-            return True
-        return False
+        return can_pass_terrain_with_signature(terrain_to_pass, self.terrain_signature())
+
+    def terrain_signature(self):
+        """
+        Gets the capabilities that decide which terrain the parent can pass.
+
+        Movers with equal signatures can pass exactly the same terrain,
+        so they may share walkability maps.
+        """
+        if not self.has_sibling("status_flags"):
+            return NO_TERRAIN_CAPABILITIES
+        status_flags = self.parent.status_flags
+        return (status_flags.has_status(StatusFlags.FLYING),
+                status_flags.has_status(StatusFlags.CAN_OPEN_DOORS))
 
     def try_remove_from_dungeon(self):
         """
@@ -168,9 +194,16 @@ class Mover(Leaf):
         if not self.has_sibling("dungeon_level") or self.parent.dungeon_level.value is None:
             return True
         position = self.parent.position.value
+        if not self.parent.dungeon_level.value.has_tile(position):
+            # The piece has a dungeon level but has not been placed on it yet.
+            return False
         tile_i_might_be_on = (self.parent.dungeon_level.
                               value.get_tile(position))
         if tile_i_might_be_on.remove(self.parent):
+            if self.parent.game_piece_type.value == GamePieceTypes.ENTITY:
+                self.parent.dungeon_level.value.level_map.signal_entity_moved(position)
+            elif self.parent.game_piece_type.value == GamePieceTypes.CLOUD:
+                self.parent.dungeon_level.value.level_map.update_danger(position)
             for c in self.parent.get_children_with_tag(AfterRemoveEffect.TAG):
                 c.effect()
             return True
@@ -199,6 +232,12 @@ class Stepper(Leaf):
         super(Stepper, self).__init__()
         self.component_type = "stepper"
 
+    def danger_signature(self):
+        """
+        Gets the danger signature the paths of the parent are planned with, None if they ignore danger.
+        """
+        return None
+
     def try_push_in_direction(self, direction):
         return self._try_move_to_destination(geometry.add_2d(self.parent.position.value, direction))
 
@@ -265,18 +304,43 @@ class Stepper(Leaf):
         return 0
 
 
-def is_tile_dangerous(tile, entity):
+def get_danger_signature(entity):
+    """
+    Gets what decides which tiles the entity finds dangerous, None if it fears no tile.
+
+    Entities with equal signatures fear exactly the same tiles,
+    so they may share danger layers.
+    """
     if entity.intelligence.value == IntelligenceLevel.PLANT:
-        return False  # Low intelligence ch
+        return None  # Low intelligence ch
+    tolerated_damage_types = frozenset(c.damage_type for c in entity.get_children_with_tag("tolerate_damage"))
+    return entity.status_flags.has_status(StatusFlags.FLYING), tolerated_damage_types
+
+
+def is_tile_dangerous_with_signature(tile, danger_signature):
+    """
+    Checks if an entity with the given danger signature finds a tile dangerous.
+    """
+    if danger_signature is None:
+        return False
+    is_flying, _ = danger_signature
     cloud = tile.get_first_cloud()
-    if tile.get_terrain().has("is_chasm") and not entity.status_flags.has_status(StatusFlags.FLYING):
+    if tile.get_terrain().has("is_chasm") and not is_flying:
         return True
     if not cloud:
         return False
+    return is_cloud_dangerous_with_signature(cloud, danger_signature)
+
+
+def is_cloud_dangerous_with_signature(cloud, danger_signature):
+    """
+    Checks if a cloud damages an entity with the given danger signature.
+    """
+    if danger_signature is None:
+        return False
+    _, tolerated_damage_types = danger_signature
     damage_effects = [effect for effect in cloud.get_children_with_tag("entity_share_tile_effect")
                       if hasattr(effect, 'damage_types')]
-
-    tolerated_damage_types = [c.damage_type for c in entity.get_children_with_tag("tolerate_damage")]
     for effect in damage_effects:
         for damage_type in effect.damage_types:
             if not damage_type in tolerated_damage_types:
@@ -284,6 +348,10 @@ def is_tile_dangerous(tile, entity):
     return False
 
 
+def is_tile_dangerous(tile, entity):
+    return is_tile_dangerous_with_signature(tile, get_danger_signature(entity))
+
+
 class TolerateDamage(Leaf):
     """
     Signifies that that the entity won't mind taking damage of a type.
@@ -301,6 +369,9 @@ class CautiousStepper(Stepper):
         super(CautiousStepper, self).__init__()
         self.component_type = "stepper"
 
+    def danger_signature(self):
+        return get_danger_signature(self.parent)
+
     def dares_to_step(self, position):
         current_position_dangerous = \
             is_tile_dangerous(self.parent.dungeon_level.value.get_tile_or_unknown(self.parent.position.value),
@@ -338,6 +409,9 @@ class PlayerStepper(Stepper):
         super(PlayerStepper, self).__init__()
         self.component_type = "stepper"
 
+    def danger_signature(self):
+        return get_danger_signature(self.parent)
+
     def try_move_or_bump(self, position):
         """
         Tries to move the entity to a position.
@@ -0,0 +1,417 @@
+"""
+Path finding and lines on walkability layers, without libtcod.
+
+A walkability layer holds one byte per tile in row order, non zero if the tile can be passed.
+"""
+from collections import deque
+import heapq
+import math
+
+# Neighbour order of libtcod's path finder, the four axis directions come first.
+_NEIGHBOURS = [(0, -1), (-1, 0), (1, 0), (0, 1), (-1, -1), (1, -1), (-1, 1), (1, 1)]
+
+UNREACHABLE = -1
+
+
+class SearchStats(object):
+    """
+    Counts the work done by the searches it is given to, for benchmarking.
+    """
+    def __init__(self):
+        self.node_expansions = 0
+
+
+def line(start, destination):
+    """
+    Gets the points of the Bresenham line from start to destination.
+
+    Works like libtcod's line_init and line_step, start is excluded and destination included,
+    but keeps no global state.
+    """
+    x, y = start
+    destination_x, destination_y = destination
+    delta_x = destination_x - x
+    delta_y = destination_y - y
+    step_x = (delta_x > 0) - (delta_x < 0)
+    step_y = (delta_y > 0) - (delta_y < 0)
+    result = []
+    if step_x * delta_x > step_y * delta_y:
+        error = step_x * delta_x
+        while x != destination_x:
+            x += step_x
+            error -= 2 * step_y * delta_y
+            if error < 0:
+                y += step_y
+                error += 2 * step_x * delta_x
+            result.append((x, y))
+    else:
+        error = step_y * delta_y
+        while y != destination_y:
+            y += step_y
+            error -= 2 * step_x * delta_x
+            if error < 0:
+                x += step_x
+                error += 2 * step_y * delta_y
+            result.append((x, y))
+    return result
+
+
+def a_star(walkable, width, height, start, destination, diagonal_cost=1.0, blocked=(), costs=None, stats=None):
+    """
+    Finds a path from start to destination, searching like libtcod's path_compute.
+
+    The search stops as soon as the destination is reached, with a straight line distance
+    heuristic, so the neighbour order and the heap decide between equally good paths.
+    Points in blocked are avoided as if they were not walkable. Costs, indexed like walkable,
+    are added to the cost of stepping onto each tile. The nodes taken off the open list
+    are counted in stats if it is given.
+
+    Returns:
+        The points of the path, start excluded and destination included.
+        An empty list if there is no path.
+    """
+    start_x, start_y = start
+    destination_x, destination_y = destination
+    if start == destination:
+        return []
+    if not (0 <= start_x < width and 0 <= start_y < height and
+            0 <= destination_x < width and 0 <= destination_y < height):
+        return []
+    destination_index = destination_y * width + destination_x
+    blocked_indices = set(y * width + x for x, y in blocked)
+    covered = {start_y * width + start_x: 0.0}
+    previous = {}
+    heap = _PathHeap()
+    heap.push(start_y * width + start_x, 0.0)
+    while len(heap) > 0 and not destination_index in previous:
+        index = heap.pop()
+        if not stats is None:
+            stats.node_expansions += 1
+        x = index % width
+        y = index // width
+        distance = covered[index]
+        for direction_index, (dx, dy) in enumerate(_NEIGHBOURS):
+            neighbour_x = x + dx
+            neighbour_y = y + dy
+            if not (0 <= neighbour_x < width and 0 <= neighbour_y < height):
+                continue
+            neighbour = neighbour_y * width + neighbour_x
+            if not walkable[neighbour] or neighbour in blocked_indices:
+                continue
+            neighbour_covered = distance + (diagonal_cost if direction_index >= 4 else 1.0)
+            if not costs is None:
+                neighbour_covered += costs[neighbour]
+            previous_covered = covered.get(neighbour)
+            if previous_covered is None:
+                remaining = math.sqrt((neighbour_x - destination_x) ** 2 + (neighbour_y - destination_y) ** 2)
+                covered[neighbour] = neighbour_covered
+                previous[neighbour] = index
+                heap.push(neighbour, neighbour_covered + remaining)
+            elif previous_covered > neighbour_covered:
+                covered[neighbour] = neighbour_covered
+                previous[neighbour] = index
+                heap.decrease(neighbour, previous_covered - neighbour_covered)
+    if not destination_index in previous:
+        return []
+    return _walk_back(previous, destination_index, start_y * width + start_x, width)
+
+
+def jump_point_search(walkable, width, height, start, destination, stats=None):
+    """
+    Finds a shortest path from start to destination by jump point search.
+
+    Only works when every step, also diagonal, costs the same. Straight and diagonal runs
+    are followed without putting every tile on the open list, only the tiles where
+    the run could turn are, so open areas are searched much faster than with a_star.
+    The nodes taken off the open list are counted in stats if it is given.
+
+    Returns:
+        The points of the path, start excluded and destination included.
+        An empty list if there is no path.
+    """
+    start_x, start_y = start
+    destination_x, destination_y = destination
+    if start == destination:
+        return []
+    if not (0 <= start_x < width and 0 <= start_y < height and
+            0 <= destination_x < width and 0 <= destination_y < height):
+        return []
+    search = _JumpSearch(walkable, width, height, destination)
+    covered = {start: 0}
+    previous = {}
+    heap = [(_chess_distance(start, destination), 0, start, None)]
+    while heap:
+        _, distance, point, direction = heapq.heappop(heap)
+        if distance > covered[point]:
+            continue
+        if point == destination:
+            return _walk_back_jumps(previous, destination, start)
+        if not stats is None:
+            stats.node_expansions += 1
+        for dx, dy in search.get_directions(point, direction):
+            jump_point = search.jump(point, dx, dy)
+            if jump_point is None:
+                continue
+            jump_distance = distance + _chess_distance(point, jump_point)
+            if jump_distance < covered.get(jump_point, jump_distance + 1):
+                covered[jump_point] = jump_distance
+                previous[jump_point] = point
+                heapq.heappush(heap, (jump_distance + _chess_distance(jump_point, destination),
+                                      jump_distance, jump_point, (dx, dy)))
+    return []
+
+
+def dijkstra(walkable, width, height, sources, max_distance=None):
+    """
+    Computes the number of steps from the closest source to every tile.
+
+    Every step, also diagonal, costs one so this is a breadth first search.
+
+    Returns:
+        A list with one distance per tile in row order, UNREACHABLE if no source can be reached.
+    """
+    distances = [UNREACHABLE] * (width * height)
+    frontier = deque()
+    for x, y in sources:
+        if 0 <= x < width and 0 <= y < height:
+            distances[y * width + x] = 0
+            frontier.append((x, y))
+    while frontier:
+        x, y = frontier.popleft()
+        distance = distances[y * width + x] + 1
+        if not max_distance is None and distance > max_distance:
+            continue
+        for dx, dy in _NEIGHBOURS:
+            neighbour_x = x + dx
+            neighbour_y = y + dy
+            if not (0 <= neighbour_x < width and 0 <= neighbour_y < height):
+                continue
+            neighbour = neighbour_y * width + neighbour_x
+            if walkable[neighbour] and distances[neighbour] == UNREACHABLE:
+                distances[neighbour] = distance
+                frontier.append((neighbour_x, neighbour_y))
+    return distances
+
+
+def relax(walkable, width, height, initial, bounds=None):
+    """
+    Lowers the values of a map until no tile is more than one step above a neighbour.
+
+    Every step, also diagonal, costs one. Tiles that are not walkable keep their value
+    and are not passed through, except tiles given an initial value.
+
+    Args:
+        initial: One value per tile in row order, None for tiles without a starting value.
+        bounds: The left, top, right and bottom of the rectangle to relax, right and bottom
+            excluded. Tiles outside it keep their initial value. The whole map if None.
+
+    Returns:
+        A list with the relaxed value of every tile, None if no starting value can be reached.
+    """
+    left, top, right, bottom = (0, 0, width, height) if bounds is None else bounds
+    values = list(initial)
+    heap = []
+    for y in range(top, bottom):
+        for index in range(y * width + left, y * width + right):
+            if not values[index] is None:
+                heap.append((values[index], index))
+    heapq.heapify(heap)
+    while heap:
+        value, index = heapq.heappop(heap)
+        if value > values[index]:
+            continue
+        x = index % width
+        y = index // width
+        value += 1
+        for dx, dy in _NEIGHBOURS:
+            neighbour_x = x + dx
+            neighbour_y = y + dy
+            if not (left <= neighbour_x < right and top <= neighbour_y < bottom):
+                continue
+            neighbour = neighbour_y * width + neighbour_x
+            if walkable[neighbour] and (values[neighbour] is None or values[neighbour] > value):
+                values[neighbour] = value
+                heapq.heappush(heap, (value, neighbour))
+    return values
+
+
+def _chess_distance(point, other_point):
+    return max(abs(point[0] - other_point[0]), abs(point[1] - other_point[1]))
+
+
+def _walk_back_jumps(previous, point, start):
+    """
+    Walks back from point to start through the jump points and fills in the runs between them.
+    """
+    path = []
+    while point != start:
+        jump_from = previous[point]
+        step_x = (point[0] > jump_from[0]) - (point[0] < jump_from[0])
+        step_y = (point[1] > jump_from[1]) - (point[1] < jump_from[1])
+        x, y = point
+        while (x, y) != jump_from:
+            path.append((x, y))
+            x -= step_x
+            y -= step_y
+        point = jump_from
+    path.reverse()
+    return path
+
+
+class _JumpSearch(object):
+    """
+    The pruning and jumping rules of jump point search on an eight connected grid.
+    """
+    def __init__(self, walkable, width, height, destination):
+        self.walkable = walkable
+        self.width = width
+        self.height = height
+        self.destination = destination
+
+    def is_free(self, x, y):
+        return 0 <= x < self.width and 0 <= y < self.height and self.walkable[y * self.width + x]
+
+    def get_directions(self, point, direction):
+        """
+        Gets the directions worth searching from point when it was reached going in direction.
+        """
+        if direction is None:
+            return _NEIGHBOURS
+        x, y = point
+        dx, dy = direction
+        is_free = self.is_free
+        if dx != 0 and dy != 0:
+            directions = [(dx, 0), (0, dy), (dx, dy)]
+            if not is_free(x - dx, y) and is_free(x - dx, y + dy):
+                directions.append((-dx, dy))
+            if not is_free(x, y - dy) and is_free(x + dx, y - dy):
+                directions.append((dx, -dy))
+        elif dx != 0:
+            directions = [(dx, 0)]
+            if not is_free(x, y + 1) and is_free(x + dx, y + 1):
+                directions.append((dx, 1))
+            if not is_free(x, y - 1) and is_free(x + dx, y - 1):
+                directions.append((dx, -1))
+        else:
+            directions = [(0, dy)]
+            if not is_free(x + 1, y) and is_free(x + 1, y + dy):
+                directions.append((1, dy))
+            if not is_free(x - 1, y) and is_free(x - 1, y + dy):
+                directions.append((-1, dy))
+        return directions
+
+    def jump(self, point, dx, dy):
+        """
+        Runs from point in direction until a tile where the run could turn.
+
+        Returns:
+            The tile where the run stopped, None if it ran into a wall.
+        """
+        x, y = point
+        is_free = self.is_free
+        destination = self.destination
+        while True:
+            x += dx
+            y += dy
+            if not is_free(x, y):
+                return None
+            if (x, y) == destination:
+                return x, y
+            if dx != 0 and dy != 0:
+                if ((not is_free(x - dx, y) and is_free(x - dx, y + dy)) or
+                        (not is_free(x, y - dy) and is_free(x + dx, y - dy))):
+                    return x, y
+                if not self.jump((x, y), dx, 0) is None or not self.jump((x, y), 0, dy) is None:
+                    return x, y
+            elif dx != 0:
+                if ((not is_free(x, y + 1) and is_free(x + dx, y + 1)) or
+                        (not is_free(x, y - 1) and is_free(x + dx, y - 1))):
+                    return x, y
+            else:
+                if ((not is_free(x + 1, y) and is_free(x + 1, y + dy)) or
+                        (not is_free(x - 1, y) and is_free(x - 1, y + dy))):
+                    return x, y
+
+
+def _walk_back(previous, index, start_index, width):
+    path = []
+    while index != start_index:
+        path.append((index % width, index // width))
+        index = previous[index]
+    path.reverse()
+    return path
+
+
+class _PathHeap(object):
+    """
+    Binary min heap of tile indices ordered by score, sifting like libtcod's path heap.
+
+    The heap position of every index is kept, so a decreased score is sifted
+    from where it is without searching the heap.
+    """
+    def __init__(self):
+        self._indices = []
+        self._scores = {}
+        self._positions = {}
+
+    def __len__(self):
+        return len(self._indices)
+
+    def push(self, index, score):
+        self._scores[index] = score
+        self._positions[index] = len(self._indices)
+        self._indices.append(index)
+        self._sift_up(len(self._indices) - 1)
+
+    def pop(self):
+        indices = self._indices
+        first = indices[0]
+        last = indices.pop()
+        del self._positions[first]
+        if indices:
+            indices[0] = last
+            self._positions[last] = 0
+            self._sift_down(0)
+        return first
+
+    def decrease(self, index, amount):
+        self._scores[index] -= amount
+        position = self._positions.get(index)
+        if not position is None:
+            self._sift_up(position)
+
+    def _sift_up(self, child):
+        indices = self._indices
+        scores = self._scores
+        positions = self._positions
+        while child > 0:
+            parent = (child - 1) // 2
+            if scores[indices[parent]] > scores[indices[child]]:
+                indices[child], indices[parent] = indices[parent], indices[child]
+                positions[indices[child]] = child
+                positions[indices[parent]] = parent
+                child = parent
+            else:
+                return
+
+    def _sift_down(self, current):
+        indices = self._indices
+        scores = self._scores
+        positions = self._positions
+        end = len(indices) - 1
+        child = current * 2 + 1
+        while child <= end:
+            to_swap = current
+            swap_score = scores[indices[current]]
+            if scores[indices[child]] < swap_score:
+                to_swap = child
+                swap_score = scores[indices[child]]
+            if child < end and swap_score > scores[indices[child + 1]]:
+                to_swap = child + 1
+            if to_swap == current:
+                return
+            indices[to_swap], indices[current] = indices[current], indices[to_swap]
+            positions[indices[to_swap]] = to_swap
+            positions[indices[current]] = current
+            current = to_swap
+            child = current * 2 + 1
@@ -0,0 +1,89 @@
+import unittest
+import pathfinding
+
+
+def layer_from_lines(lines):
+    return bytearray(0 if c == "#" else 1 for line in lines for c in line)
+
+
+class TestComposition(unittest.TestCase):
+
+    def setUp(self):
+        self.lines = ["#######",
+                      "#.....#",
+                      "#####.#",
+                      "#.....#",
+                      "#.#####",
+                      "#.....#",
+                      "#######"]
+        self.walkable = layer_from_lines(self.lines)
+
+    def test_line_excludes_start_and_includes_destination(self):
+        self.assertEqual(pathfinding.line((0, 0), (3, 1)), [(1, 0), (2, 1), (3, 1)])
+
+    def test_line_to_start_is_empty(self):
+        self.assertEqual(pathfinding.line((2, 2), (2, 2)), [])
+
+    def test_a_star_follows_the_corridor(self):
+        path = pathfinding.a_star(self.walkable, 7, 7, (1, 1), (5, 5))
+        self.assertEqual(path[-1], (5, 5))
+        self.assertEqual(len(path), 12)
+        for point in path:
+            self.assertEqual(self.lines[point[1]][point[0]], ".")
+
+    def test_a_star_without_path_returns_empty_list(self):
+        self.assertEqual(pathfinding.a_star(self.walkable, 7, 7, (1, 1), (0, 0)), [])
+
+    def test_a_star_avoids_blocked_points(self):
+        self.assertEqual(pathfinding.a_star(self.walkable, 7, 7, (1, 1), (5, 5), blocked=[(5, 2)]), [])
+
+    def test_a_star_goes_around_costly_points(self):
+        walkable = bytearray([1] * 25)
+        costs = bytearray(25)
+        for y in range(4):
+            costs[y * 5 + 2] = 16
+        path = pathfinding.a_star(walkable, 5, 5, (0, 0), (4, 0), costs=costs)
+        self.assertEqual(len(path), 8)
+        self.assertTrue((2, 4) in path)
+
+    def test_jump_point_search_follows_the_corridor(self):
+        path = pathfinding.jump_point_search(self.walkable, 7, 7, (1, 1), (5, 5))
+        self.assertEqual(path[-1], (5, 5))
+        self.assertEqual(len(path), 12)
+        for point in path:
+            self.assertEqual(self.lines[point[1]][point[0]], ".")
+
+    def test_jump_point_search_without_path_returns_empty_list(self):
+        self.assertEqual(pathfinding.jump_point_search(self.walkable, 7, 7, (1, 1), (0, 0)), [])
+
+    def test_jump_point_search_crosses_open_area_diagonally(self):
+        walkable = bytearray([1] * 100)
+        path = pathfinding.jump_point_search(walkable, 10, 10, (0, 0), (9, 5))
+        self.assertEqual(len(path), 9)
+        self.assertEqual(path[-1], (9, 5))
+
+    def test_dijkstra_counts_steps_from_closest_source(self):
+        distances = pathfinding.dijkstra(self.walkable, 7, 7, [(1, 1)])
+        self.assertEqual(distances[5 * 7 + 5], 12)
+        self.assertEqual(distances[0], pathfinding.UNREACHABLE)
+
+    def test_dijkstra_stops_at_max_distance(self):
+        distances = pathfinding.dijkstra(self.walkable, 7, 7, [(1, 1)], max_distance=2)
+        self.assertEqual(distances[1 * 7 + 3], 2)
+        self.assertEqual(distances[1 * 7 + 4], pathfinding.UNREACHABLE)
+
+    def test_searches_count_their_expansions_in_the_given_stats(self):
+        stats = pathfinding.SearchStats()
+        pathfinding.a_star(self.walkable, 7, 7, (1, 1), (5, 5), stats=stats)
+        a_star_expansions = stats.node_expansions
+        self.assertTrue(a_star_expansions > 0)
+        pathfinding.jump_point_search(self.walkable, 7, 7, (1, 1), (5, 5), stats)
+        self.assertTrue(stats.node_expansions > a_star_expansions)
+
+    def test_path_heap_sifts_a_decreased_index_from_its_position(self):
+        heap = pathfinding._PathHeap()
+        for index, score in enumerate([5.0, 3.0, 8.0, 6.0, 9.0, 7.0]):
+            heap.push(index, score)
+        heap.decrease(4, 8.5)
+        heap.decrease(2, 6.0)
+        self.assertEqual([heap.pop() for _ in range(len(heap))], [4, 2, 1, 0, 3, 5])
@@ -0,0 +1,63 @@
+"""
+Benchmarks jump point search against A* on open levels, node expansions and time.
+
+Generated levels are also searched over their room graph, as the level map plans long paths.
+
+Run from the game directory: python pathfindingbenchmark.py
+"""
+import random
+import time
+
+import dungeongenerator
+import dungeonlevelfactory
+import geometry
+import mapbackend
+import pathfinding
+import roomgraph
+from mover import NO_TERRAIN_CAPABILITIES
+
+ROUTES = 200
+GENERATED_DEPTH = 9
+
+
+def benchmark_level(name, level_map, long_routes_only=False):
+    walkable = level_map.get_walkable(NO_TERRAIN_CAPABILITIES)
+    floor = [(index % level_map.width, index / level_map.width)
+             for index, is_walkable in enumerate(walkable) if is_walkable]
+    routes = []
+    while len(routes) < ROUTES:
+        route = (random.choice(floor), random.choice(floor))
+        if not long_routes_only or geometry.chess_distance(*route) >= roomgraph.LONG_PATH_DISTANCE:
+            routes.append(route)
+    print "{0}: {1}x{2}".format(name, level_map.width, level_map.height)
+
+    a_star_stats = pathfinding.SearchStats()
+    jps_stats = pathfinding.SearchStats()
+    searches = [("a_star", a_star_stats, lambda start, destination: pathfinding.a_star(
+                    walkable, level_map.width, level_map.height, start, destination, stats=a_star_stats)),
+                ("jps", jps_stats, lambda start, destination: pathfinding.jump_point_search(
+                    walkable, level_map.width, level_map.height, start, destination, jps_stats))]
+    if not level_map.dungeon_level.room_graph is None:
+        searches.append(("rooms", level_map.search_stats, lambda start, destination: level_map.compute_path(
+            NO_TERRAIN_CAPABILITIES, start, destination)))
+    for search_name, stats, search in searches:
+        start = time.clock()
+        path_lengths = [len(search(*route)) for route in routes]
+        search_time = time.clock() - start
+        print "    {0:8} expansions: {1:8}  time: {2:.4f}s  total length: {3}".format(
+            search_name, stats.node_expansions, search_time, sum(path_lengths))
+
+
+def main():
+    random.seed(0)
+    mapbackend.set_backend(mapbackend.PythonBackend())
+    benchmark_level("big.level", dungeonlevelfactory.dungeon_level_from_file("big.level").level_map)
+    size = 600 + GENERATED_DEPTH * 20
+    for index in range(3):
+        dungeon_level = dungeongenerator.generate_dungeon_floor(size, GENERATED_DEPTH)
+        benchmark_level("generated depth {0} #{1}".format(GENERATED_DEPTH, index),
+                        dungeon_level.level_map, long_routes_only=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+"""
+Connected regions of a walkability layer.
+
+Every walkable tile gets the label of the region of tiles it can reach, steps go
+in all eight directions like the movers'. Labels are kept up to date tile by tile
+when the walkability of a tile changes.
+"""
+from array import array
+from collections import deque
+
+NO_REGION = 0
+
+_NEIGHBOURS = [(0, -1), (1, -1), (1, 0), (1, 1), (0, 1), (-1, 1), (-1, 0), (-1, -1)]
+
+
+class RegionMap(object):
+    def __init__(self, width, height, walkable, candidates=None):
+        """
+        Labels the regions of the walkability layer.
+
+        Args:
+            candidates (iterable): Indices of the only tiles that may be walkable,
+            the whole layer is scanned if None.
+        """
+        self.width = width
+        self.height = height
+        self.walkable = walkable
+        self.labels = array('i', [NO_REGION]) * (width * height)
+        self._sizes = {}
+        self._positions = {}
+        self._next_label = NO_REGION + 1
+        if candidates is None:
+            candidates = range(width * height)
+        for index in candidates:
+            if walkable[index] and self.labels[index] == NO_REGION:
+                self._fill(index, NO_REGION)
+
+    def get_label(self, point):
+        """
+        Gets the region label of the point, NO_REGION if it is not walkable.
+        """
+        x, y = point
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            return NO_REGION
+        return self.labels[y * self.width + x]
+
+    def is_connected(self, point, other_point):
+        """
+        Checks if both points are walkable and can be reached from one another.
+        """
+        label = self.get_label(point)
+        return label != NO_REGION and label == self.get_label(other_point)
+
+    def get_region_positions(self, point):
+        """
+        Gets the positions that can be reached from point.
+
+        If point itself is not walkable the regions of its walkable neighbours are
+        joined and point is included. The list may be shared and must not be modified.
+        """
+        label = self.get_label(point)
+        if label != NO_REGION:
+            return self._get_positions_of_label(label)
+        result = [point]
+        for label in self._get_neighbour_labels(point):
+            result.extend(self._get_positions_of_label(label))
+        return result
+
+    def update_point(self, point):
+        """
+        Updates the labels after the walkability layer changed at point.
+        """
+        x, y = point
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            return
+        index = y * self.width + x
+        old_label = self.labels[index]
+        if self.walkable[index] and old_label == NO_REGION:
+            self._join_at(index)
+        elif not self.walkable[index] and old_label != NO_REGION:
+            self._split_at(index, old_label)
+
+    def _join_at(self, index):
+        """
+        A tile became walkable, it joins the regions around it into the largest of them.
+        """
+        neighbour_labels = self._get_neighbour_labels((index % self.width, index // self.width))
+        if not neighbour_labels:
+            self._fill(index, NO_REGION)
+            return
+        kept_label = max(neighbour_labels, key=lambda label: self._sizes[label])
+        self.labels[index] = kept_label
+        self._sizes[kept_label] += 1
+        self._positions.pop(kept_label, None)
+        for label in neighbour_labels:
+            if label != kept_label:
+                self._relabel(index, label, kept_label)
+
+    def _split_at(self, index, old_label):
+        """
+        A tile is no longer walkable, what is left of its region may fall apart.
+        """
+        self.labels[index] = NO_REGION
+        self._sizes[old_label] -= 1
+        self._positions.pop(old_label, None)
+        x = index % self.width
+        y = index // self.width
+        for dx, dy in _NEIGHBOURS:
+            neighbour_x = x + dx
+            neighbour_y = y + dy
+            if not (0 <= neighbour_x < self.width and 0 <= neighbour_y < self.height):
+                continue
+            neighbour = neighbour_y * self.width + neighbour_x
+            if self.labels[neighbour] == old_label:
+                self._fill(neighbour, old_label)
+        if self._sizes[old_label] <= 0:
+            del self._sizes[old_label]
+
+    def _relabel(self, start, label, new_label):
+        """
+        Moves the tiles of the region with label that touch start to new_label.
+        """
+        relabelled = self._flood(start, label, new_label)
+        self._sizes[new_label] += relabelled
+        self._sizes[label] -= relabelled
+        if self._sizes[label] <= 0:
+            del self._sizes[label]
+        self._positions.pop(label, None)
+
+    def _fill(self, start, label):
+        """
+        Gives the tiles with label connected to start a new label.
+        """
+        new_label = self._next_label
+        self._next_label += 1
+        self.labels[start] = new_label
+        self._sizes[new_label] = 1 + self._flood(start, label, new_label)
+        if label != NO_REGION:
+            self._sizes[label] -= self._sizes[new_label]
+
+    def _flood(self, start, label, new_label):
+        """
+        Breadth first flood from start over walkable tiles with label, giving them new_label.
+
+        Returns:
+            The number of tiles relabelled, start is not counted.
+        """
+        width = self.width
+        height = self.height
+        labels = self.labels
+        walkable = self.walkable
+        count = 0
+        frontier = deque([start])
+        while frontier:
+            index = frontier.popleft()
+            x = index % width
+            y = index // width
+            for dx, dy in _NEIGHBOURS:
+                neighbour_x = x + dx
+                neighbour_y = y + dy
+                if not (0 <= neighbour_x < width and 0 <= neighbour_y < height):
+                    continue
+                neighbour = neighbour_y * width + neighbour_x
+                if labels[neighbour] == label and walkable[neighbour]:
+                    labels[neighbour] = new_label
+                    count += 1
+                    frontier.append(neighbour)
+        return count
+
+    def _get_neighbour_labels(self, point):
+        x, y = point
+        result = []
+        for dx, dy in _NEIGHBOURS:
+            label = self.get_label((x + dx, y + dy))
+            if label != NO_REGION and not label in result:
+                result.append(label)
+        return result
+
+    def _get_positions_of_label(self, label):
+        positions = self._positions.get(label)
+        if positions is None:
+            width = self.width
+            positions = [(index % width, index // width)
+                         for index, tile_label in enumerate(self.labels) if tile_label == label]
+            self._positions[label] = positions
+        return positions
@@ -0,0 +1,68 @@
+import unittest
+from regionmap import RegionMap, NO_REGION
+
+
+def layer_from_lines(lines):
+    return bytearray(0 if c == "#" else 1 for line in lines for c in line)
+
+
+class TestComposition(unittest.TestCase):
+
+    def setUp(self):
+        self.lines = ["#######",
+                      "#..#..#",
+                      "#..#..#",
+                      "#######",
+                      "#.....#",
+                      "#######"]
+        self.walkable = layer_from_lines(self.lines)
+        self.region_map = RegionMap(7, 6, self.walkable)
+
+    def test_walls_have_no_region(self):
+        self.assertEqual(self.region_map.get_label((0, 0)), NO_REGION)
+
+    def test_separated_rooms_are_different_regions(self):
+        self.assertTrue(self.region_map.is_connected((1, 1), (2, 2)))
+        self.assertFalse(self.region_map.is_connected((1, 1), (4, 1)))
+        self.assertFalse(self.region_map.is_connected((1, 1), (1, 4)))
+
+    def test_region_positions_are_the_reachable_positions(self):
+        self.assertEqual(sorted(self.region_map.get_region_positions((4, 1))),
+                         [(4, 1), (4, 2), (5, 1), (5, 2)])
+
+    def test_region_positions_of_wall_joins_the_neighbouring_regions(self):
+        positions = self.region_map.get_region_positions((3, 1))
+        self.assertEqual(len(positions), 9)
+        self.assertTrue((3, 1) in positions)
+
+    def test_opening_a_wall_joins_regions(self):
+        self.walkable[1 * 7 + 3] = 1
+        self.region_map.update_point((3, 1))
+        self.assertTrue(self.region_map.is_connected((1, 1), (5, 2)))
+        self.assertEqual(len(self.region_map.get_region_positions((1, 1))), 9)
+
+    def test_diagonal_step_joins_regions(self):
+        self.walkable[3 * 7 + 2] = 1
+        self.region_map.update_point((2, 3))
+        self.assertTrue(self.region_map.is_connected((1, 1), (3, 4)))
+
+    def test_closing_a_passage_splits_the_region(self):
+        self.walkable[1 * 7 + 3] = 1
+        self.region_map.update_point((3, 1))
+        self.walkable[1 * 7 + 3] = 0
+        self.region_map.update_point((3, 1))
+        self.assertFalse(self.region_map.is_connected((1, 1), (5, 2)))
+        self.assertEqual(len(self.region_map.get_region_positions((5, 2))), 4)
+
+    def test_incremental_updates_give_the_same_regions_as_rebuilding(self):
+        for point in [(3, 1), (2, 3), (3, 2), (3, 1), (4, 3)]:
+            x, y = point
+            self.walkable[y * 7 + x] = 0 if self.walkable[y * 7 + x] else 1
+            self.region_map.update_point(point)
+            rebuilt = RegionMap(7, 6, self.walkable)
+            for a in range(7 * 6):
+                for b in range(7 * 6):
+                    point_a = (a % 7, a // 7)
+                    point_b = (b % 7, b // 7)
+                    self.assertEqual(self.region_map.is_connected(point_a, point_b),
+                                     rebuilt.is_connected(point_a, point_b))
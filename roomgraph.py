@@ -0,0 +1,208 @@
+"""
+The rooms of a generated level and the corridors between them.
+
+The generator keeps the room centres and corridor corners it joined as a graph.
+For pathfinding the walkable tiles are split into rooms around these nodes, every
+tile belongs to the node closest to it, and rooms that touch are joined by portals.
+Long paths are planned over the rooms first, then searched for only inside the
+rooms on the route instead of on the whole level.
+"""
+from array import array
+from collections import deque
+import heapq
+
+import geometry
+import pathfinding
+
+# Paths between points closer than this are searched for directly.
+LONG_PATH_DISTANCE = 16
+NO_ROOM = -1
+
+_NEIGHBOURS = [(0, -1), (-1, 0), (1, 0), (0, 1), (-1, -1), (1, -1), (-1, 1), (1, 1)]
+
+
+class RoomGraph(object):
+    """
+    The room centres and corridor corners of a generated level and the corridors joining them.
+    """
+    def __init__(self):
+        self.neighbours = {}
+
+    def add_edge(self, point, other_point):
+        self.neighbours.setdefault(point, set()).add(other_point)
+        self.neighbours.setdefault(other_point, set()).add(point)
+
+    def get_nodes(self):
+        return self.neighbours.keys()
+
+    def get_edges(self):
+        """
+        Gets every edge once, as a pair of points.
+        """
+        return [(point, neighbour) for point, neighbours in self.neighbours.iteritems()
+                for neighbour in neighbours if point < neighbour]
+
+    def offset(self, offset):
+        """
+        Gets a copy of the graph with every node moved by offset.
+        """
+        result = RoomGraph()
+        for point, neighbour in self.get_edges():
+            result.add_edge(geometry.add_2d(point, offset), geometry.add_2d(neighbour, offset))
+        return result
+
+
+class RoomMap(object):
+    """
+    The walkable tiles of a walkability layer split into rooms around the nodes of a room graph.
+
+    Tiles that can't be reached from any node belong to no room. When the walkability
+    of a tile changes the rooms are patched around it instead of split anew, so they
+    may stop being the closest rooms or leave tiles out. Paths are still only searched
+    for inside the rooms, and where the rooms can't find a path they return none.
+    The searches inside the rooms are counted in stats if it is given.
+    """
+    def __init__(self, width, height, walkable, nodes, stats=None):
+        self.width = width
+        self.height = height
+        self.stats = stats
+        self.labels = array('i', [NO_ROOM]) * (width * height)
+        self.room_tiles = []
+        self.portals = []
+        self._search_area = bytearray(width * height)
+        self._distances = array('i', [0]) * (width * height)
+        distances = self._distances
+        frontier = deque()
+        for x, y in sorted(nodes):
+            if not (0 <= x < width and 0 <= y < height):
+                continue
+            index = y * width + x
+            if walkable[index] and self.labels[index] == NO_ROOM:
+                self.labels[index] = len(self.room_tiles)
+                self.room_tiles.append([index])
+                self.portals.append({})
+                frontier.append(index)
+        while frontier:
+            index = frontier.popleft()
+            label = self.labels[index]
+            x = index % width
+            y = index // width
+            for dx, dy in _NEIGHBOURS:
+                neighbour_x = x + dx
+                neighbour_y = y + dy
+                if not (0 <= neighbour_x < width and 0 <= neighbour_y < height):
+                    continue
+                neighbour = neighbour_y * width + neighbour_x
+                if not walkable[neighbour]:
+                    continue
+                neighbour_label = self.labels[neighbour]
+                if neighbour_label == NO_ROOM:
+                    self.labels[neighbour] = label
+                    distances[neighbour] = distances[index] + 1
+                    self.room_tiles[label].append(neighbour)
+                    frontier.append(neighbour)
+                elif neighbour_label != label:
+                    cost = distances[index] + 1 + distances[neighbour]
+                    if cost < self.portals[label].get(neighbour_label, cost + 1):
+                        self.portals[label][neighbour_label] = cost
+                        self.portals[neighbour_label][label] = cost
+
+    def set_walkable(self, x, y, is_walkable):
+        """
+        Patches the rooms after the walkability of the tile at x, y has changed.
+
+        A tile that becomes walkable joins the closest room touching it, and touching rooms
+        are joined through it. A tile that stops being walkable leaves its room.
+        """
+        index = y * self.width + x
+        label = self.labels[index]
+        if not is_walkable:
+            if label != NO_ROOM:
+                self.room_tiles[label].remove(index)
+                self.labels[index] = NO_ROOM
+            return
+        if label != NO_ROOM:
+            return
+        touching = []
+        for dx, dy in _NEIGHBOURS:
+            neighbour_x = x + dx
+            neighbour_y = y + dy
+            if not (0 <= neighbour_x < self.width and 0 <= neighbour_y < self.height):
+                continue
+            neighbour = neighbour_y * self.width + neighbour_x
+            if self.labels[neighbour] != NO_ROOM:
+                touching.append((self._distances[neighbour], self.labels[neighbour]))
+        if len(touching) == 0:
+            return
+        distance, label = min(touching)
+        self.labels[index] = label
+        self._distances[index] = distance + 1
+        self.room_tiles[label].append(index)
+        for neighbour_distance, neighbour_label in touching:
+            if neighbour_label != label:
+                cost = distance + 2 + neighbour_distance
+                if cost < self.portals[label].get(neighbour_label, cost + 1):
+                    self.portals[label][neighbour_label] = cost
+                    self.portals[neighbour_label][label] = cost
+
+    def get_room(self, point):
+        """
+        Gets the room of the point, NO_ROOM if it belongs to none.
+        """
+        x, y = point
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            return NO_ROOM
+        return self.labels[y * self.width + x]
+
+    def get_route(self, start_room, destination_room):
+        """
+        Gets the rooms on the shortest route between two rooms, both included.
+
+        Returns:
+            The list of rooms, empty if the rooms are not connected.
+        """
+        distances = {start_room: 0}
+        previous = {}
+        queue = [(0, start_room)]
+        while queue:
+            distance, room = heapq.heappop(queue)
+            if room == destination_room:
+                route = [room]
+                while room in previous:
+                    room = previous[room]
+                    route.append(room)
+                route.reverse()
+                return route
+            if distance > distances[room]:
+                continue
+            for neighbour, cost in self.portals[room].iteritems():
+                neighbour_distance = distance + cost
+                if not neighbour in distances or neighbour_distance < distances[neighbour]:
+                    distances[neighbour] = neighbour_distance
+                    previous[neighbour] = room
+                    heapq.heappush(queue, (neighbour_distance, neighbour))
+        return []
+
+    def compute_path(self, start, destination):
+        """
+        Computes a path from start to destination through the rooms on the route between them.
+
+        Returns:
+            The points of the path without start, None if the rooms can't help finding it.
+        """
+        start_room = self.get_room(start)
+        destination_room = self.get_room(destination)
+        if start_room == NO_ROOM or destination_room == NO_ROOM:
+            return None
+        route = self.get_route(start_room, destination_room)
+        if len(route) == 0:
+            return None
+        search_area = self._search_area
+        for room in route:
+            for index in self.room_tiles[room]:
+                search_area[index] = 1
+        path = pathfinding.jump_point_search(search_area, self.width, self.height, start, destination, self.stats)
+        for room in route:
+            for index in self.room_tiles[room]:
+                search_area[index] = 0
+        return path
@@ -0,0 +1,64 @@
+import unittest
+from roomgraph import RoomGraph, RoomMap, NO_ROOM
+
+
+def layer_from_lines(lines):
+    return bytearray(0 if c == "#" else 1 for line in lines for c in line)
+
+
+class TestComposition(unittest.TestCase):
+
+    def setUp(self):
+        self.lines = ["###########",
+                      "#...#.....#",
+                      "#.........#",
+                      "#...#.....#",
+                      "#####.....#",
+                      "#...#######",
+                      "#...#######",
+                      "###########"]
+        self.walkable = layer_from_lines(self.lines)
+        self.room_graph = RoomGraph()
+        self.room_graph.add_edge((2, 2), (7, 2))
+        self.room_graph.add_edge((7, 2), (2, 5))
+        self.room_map = RoomMap(11, 8, self.walkable, self.room_graph.get_nodes())
+
+    def test_offset_moves_every_edge(self):
+        moved = self.room_graph.offset((1, 2))
+        self.assertEqual(sorted(moved.get_edges()), [((3, 4), (8, 4)), ((3, 7), (8, 4))])
+
+    def test_tiles_belong_to_the_room_of_the_closest_node(self):
+        self.assertEqual(self.room_map.get_room((1, 1)), self.room_map.get_room((2, 2)))
+        self.assertEqual(self.room_map.get_room((9, 4)), self.room_map.get_room((7, 2)))
+        self.assertNotEqual(self.room_map.get_room((1, 1)), self.room_map.get_room((9, 4)))
+        self.assertEqual(self.room_map.get_room((0, 0)), NO_ROOM)
+
+    def test_route_goes_through_touching_rooms(self):
+        left = self.room_map.get_room((2, 2))
+        right = self.room_map.get_room((7, 2))
+        isolated = self.room_map.get_room((2, 5))
+        self.assertEqual(self.room_map.get_route(left, right), [left, right])
+        self.assertEqual(self.room_map.get_route(left, isolated), [])
+
+    def test_path_is_searched_inside_the_rooms_on_the_route(self):
+        path = self.room_map.compute_path((1, 1), (9, 4))
+        self.assertEqual(len(path), 8)
+        self.assertEqual(path[-1], (9, 4))
+        self.assertEqual(self.room_map.compute_path((1, 1), (2, 5)), None)
+
+    def test_tile_made_walkable_joins_the_touching_rooms(self):
+        left = self.room_map.get_room((2, 2))
+        isolated = self.room_map.get_room((2, 5))
+        self.walkable[4 * 11 + 2] = 1
+        self.room_map.set_walkable(2, 4, True)
+        self.assertTrue(self.room_map.get_room((2, 4)) in (left, isolated))
+        self.assertEqual(self.room_map.get_route(left, isolated), [left, isolated])
+        path = self.room_map.compute_path((1, 1), (2, 6))
+        self.assertEqual(path[-1], (2, 6))
+
+    def test_tile_made_unwalkable_leaves_its_room(self):
+        self.walkable[2 * 11 + 4] = 0
+        self.room_map.set_walkable(4, 2, False)
+        self.assertEqual(self.room_map.get_room((4, 2)), NO_ROOM)
+        self.assertFalse(any(2 * 11 + 4 in tiles for tiles in self.room_map.room_tiles))
+        self.assertEqual(self.room_map.compute_path((1, 1), (9, 4)), [])
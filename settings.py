@@ -6,6 +6,8 @@ menu_theme = "ff_blue_theme"
 interface_theme = "rogue_classic_theme"
 
 DEV_MODE_FLAG = "--dev-mode" in sys.argv
+LEVEL_CACHE_FLAG = "--level-cache" in sys.argv
+GENERATE_ALL_LEVELS_FLAG = "--generate-all-levels" in sys.argv
 
 defaults = {
     'resolution_width': '1024',
@@ -1,9 +1,10 @@
 import random
-import libtcodpy as libtcod
 import math
 import rng
 import direction
 import geometry as geo
+import pathfinding
+from shapemask import ShapeMask
 
 
 def dfs_tunnler(start_position, min_length, max_length,
@@ -29,17 +30,12 @@ def fractal_rectangle(start_position, max_width, max_height, min_width=1, min_he
 
     length = max_width / 4 if frame[0][0] == 0 or frame[0][0] == max_width else max_height / 4
     for point in frame:
-        libtcod.line_init(start_position[0], start_position[1], point[0], point[1])
-        x, y = libtcod.line_step()
+        line = pathfinding.line(start_position, point)
         max_length = max_width / 2 if point[0] == 0 or point[0] == max_width else max_height / 2
         min_length = min_width / 2 if point[1] == 0 or point[1] == min_width else min_height / 2
         delta = random.sample([0, 0, 0, 0, 1, 1, -1, -1, -1], 1)[0]
         length = min(max((delta + length), min_length), max_length)
-        i = length
-        while not x is None and i > 0:
-            visited.add((x, y))
-            x, y = libtcod.line_step()
-            i -= 1
+        visited.update(line[:max(length, 0)])
 
     return visited
 
@@ -95,15 +91,19 @@ def random_explosion(start_pos, size, move_list=None):
         move_list = direction.DIRECTIONS
     position = start_pos
     visited = set()
-    unvisited_positions = set()
+    seen = set([start_pos])
+    unvisited_positions = []
     while len(visited) < size:
         visited.add(position)
-        neighbors = set([geo.add_2d(position, _direction)
-                         for _direction in move_list])
-        unvisited_neighbors = neighbors - visited
-        unvisited_positions = unvisited_positions | unvisited_neighbors
+        for _direction in move_list:
+            neighbor = geo.add_2d(position, _direction)
+            if not neighbor in seen:
+                seen.add(neighbor)
+                unvisited_positions.append(neighbor)
         if len(unvisited_positions) >= 1:
-            position = random.sample(unvisited_positions, 1)[0]
+            index = random.randrange(len(unvisited_positions))
+            unvisited_positions[index], unvisited_positions[-1] = unvisited_positions[-1], unvisited_positions[index]
+            position = unvisited_positions.pop()
         else:
             break
     return visited
@@ -214,17 +214,8 @@ def _manhattan_walker_recursive(start_point, end_point, points):
     return _manhattan_walker_recursive(new_start_point, end_point, points)
 
 
-def get_neighbours_points(point):
-    return [geo.add_2d(p, point) for p in direction.DIRECTIONS]
-
-
 def smooth_shape(shape, minimum_number_of_neighbours=3):
-    result_shape = set()
-    for point in shape:
-        filled_neighbors = [p for p in get_neighbours_points(point) if p in shape]
-        if len(filled_neighbors) >= minimum_number_of_neighbours:
-            result_shape.add(point)
-    return result_shape
+    return ShapeMask.from_points(shape).smooth(minimum_number_of_neighbours).points()
 
 
 class Shape(object):
@@ -0,0 +1,205 @@
+"""
+Shapes of points as bit masks, for dungeon generation.
+
+A mask covers a rectangular frame of the plane. Its points are the set bits of one
+integer, row after row, with a clear bit after each row so shifted rows never spill
+into each other. Operations on whole shapes, like union and smoothing, are then a few
+integer operations instead of a loop over the points.
+"""
+import binascii
+
+import geometry as geo
+
+
+class ShapeMask(object):
+    def __init__(self, left, top, width, height, bits=0):
+        """
+        Args:
+            left, top: The top left point of the frame.
+            width, height: The size of the frame.
+            bits: Bit y * (width + 1) + x is set if point (left + x, top + y) is in the shape.
+        """
+        self.left = left
+        self.top = top
+        self.width = width
+        self.height = height
+        self.bits = bits
+
+    @staticmethod
+    def from_points(points):
+        """
+        Creates the mask of a collection of points, its frame fits them tightly.
+        """
+        if len(points) == 0:
+            return ShapeMask(0, 0, 0, 0)
+        xs = [x for x, _ in points]
+        ys = [y for _, y in points]
+        left = min(xs)
+        top = min(ys)
+        width = max(xs) - left + 1
+        height = max(ys) - top + 1
+        stride = width + 1
+        data = bytearray((stride * height + 7) >> 3)
+        for x, y in points:
+            index = (y - top) * stride + x - left
+            data[index >> 3] |= 1 << (index & 7)
+        data.reverse()
+        return ShapeMask(left, top, width, height, int(binascii.hexlify(data), 16))
+
+    @staticmethod
+    def from_rectangle(corner, other_corner):
+        """
+        Creates the mask of the filled rectangle between two corners, both included.
+        """
+        left = min(corner[0], other_corner[0])
+        top = min(corner[1], other_corner[1])
+        width = abs(corner[0] - other_corner[0]) + 1
+        height = abs(corner[1] - other_corner[1]) + 1
+        return ShapeMask(left, top, width, height, _full_frame(width, height))
+
+    def __len__(self):
+        return bin(self.bits).count("1")
+
+    def __contains__(self, point):
+        x = point[0] - self.left
+        y = point[1] - self.top
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            return False
+        return (self.bits >> (y * (self.width + 1) + x)) & 1 == 1
+
+    def points(self):
+        """
+        Gets the points of the shape as a set.
+        """
+        result = set()
+        if self.bits == 0:
+            return result
+        stride = self.width + 1
+        hex_digits = "%x" % self.bits
+        data = bytearray(binascii.unhexlify(("0" * (len(hex_digits) & 1)) + hex_digits))
+        data.reverse()
+        for byte_index, byte in enumerate(data):
+            if byte == 0:
+                continue
+            for bit in range(8):
+                if byte & (1 << bit):
+                    index = (byte_index << 3) + bit
+                    result.add((self.left + index % stride, self.top + index // stride))
+        return result
+
+    def offset(self, offset):
+        """
+        Gets the shape moved by offset.
+        """
+        return ShapeMask(self.left + offset[0], self.top + offset[1], self.width, self.height, self.bits)
+
+    def union(self, other):
+        """
+        Gets the points in either shape.
+        """
+        if self.bits == 0:
+            return other
+        if other.bits == 0:
+            return self
+        left = min(self.left, other.left)
+        top = min(self.top, other.top)
+        width = max(self.left + self.width, other.left + other.width) - left
+        height = max(self.top + self.height, other.top + other.height) - top
+        return ShapeMask(left, top, width, height,
+                         self._bits_in_frame(left, top, width, height) |
+                         other._bits_in_frame(left, top, width, height))
+
+    def difference(self, other):
+        """
+        Gets the points of this shape not in the other shape.
+        """
+        return ShapeMask(self.left, self.top, self.width, self.height,
+                         self.bits & ~other._bits_in_frame(self.left, self.top, self.width, self.height))
+
+    def smooth(self, minimum_number_of_neighbours=3):
+        """
+        Gets the points of the shape with at least minimum_number_of_neighbours of their
+        eight neighbours in the shape.
+        """
+        at_least = [_full_frame(self.width, self.height)] + [0] * minimum_number_of_neighbours
+        for neighbours in self._neighbour_layers():
+            for count in range(minimum_number_of_neighbours, 0, -1):
+                at_least[count] |= at_least[count - 1] & neighbours
+        return ShapeMask(self.left, self.top, self.width, self.height,
+                         self.bits & at_least[minimum_number_of_neighbours])
+
+    def dilate(self):
+        """
+        Gets the points of the shape and the points next to them, diagonals included.
+        """
+        grown = ShapeMask(self.left - 1, self.top - 1, self.width + 2, self.height + 2,
+                          self._bits_in_frame(self.left - 1, self.top - 1, self.width + 2, self.height + 2))
+        bits = grown.bits
+        for neighbours in grown._neighbour_layers():
+            bits |= neighbours
+        grown.bits = bits & _full_frame(grown.width, grown.height)
+        return grown
+
+    def calc_rect(self):
+        """
+        Gets the smallest rectangle containing the shape, like Shape.calc_rect.
+        """
+        stride = self.width + 1
+        row_mask = (1 << self.width) - 1
+        columns = 0
+        for y in range(self.height):
+            columns |= (self.bits >> (y * stride)) & row_mask
+        left = _lowest_bit(columns)
+        right = columns.bit_length() - 1
+        top = _lowest_bit(self.bits) // stride
+        bottom = (self.bits.bit_length() - 1) // stride
+        return geo.Rect((self.left + left, self.top + top), right - left, bottom - top)
+
+    def _neighbour_layers(self):
+        """
+        Gets a layer per direction, with a bit set for each point that has its neighbour
+        in that direction in the shape. Bits outside the frame must be masked out.
+        """
+        bits = self.bits
+        stride = self.width + 1
+        frame = _full_frame(self.width, self.height)
+        return [(bits >> shift) & frame for shift in [1, stride - 1, stride, stride + 1]] + \
+               [(bits << shift) & frame for shift in [1, stride - 1, stride, stride + 1]]
+
+    def _bits_in_frame(self, left, top, width, height):
+        """
+        Gets the bits of the shape in another frame, points outside it are left out.
+        """
+        if (left, top, width, height) == (self.left, self.top, self.width, self.height):
+            return self.bits
+        stride = self.width + 1
+        new_stride = width + 1
+        row_mask = (1 << self.width) - 1
+        new_row_mask = (1 << width) - 1
+        dx = self.left - left
+        rows = []
+        for y in range(self.height):
+            new_y = y + self.top - top
+            if not 0 <= new_y < height:
+                continue
+            row = (self.bits >> (y * stride)) & row_mask
+            row = (row << dx if dx >= 0 else row >> -dx) & new_row_mask
+            if row:
+                rows.append(row << (new_y * new_stride))
+        result = 0
+        for row in rows:
+            result |= row
+        return result
+
+
+def _full_frame(width, height):
+    """
+    Gets the bits of a frame with every point set.
+    """
+    if width <= 0 or height <= 0:
+        return 0
+    return int(("0" + "1" * width) * height, 2)
+
+
+def _lowest_bit(bits):
+    return (bits & -bits).bit_length() - 1
@@ -0,0 +1,47 @@
+import unittest
+from shapemask import ShapeMask
+
+
+def points_from_lines(lines, left=0, top=0):
+    return set((left + x, top + y) for y, line in enumerate(lines) for x, c in enumerate(line) if c == "#")
+
+
+class TestComposition(unittest.TestCase):
+
+    def setUp(self):
+        self.points = points_from_lines([".###.",
+                                         "####.",
+                                         "..#..",
+                                         "....#"], left=-2, top=3)
+        self.shape = ShapeMask.from_points(self.points)
+
+    def test_points_round_trip(self):
+        self.assertEqual(self.shape.points(), self.points)
+        self.assertEqual(len(self.shape), len(self.points))
+        self.assertTrue((0, 5) in self.shape)
+        self.assertFalse((-2, 3) in self.shape)
+
+    def test_union_and_difference_across_frames(self):
+        other = ShapeMask.from_rectangle((1, 4), (4, 7))
+        rectangle = points_from_lines(["####"] * 4, left=1, top=4)
+        self.assertEqual(self.shape.union(other).points(), self.points | rectangle)
+        self.assertEqual(self.shape.difference(other).points(), self.points - rectangle)
+
+    def test_smooth_keeps_points_with_enough_neighbours(self):
+        expected = points_from_lines([".###.",
+                                      ".###.",
+                                      "..#.."], left=-2, top=3)
+        self.assertEqual(self.shape.smooth().points(), expected)
+
+    def test_dilate_surrounds_the_shape(self):
+        room = ShapeMask.from_rectangle((0, 0), (1, 1))
+        self.assertEqual(room.dilate().difference(room).points(),
+                         points_from_lines(["####",
+                                            "#..#",
+                                            "#..#",
+                                            "####"], left=-1, top=-1))
+
+    def test_calc_rect_and_offset(self):
+        rect = self.shape.offset((2, -3)).calc_rect()
+        self.assertEqual(rect.top_left, (0, 0))
+        self.assertEqual((rect.width, rect.height), (4, 3))
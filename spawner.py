@@ -2,8 +2,9 @@ import logging
 import random
 from compositecore import Composite
 from mover import Mover
-from stats import GamePieceTypes
+from stats import DataPoint, DataTypes, GamePieceTypes
 import dungeontrash
+import geometry
 import item
 import monster
 import rng
@@ -11,21 +12,156 @@ from statusflags import StatusFlags
 from text import Description
 
 
+def new_from_template(creator, game_state):
+    """
+    Creates a piece and marks it with the id of its template,
+    so it can be written to a level snapshot.
+    """
+    piece = creator(game_state)
+    piece.set_child(DataPoint(DataTypes.TEMPLATE_ID, creator.__name__))
+    return piece
+
+
+def get_spawn_pool(dungeon_level):
+    """
+    Gets the spawn pool kept by the dungeon level, created when it is first needed.
+    """
+    if dungeon_level.spawn_pool is None:
+        dungeon_level.spawn_pool = SpawnPool(dungeon_level)
+    return dungeon_level.spawn_pool
+
+
 def place_piece_on_random_walkable_tile(piece, dungeon_level):
-    walker = piece
-    if not piece.has("status_flags"):
-        walker = dummy_player
-    positions = dungeon_level.get_random_walkable_positions_in_dungeon(walker)
-    random.shuffle(positions)
-    for position in positions:
-        tile = dungeon_level.get_tile(position)
-        if not tile.get_dungeon_feature() and piece.mover.try_move(position, dungeon_level):
+    return get_spawn_pool(dungeon_level).place_piece(piece)
+
+
+class SpawnPool(object):
+    """
+    The free positions of a dungeon level that new pieces can be placed on.
+
+    Keeps a bag of candidate positions per movement class and piece type, so placing
+    a piece does not depend on the size of the level. A position is only checked when
+    it is drawn, positions a piece can no longer be placed on are dropped. When a bag
+    has no position left the level has changed since it was filled, it is filled anew
+    once from the current level before placing fails.
+    """
+    def __init__(self, dungeon_level):
+        self.dungeon_level = dungeon_level
+        self._bags = {}
+        self._stairs_positions = None
+
+    def place_piece(self, piece, allow_on_item=True, minimum_stairs_distance=0):
+        """
+        Places piece on a random walkable tile without a dungeon feature.
+
+        Args:
+            piece: The piece to place.
+            allow_on_item: If False tiles with an item are skipped.
+            minimum_stairs_distance: The preferred least chess distance from the up stairs.
+                It is not a hard limit, if every free position is closer it is halved
+                until a position is found, down to no limit at all.
+
+        Returns:
+            True if the piece was placed.
+        """
+        walker = piece
+        if not piece.has("status_flags"):
+            walker = dummy_player
+        piece_type = piece.game_piece_type.value
+        key = (walker.mover.terrain_signature(), piece_type)
+        is_refilled = not key in self._bags
+        bag = self._get_bag(walker, key)
+        stairs_distance = minimum_stairs_distance
+        while True:
+            position = bag.pop_random(lambda candidate:
+                                      self._is_allowed(candidate, allow_on_item, stairs_distance))
+            if position is None:
+                if stairs_distance > 0:
+                    stairs_distance //= 2
+                    continue
+                if is_refilled:
+                    return False
+                del self._bags[key]
+                bag = self._get_bag(walker, key)
+                is_refilled = True
+                stairs_distance = minimum_stairs_distance
+            elif piece.mover.try_move(position, self.dungeon_level):
+                self._remove_position(position, piece_type)
+                return True
+
+    def _is_allowed(self, position, allow_on_item, minimum_stairs_distance):
+        tile = self.dungeon_level.get_tile(position)
+        if tile.get_dungeon_feature():
+            return False
+        if not allow_on_item and tile.has_piece_of_type(GamePieceTypes.ITEM):
+            return False
+        if minimum_stairs_distance <= 0:
             return True
-    return False
+        return all(geometry.chess_distance(position, stairs_position) >= minimum_stairs_distance
+                   for stairs_position in self._get_stairs_positions())
+
+    def _get_bag(self, walker, key):
+        if not key in self._bags:
+            position = self._get_stairs_positions()[0]
+            self._bags[key] = _PositionBag(self.dungeon_level.get_walkable_positions(walker, position))
+        return self._bags[key]
+
+    def _get_stairs_positions(self):
+        if self._stairs_positions is None:
+            self._stairs_positions = [stairs.position.value for stairs in self.dungeon_level.up_stairs]
+        return self._stairs_positions
+
+    def _remove_position(self, position, piece_type):
+        for (_, bag_piece_type), bag in self._bags.iteritems():
+            if bag_piece_type == piece_type:
+                bag.remove(position)
+
+
+class _PositionBag(object):
+    """
+    An unordered set of positions that supports removing a random position in O(1).
+    """
+    def __init__(self, positions):
+        self._positions = list(positions)
+        self._indices = dict((position, index) for index, position in enumerate(self._positions))
+
+    def __len__(self):
+        return len(self._positions)
+
+    def remove(self, position):
+        index = self._indices.pop(position, None)
+        if index is None:
+            return
+        last = self._positions.pop()
+        if index < len(self._positions):
+            self._positions[index] = last
+            self._indices[last] = index
+
+    def pop_random(self, is_allowed):
+        """
+        Removes and returns a random allowed position, None if there is none.
+
+        Positions that are not allowed stay in the bag.
+        """
+        positions = self._positions
+        end = len(positions)
+        while end > 0:
+            index = random.randrange(end)
+            end -= 1
+            position = positions[index]
+            if is_allowed(position):
+                self.remove(position)
+                return position
+            # Move the rejected position out of the range that is drawn from.
+            positions[index] = positions[end]
+            positions[end] = position
+            self._indices[positions[index]] = index
+            self._indices[position] = end
+        return None
 
 
 def spawn_rat_man(dungeon_level, game_state):
-    rat = monster.new_ratman(game_state)
+    rat = new_from_template(monster.new_ratman, game_state)
     spawn_succeeded = place_piece_on_random_walkable_tile(rat, dungeon_level)
     if not spawn_succeeded:
         logging.info("could not spawn rat-man")
@@ -64,7 +200,9 @@ def spawn_corpse_on_position(position, dungeon_level, game_state):
     return True
 
 
-def place_health_potions(dungeon_level, game_state):
+def place_health_potions(dungeon_level, game_state, spawn_pool=None):
+    if spawn_pool is None:
+        spawn_pool = get_spawn_pool(dungeon_level)
     health_potions_to_spawn = 0
 
     for _ in range(2):
@@ -74,24 +212,13 @@ def place_health_potions(dungeon_level, game_state):
         health_potions_to_spawn += 2
     health_potions_to_spawn += 1
     for _ in range(health_potions_to_spawn):
-        potion = item.new_health_potion(game_state)
-        place_piece_on_random_walkable_tile_not_on_item_or_feature(potion, dungeon_level)
+        potion = new_from_template(item.new_health_potion, game_state)
+        spawn_pool.place_piece(potion, allow_on_item=False)
     #print "HP pots spawned: ", health_potions_to_spawn
 
 
 def place_piece_on_random_walkable_tile_not_on_item_or_feature(piece, dungeon_level):
-    walker = piece
-    if not piece.has("status_flags"):
-        walker = dummy_player
-    for position in dungeon_level.get_random_walkable_positions_in_dungeon(walker):
-        tile = dungeon_level.get_tile(position)
-        if (tile.has_piece_of_type(GamePieceTypes.ITEM) or
-                tile.has_piece_of_type(GamePieceTypes.DUNGEON_FEATURE)):
-            continue
-        move_succeeded = piece.mover.try_move(position, dungeon_level)
-        if move_succeeded:
-            return True
-    return False
+    return get_spawn_pool(dungeon_level).place_piece(piece, allow_on_item=False)
 
 dummy_player = Composite()
 dummy_player.set_child(StatusFlags([StatusFlags.CAN_OPEN_DOORS]))
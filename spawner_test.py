@@ -0,0 +1,100 @@
+import unittest
+import dungeonlevelfactory
+import geometry
+import item
+import monster
+import spawner
+
+
+def level_from_lines(lines):
+    return dungeonlevelfactory.dungeon_level_from_lines(lines)
+
+
+def new_ratman():
+    return spawner.new_from_template(monster.new_ratman, None)
+
+
+def new_device():
+    return spawner.new_from_template(item.new_zap_device, None)
+
+
+class TestComposition(unittest.TestCase):
+
+    def setUp(self):
+        self.dungeon_level = level_from_lines(["##########",
+                                               "#>.......#",
+                                               "#........#",
+                                               "##########"])
+        self.spawn_pool = spawner.SpawnPool(self.dungeon_level)
+
+    def test_monsters_keep_the_distance_from_the_stairs(self):
+        ratmen = [new_ratman() for _ in range(6)]
+        for ratman in ratmen:
+            self.assertTrue(self.spawn_pool.place_piece(ratman, minimum_stairs_distance=5))
+        positions = set(ratman.position.value for ratman in ratmen)
+        self.assertEqual(len(positions), 6)
+        self.assertTrue(all(geometry.chess_distance(position, (1, 1)) >= 5 for position in positions))
+
+    def test_distance_is_relaxed_when_no_position_is_far_enough(self):
+        for _ in range(6):
+            self.spawn_pool.place_piece(new_ratman(), minimum_stairs_distance=5)
+        ratman = new_ratman()
+        self.assertTrue(self.spawn_pool.place_piece(ratman, minimum_stairs_distance=5))
+        self.assertTrue(2 <= geometry.chess_distance(ratman.position.value, (1, 1)) < 5)
+
+    def test_every_free_position_is_used_once(self):
+        devices = [new_device() for _ in range(15)]
+        for device in devices:
+            self.assertTrue(self.spawn_pool.place_piece(device))
+        positions = set(device.position.value for device in devices)
+        self.assertEqual(len(positions), 15)
+        self.assertFalse((1, 1) in positions)
+        self.assertFalse(self.spawn_pool.place_piece(new_device()))
+
+    def test_pieces_of_other_types_share_positions_unless_items_are_avoided(self):
+        for _ in range(15):
+            self.spawn_pool.place_piece(new_device())
+        self.assertTrue(self.spawn_pool.place_piece(new_ratman()))
+        self.assertFalse(self.spawn_pool.place_piece(new_ratman(), allow_on_item=False))
+
+    def test_level_keeps_one_pool(self):
+        spawn_pool = spawner.get_spawn_pool(self.dungeon_level)
+        self.assertTrue(spawner.get_spawn_pool(self.dungeon_level) is spawn_pool)
+        self.assertTrue(spawner.place_piece_on_random_walkable_tile(new_device(), self.dungeon_level))
+        self.assertEqual(len(spawn_pool._bags), 1)
+
+    def test_pool_is_refilled_when_the_level_has_changed(self):
+        spawn_pool = spawner.get_spawn_pool(self.dungeon_level)
+        devices = [new_device() for _ in range(15)]
+        for device in devices:
+            spawn_pool.place_piece(device)
+        freed_position = devices[3].position.value
+        devices[3].mover.try_remove_from_dungeon()
+        device = new_device()
+        self.assertTrue(spawner.place_piece_on_random_walkable_tile(device, self.dungeon_level))
+        self.assertEqual(device.position.value, freed_position)
+        self.assertFalse(spawner.place_piece_on_random_walkable_tile(new_device(), self.dungeon_level))
+
+
+class TestPositionBag(unittest.TestCase):
+
+    def setUp(self):
+        self.bag = spawner._PositionBag([(0, 0), (1, 0), (2, 0), (3, 0)])
+
+    def test_pop_random_takes_an_allowed_position(self):
+        self.assertEqual(self.bag.pop_random(lambda position: position == (2, 0)), (2, 0))
+        self.assertEqual(len(self.bag), 3)
+        self.assertEqual(self.bag.pop_random(lambda position: position == (2, 0)), None)
+
+    def test_rejected_positions_stay_in_the_bag(self):
+        self.assertEqual(self.bag.pop_random(lambda position: False), None)
+        self.assertEqual(len(self.bag), 4)
+        self.assertEqual(self.bag.pop_random(lambda position: position == (0, 0)), (0, 0))
+
+    def test_removed_position_is_never_drawn(self):
+        self.bag.remove((1, 0))
+        self.bag.remove((1, 0))
+        self.assertEqual(len(self.bag), 3)
+        drawn = [self.bag.pop_random(lambda position: True) for _ in range(3)]
+        self.assertEqual(sorted(drawn), [(0, 0), (2, 0), (3, 0)])
+        self.assertEqual(self.bag.pop_random(lambda position: True), None)
@@ -116,6 +116,7 @@ class DataTypes:
     CLONE_FUNCTION = "clone_function"
 
     MINIMUM_DEPTH = "minimum_depth"
+    TEMPLATE_ID = "template_id"
 
     GAME_STATE = "game_state"
 
@@ -0,0 +1,148 @@
+"""
+The terrain of a dungeon level as one kind byte per tile.
+
+Level generation paints the layer and only creates terrain composites once, when the
+finished layer is turned into a dungeon level. Chunks of the level that hold nothing
+but wall are left untouched, like any chunk of a level that was never dug into.
+"""
+import dungeonlevel
+import terrain
+import tile
+from tilechunk import ChunkedTileMatrix, CHUNK_SIZE
+
+# The index of a terrain in this list is its kind id, only append to it.
+WALL = 0
+FLOOR = 1
+DOOR = 2
+OPEN_DOOR = 3
+WATER = 4
+GLASS_WALL = 5
+CHASM = 6
+UNKNOWN = 7
+TERRAIN_KINDS = [terrain.Wall, terrain.Floor, terrain.Door, terrain.Door,
+                 terrain.Water, terrain.GlassWall, terrain.Chasm, terrain.Unknown]
+
+SOLID_KINDS = frozenset([WALL, DOOR, GLASS_WALL, UNKNOWN])
+DOOR_KINDS = frozenset([DOOR, OPEN_DOOR])
+
+# Maps a kind to 1 if it is solid and 0 otherwise, for bytearray.translate.
+_SOLID_TABLE = bytes(bytearray(1 if kind in SOLID_KINDS else 0 for kind in range(256)))
+
+
+def get_terrain_kind(the_terrain):
+    """
+    Gets the kind id of the terrain that is stored in the terrain layer.
+    """
+    terrain_class = the_terrain.__class__
+    if terrain_class is terrain.Door and not the_terrain.has("is_solid"):
+        return OPEN_DOOR
+    return TERRAIN_KINDS.index(terrain_class)
+
+
+class TerrainLayer(object):
+    def __init__(self, width, height, kind=WALL):
+        self.width = width
+        self.height = height
+        self.kinds = bytearray([kind]) * (width * height)
+
+    @staticmethod
+    def from_dungeon_level(dungeon_level):
+        layer = TerrainLayer(dungeon_level.width, dungeon_level.height)
+        for y in range(layer.height):
+            for x in range(layer.width):
+                the_terrain = dungeon_level.get_tile_or_unknown((x, y)).get_terrain()
+                if the_terrain:
+                    layer.kinds[y * layer.width + x] = get_terrain_kind(the_terrain)
+        return layer
+
+    def get(self, point):
+        """
+        Gets the kind at point, points outside the layer are UNKNOWN.
+        """
+        x, y = point
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            return UNKNOWN
+        return self.kinds[y * self.width + x]
+
+    def fill(self, points, kind):
+        """
+        Sets the kind of every point inside the layer.
+        """
+        width = self.width
+        height = self.height
+        kinds = self.kinds
+        for x, y in points:
+            if 0 <= x < width and 0 <= y < height:
+                kinds[y * width + x] = kind
+
+    def is_suitable_for_door(self, point):
+        """
+        Checks if a door at point would join two walls without touching other doors or chasms.
+        """
+        if self.get(point) in SOLID_KINDS or self.get(point) == CHASM:
+            return False
+        x, y = point
+        up = self.get((x, y - 1))
+        down = self.get((x, y + 1))
+        left = self.get((x - 1, y))
+        right = self.get((x + 1, y))
+        # No door next to other door or chasm, it looks silly.
+        if any(kind in DOOR_KINDS or kind == CHASM for kind in [up, down, left, right]):
+            return False
+        up = up in SOLID_KINDS
+        down = down in SOLID_KINDS
+        left = left in SOLID_KINDS
+        right = right in SOLID_KINDS
+        return ((up and down and not (left or right)) or
+                (left and right and not (up or down)))
+
+    def cellular_automata_step(self):
+        """
+        Gets the layer after one step of the cave cellular automaton.
+
+        A tile becomes wall if five of the nine tiles around and including it are solid,
+        floor otherwise. Points outside the layer count as solid.
+        """
+        width = self.width
+        padded_width = width + 2
+        solid = bytearray([1]) * (padded_width * (self.height + 2))
+        for y in range(self.height):
+            start = (y + 1) * padded_width + 1
+            solid[start:start + width] = self.kinds[y * width:(y + 1) * width].translate(_SOLID_TABLE)
+        row_sums = []
+        for y in range(self.height + 2):
+            row = solid[y * padded_width:(y + 1) * padded_width]
+            row_sums.append([left + center + right for left, center, right in zip(row, row[1:], row[2:])])
+        result = TerrainLayer(width, self.height)
+        for y in range(self.height):
+            sums = [above + center + below
+                    for above, center, below in zip(row_sums[y], row_sums[y + 1], row_sums[y + 2])]
+            result.kinds[y * width:(y + 1) * width] = bytearray(WALL if total >= 5 else FLOOR for total in sums)
+        return result
+
+    def new_dungeon_level(self, depth):
+        """
+        Creates a dungeon level with the terrain of the layer in one pass.
+        """
+        tile_matrix = ChunkedTileMatrix(self.width, self.height, tile.new_sentinel_tile(terrain.Wall), terrain.Wall)
+        dungeon_level = dungeonlevel.DungeonLevel(tile_matrix, depth)
+        width = self.width
+        kinds = self.kinds
+        for top in range(0, self.height, CHUNK_SIZE):
+            for left in range(0, width, CHUNK_SIZE):
+                if not self._has_other_than_wall(left, top):
+                    continue
+                for x, y in tile_matrix.materialise_chunk(left, top, tile.Tile):
+                    kind = kinds[y * width + x]
+                    new_terrain = TERRAIN_KINDS[kind]()
+                    dungeon_level.put_terrain_on_new_tile(new_terrain, (x, y))
+                    if kind == OPEN_DOOR:
+                        new_terrain.open_door_action.open_door()
+        return dungeon_level
+
+    def _has_other_than_wall(self, left, top):
+        right = min(left + CHUNK_SIZE, self.width)
+        for y in range(top, min(top + CHUNK_SIZE, self.height)):
+            if self.kinds[y * self.width + left:y * self.width + right].strip(chr(WALL)):
+                return True
+        return False
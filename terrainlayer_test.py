@@ -0,0 +1,46 @@
+import unittest
+from terrainlayer import TerrainLayer, WALL, FLOOR, DOOR, CHASM
+
+
+def layer_from_lines(lines):
+    layer = TerrainLayer(len(lines[0]), len(lines))
+    kinds = {"#": WALL, ".": FLOOR, "+": DOOR, "_": CHASM}
+    layer.kinds = bytearray(kinds[c] for line in lines for c in line)
+    return layer
+
+
+def lines_from_layer(layer):
+    characters = {WALL: "#", FLOOR: ".", DOOR: "+", CHASM: "_"}
+    return ["".join(characters[kind] for kind in layer.kinds[y * layer.width:(y + 1) * layer.width])
+            for y in range(layer.height)]
+
+
+class TestComposition(unittest.TestCase):
+
+    def test_door_joins_two_walls(self):
+        layer = layer_from_lines(["#.#",
+                                  "...",
+                                  "#.#"])
+        self.assertFalse(layer.is_suitable_for_door((1, 1)))
+        layer = layer_from_lines(["#.#",
+                                  "#.#",
+                                  "#.#"])
+        self.assertTrue(layer.is_suitable_for_door((1, 1)))
+        self.assertFalse(layer.is_suitable_for_door((0, 1)))
+
+    def test_no_door_next_to_door_or_chasm(self):
+        layer = layer_from_lines(["#+#",
+                                  "#.#",
+                                  "#_#"])
+        self.assertFalse(layer.is_suitable_for_door((1, 1)))
+
+    def test_cellular_automata_step_counts_outside_as_solid(self):
+        layer = layer_from_lines(["....",
+                                  ".#..",
+                                  "....",
+                                  "...."])
+        self.assertEqual(lines_from_layer(layer.cellular_automata_step()),
+                         ["#..#",
+                          "....",
+                          "....",
+                          "#..#"])
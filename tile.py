@@ -1,7 +1,5 @@
-import colors
-from graphic import CharPrinter
-from stats import GamePieceTypes, DataPoint, DataTypes
-import compositecore
+from graphic import GraphicCharTerrainCorners
+from stats import GamePieceTypes
 import frame
 import terrain
 
@@ -17,6 +15,13 @@ class Tile(object):
             GamePieceTypes.TERRAIN: []
         }
         self._top_level = GamePieceTypes.TERRAIN
+        self.content_version = 0
+
+    def signal_content_changed(self):
+        """
+        Marks that the look of the tile changed, so memories of it are out of date.
+        """
+        self.content_version += 1
 
     def draw_unseen(self, console, screen_position):
         piece_list = self.get_top_pieces()
@@ -58,12 +63,14 @@ class Tile(object):
         piece_type = piece.game_piece_type.value
         self.game_pieces[piece_type].append(piece)
         self._update_top_level()
+        self.content_version += 1
 
     def remove(self, piece):
         piece_type = piece.game_piece_type.value
         if piece in self.game_pieces[piece_type]:
             self.game_pieces[piece_type].remove(piece)
             self._update_top_level()
+            self.content_version += 1
             return True
         return False
 
@@ -121,26 +128,20 @@ class Tile(object):
             return False
         return True
 
-    def copy(self):
-        copy_tile = Tile()
-        pieces = [self.game_pieces[self._top_level][0]]
-        if self.get_terrain():
-            pieces.append(self.get_terrain())
-        for piece in pieces:
-            copy_tile.add(self._copy_add_children_helper(piece))
-        return copy_tile
-
-    def _copy_add_children_helper(self, old_piece):
-        new_piece = compositecore.Composite()
-        if old_piece.has("game_piece_type"):
-            new_piece.set_child(DataPoint(DataTypes.GAME_PIECE_TYPE, old_piece.game_piece_type.value))
-        if old_piece.has("graphic_char"):
-            new_piece.set_child(old_piece.graphic_char.copy())
-        if old_piece.has("description"):
-            new_piece.set_child(old_piece.description.copy())
-        new_piece.set_child(CharPrinter())
-        return new_piece
-
 
 unknown_tile = Tile()
 unknown_tile.add(terrain.Unknown())
+
+
+def new_sentinel_tile(terrain_factory):
+    """
+    Creates the tile shared by all positions in untouched chunks of a level.
+
+    The sentinel is never placed in a dungeon level so it must not be modified.
+    """
+    sentinel = Tile()
+    sentinel_terrain = terrain_factory()
+    if isinstance(sentinel_terrain.graphic_char, GraphicCharTerrainCorners):
+        sentinel_terrain.graphic_char.set_surrounded_by_sticky_terrain()
+    sentinel.add(sentinel_terrain)
+    return sentinel
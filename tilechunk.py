@@ -0,0 +1,131 @@
+CHUNK_SHIFT = 5
+CHUNK_SIZE = 1 << CHUNK_SHIFT  # 32x32 tiles per chunk.
+CHUNK_MASK = CHUNK_SIZE - 1
+
+
+class ChunkedTileMatrix(object):
+    """
+    Tile storage of a dungeon level split into square chunks.
+
+    Chunks are materialised lazily, an untouched chunk has no tiles of its own,
+    every position in it reads as the shared sentinel tile. A chunk that only had
+    some of its tiles set keeps the rest empty until it is materialised.
+    Memory is therefore proportional to the touched area of the level
+    and not to its bounding box.
+
+    Attributes:
+        width (int): The width of the level in tiles.
+        height (int): The height of the level in tiles.
+        sentinel_tile (Tile): The tile every position of an untouched chunk reads as.
+        terrain_factory (function): Creates the terrain that should fill a chunk when it is materialised.
+        If None materialised chunks are filled with the sentinel tile.
+    """
+
+    def __init__(self, width, height, sentinel_tile, terrain_factory=None):
+        self.width = width
+        self.height = height
+        self.sentinel_tile = sentinel_tile
+        self.terrain_factory = terrain_factory
+        self.chunk_columns = (width + CHUNK_MASK) >> CHUNK_SHIFT
+        self.chunk_rows = (height + CHUNK_MASK) >> CHUNK_SHIFT
+        self._chunks = [None] * (self.chunk_columns * self.chunk_rows)
+
+    @classmethod
+    def from_rows(cls, rows, sentinel_tile=None):
+        """
+        Creates a fully materialised matrix from a list of tile rows.
+        """
+        tile_matrix = cls(len(rows[0]), len(rows), sentinel_tile)
+        for y, row in enumerate(rows):
+            for x, the_tile in enumerate(row):
+                tile_matrix.set(x, y, the_tile)
+        return tile_matrix
+
+    def has(self, x, y):
+        return 0 <= x < self.width and 0 <= y < self.height
+
+    def get(self, x, y):
+        """
+        Gets the tile at (x, y) or None if it has not been materialised.
+
+        Raises IndexError if the position is outside of the matrix.
+        """
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            raise IndexError("Position {0} is outside of the tile matrix.".format(str((x, y))))
+        chunk = self._chunks[(y >> CHUNK_SHIFT) * self.chunk_columns + (x >> CHUNK_SHIFT)]
+        if chunk is None:
+            return None
+        return chunk[((y & CHUNK_MASK) << CHUNK_SHIFT) | (x & CHUNK_MASK)]
+
+    def peek(self, x, y):
+        """
+        Gets the tile at (x, y) without materialising anything.
+
+        Positions in untouched chunks read as the sentinel tile.
+        """
+        the_tile = self.get(x, y)
+        if the_tile is None:
+            return self.sentinel_tile
+        return the_tile
+
+    def set(self, x, y, the_tile):
+        """
+        Sets the tile at (x, y), the other positions of an untouched chunk are left empty.
+        """
+        chunk = self._get_or_create_chunk(x, y, None)
+        chunk[((y & CHUNK_MASK) << CHUNK_SHIFT) | (x & CHUNK_MASK)] = the_tile
+
+    def is_materialised(self, x, y):
+        return not self._chunks[(y >> CHUNK_SHIFT) * self.chunk_columns + (x >> CHUNK_SHIFT)] is None
+
+    def materialise_chunk(self, x, y, tile_factory):
+        """
+        Gives every empty position of the chunk holding (x, y) a tile of its own.
+
+        Returns the positions inside the level of the new tiles,
+        if the chunk was already materialised an empty list is returned.
+        """
+        chunk = self._get_or_create_chunk(x, y, None)
+        left = x & ~CHUNK_MASK
+        top = y & ~CHUNK_MASK
+        positions = []
+        for chunk_y in range(top, min(top + CHUNK_SIZE, self.height)):
+            for chunk_x in range(left, min(left + CHUNK_SIZE, self.width)):
+                index = ((chunk_y & CHUNK_MASK) << CHUNK_SHIFT) | (chunk_x & CHUNK_MASK)
+                if chunk[index] is None:
+                    chunk[index] = tile_factory()
+                    positions.append((chunk_x, chunk_y))
+        return positions
+
+    def number_of_materialised_chunks(self):
+        return len([chunk for chunk in self._chunks if not chunk is None])
+
+    def touched_chunk_bounds(self):
+        """
+        Yields (left, top, right, bottom) of every chunk that holds tiles, right and bottom exclusive.
+
+        Every position outside of these bounds reads as the sentinel tile.
+        """
+        for chunk_index, chunk in enumerate(self._chunks):
+            if chunk is None:
+                continue
+            left = (chunk_index % self.chunk_columns) << CHUNK_SHIFT
+            top = (chunk_index // self.chunk_columns) << CHUNK_SHIFT
+            yield left, top, min(left + CHUNK_SIZE, self.width), min(top + CHUNK_SIZE, self.height)
+
+    def rows(self):
+        """
+        Yields every row of the matrix as a list of tiles, nothing is materialised.
+        """
+        for y in range(self.height):
+            yield [self.peek(x, y) for x in range(self.width)]
+
+    def _get_or_create_chunk(self, x, y, fill):
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            raise IndexError("Position {0} is outside of the tile matrix.".format(str((x, y))))
+        chunk_index = (y >> CHUNK_SHIFT) * self.chunk_columns + (x >> CHUNK_SHIFT)
+        chunk = self._chunks[chunk_index]
+        if chunk is None:
+            chunk = [fill] * (CHUNK_SIZE * CHUNK_SIZE)
+            self._chunks[chunk_index] = chunk
+        return chunk
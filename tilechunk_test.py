@@ -0,0 +1,63 @@
+import unittest
+from tilechunk import ChunkedTileMatrix, CHUNK_SIZE
+
+
+class TestComposition(unittest.TestCase):
+
+    def setUp(self):
+        self.sentinel = object()
+        self.tile_matrix = ChunkedTileMatrix(CHUNK_SIZE * 2 + 5, CHUNK_SIZE + 3, self.sentinel, object)
+
+    def test_untouched_position_reads_as_sentinel(self):
+        self.assertIs(self.tile_matrix.peek(3, 4), self.sentinel)
+        self.assertIsNone(self.tile_matrix.get(3, 4))
+        self.assertEqual(self.tile_matrix.number_of_materialised_chunks(), 0)
+
+    def test_materialise_chunk_only_creates_tiles_in_that_chunk(self):
+        positions = self.tile_matrix.materialise_chunk(CHUNK_SIZE + 1, 2, object)
+        self.assertEqual(len(positions), CHUNK_SIZE * CHUNK_SIZE)
+        self.assertEqual(self.tile_matrix.number_of_materialised_chunks(), 1)
+        self.assertIsNot(self.tile_matrix.peek(CHUNK_SIZE, 0), self.sentinel)
+        self.assertIs(self.tile_matrix.peek(0, 0), self.sentinel)
+
+    def test_materialise_edge_chunk_is_clipped_to_the_matrix(self):
+        positions = self.tile_matrix.materialise_chunk(CHUNK_SIZE * 2, CHUNK_SIZE, object)
+        self.assertEqual(len(positions), 5 * 3)
+        self.assertIn((CHUNK_SIZE * 2 + 4, CHUNK_SIZE + 2), positions)
+
+    def test_materialise_chunk_twice_creates_no_new_tiles(self):
+        self.tile_matrix.materialise_chunk(0, 0, object)
+        self.assertEqual(self.tile_matrix.materialise_chunk(5, 5, object), [])
+
+    def test_set_then_get_returns_the_tile(self):
+        the_tile = object()
+        self.tile_matrix.set(CHUNK_SIZE + 2, CHUNK_SIZE + 1, the_tile)
+        self.assertIs(self.tile_matrix.get(CHUNK_SIZE + 2, CHUNK_SIZE + 1), the_tile)
+        self.assertIs(self.tile_matrix.peek(CHUNK_SIZE + 3, CHUNK_SIZE + 1), self.sentinel)
+        self.assertIsNone(self.tile_matrix.get(CHUNK_SIZE + 3, CHUNK_SIZE + 1))
+
+    def test_materialise_after_set_keeps_the_set_tile(self):
+        the_tile = object()
+        self.tile_matrix.set(2, 1, the_tile)
+        positions = self.tile_matrix.materialise_chunk(0, 0, object)
+        self.assertEqual(len(positions), CHUNK_SIZE * CHUNK_SIZE - 1)
+        self.assertFalse((2, 1) in positions)
+        self.assertIs(self.tile_matrix.get(2, 1), the_tile)
+        self.assertIsNotNone(self.tile_matrix.get(3, 1))
+
+    def test_touched_chunk_bounds_are_clipped_to_the_matrix(self):
+        self.tile_matrix.set(CHUNK_SIZE * 2 + 1, CHUNK_SIZE, object())
+        self.tile_matrix.materialise_chunk(0, 0, object)
+        self.assertEqual(sorted(self.tile_matrix.touched_chunk_bounds()),
+                         [(0, 0, CHUNK_SIZE, CHUNK_SIZE),
+                          (CHUNK_SIZE * 2, CHUNK_SIZE, CHUNK_SIZE * 2 + 5, CHUNK_SIZE + 3)])
+
+    def test_get_outside_of_matrix_raises_index_error(self):
+        self.assertRaises(IndexError, self.tile_matrix.get, -1, 0)
+        self.assertRaises(IndexError, self.tile_matrix.get, 0, CHUNK_SIZE + 3)
+
+    def test_from_rows_keeps_all_tiles(self):
+        rows = [[object() for _ in range(3)] for _ in range(2)]
+        tile_matrix = ChunkedTileMatrix.from_rows(rows)
+        self.assertEqual((tile_matrix.width, tile_matrix.height), (3, 2))
+        self.assertIs(tile_matrix.get(2, 1), rows[1][2])
@@ -15,3 +15,26 @@ def time_it_return_time(func):
     start = time.clock()
     func()
     return time.clock() - start
+
+
+class StageTimer(object):
+    """
+    Sums up the time spent in each stage of a longer task.
+
+    Each lap is charged to the named stage with the time since the previous lap or start.
+    """
+    def __init__(self):
+        self.elapsed = {}
+        self._last_lap = time.clock()
+
+    def start(self):
+        self._last_lap = time.clock()
+
+    def lap(self, stage):
+        now = time.clock()
+        self.elapsed[stage] = self.elapsed.get(stage, 0.0) + now - self._last_lap
+        self._last_lap = now
+
+    def reset(self):
+        self.elapsed = {}
+        self._last_lap = time.clock()
@@ -1,54 +1,103 @@
 import geometry
-from compositecore import Leaf
+from compositecore import Leaf, CompositeMessage
 import rng
-import turn
 
 
 class Vision(Leaf):
     """
     Holds functions that exposes what the parent entity can see.
+
+    What is seen is kept as a perception snapshot sorted closest first, the least
+    wounded first among the equally close. The snapshot is only recalculated when
+    the parent moves, its field of vision changes or an entity enters or leaves
+    the regions around it, and only resorted when the health of a seen entity changes.
     """
 
     def __init__(self):
         super(Vision, self).__init__()
         self.component_type = "vision"
-
         self._seen_entities_cache = []
-        self._seen_entities_cache_timestamp = -1
+        self._snapshot_key = None
+        self._health_key = None
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state["_snapshot_key"] = None
+        state["_health_key"] = None
+        return state
 
     def get_seen_entities(self):
         """
-        Gets all entities seen by this entity not including self.
+        Gets all entities seen by this entity not including self, closest first.
         """
-        if self._seen_entities_cache_timestamp < turn.current_turn:
-            self._calculate_seen_entities()
+        self._update_snapshot_if_old()
         return self._seen_entities_cache
 
-    def _calculate_seen_entities(self):
-        if not self.parent.dungeon_level.value is None:
-            seen_entities = []
-            for entity in self.parent.dungeon_level.value.entities:
-                if self.parent.dungeon_mask.can_see_point(entity.position.value):
-                    seen_entities.append(entity)
-            self._seen_entities_cache = [entity for entity in seen_entities if not entity is self.parent]
-            self._seen_entities_cache_timestamp = turn.current_turn
-
     def get_seen_entities_closest_first(self):
         """
         Gets all seen entities sorted on distance from self not including self.
         """
-        return sorted(self.get_seen_entities(), key=lambda entity:
-                      (geometry.chess_distance(self.parent.position.value, entity.position.value),
-                       -entity.health.hp.ratio_of_full(), hash(entity)))
+        return list(self.get_seen_entities())
 
     def get_closest_seen_entity(self):
         """
         Gets the closest of all seen entities not including self.
         """
-        closest_seen_entities = self.get_seen_entities_closest_first()
-        if len(closest_seen_entities) < 1:
+        seen_entities = self.get_seen_entities()
+        if len(seen_entities) < 1:
             return None
-        return closest_seen_entities[0]  # The first is oneself.
+        return seen_entities[0]
+
+    def get_k_closest_seen_entities(self, k):
+        """
+        Gets the k closest seen entities not including self, closest first.
+        """
+        return self.get_seen_entities()[:k]
+
+    def get_seen_entities_where(self, predicate):
+        """
+        Gets the seen entities for which predicate is True, closest first.
+        """
+        return [entity for entity in self.get_seen_entities() if predicate(entity)]
+
+    def send_message(self, message):
+        if message == CompositeMessage.POSITION_CHANGED:
+            self._snapshot_key = None
+
+    def _update_snapshot_if_old(self):
+        dungeon_level = self.parent.dungeon_level.value
+        if dungeon_level is None:
+            return
+        origin, radius, fov = self.parent.dungeon_mask.get_fov_window()
+        if origin is None:
+            return
+        entity_version = dungeon_level.level_map.get_entity_window_version(origin, radius)
+        snapshot_key = (dungeon_level, origin, fov, entity_version)
+        if snapshot_key != self._snapshot_key:
+            self._calculate_seen_entities(dungeon_level, origin, radius)
+            self._snapshot_key = snapshot_key
+        if self._get_health_key() != self._health_key:
+            self._sort_seen_entities()
+            self._health_key = self._get_health_key()
+
+    def _calculate_seen_entities(self, dungeon_level, origin, radius):
+        seen_entities = []
+        for entity in dungeon_level.entities:
+            if (not entity is self.parent and
+                    geometry.chess_distance(origin, entity.position.value) <= radius and
+                    self.parent.dungeon_mask.can_see_point(entity.position.value)):
+                seen_entities.append(entity)
+        self._seen_entities_cache = seen_entities
+        self._health_key = None
+
+    def _get_health_key(self):
+        return tuple(entity.health.hp.ratio_of_full() for entity in self._seen_entities_cache)
+
+    def _sort_seen_entities(self):
+        self._seen_entities_cache = sorted(self._seen_entities_cache, key=lambda entity:
+                                           (geometry.chess_distance(self.parent.position.value,
+                                                                    entity.position.value),
+                                            -entity.health.hp.ratio_of_full(), hash(entity)))
 
 
 class AwarenessChecker(Leaf):
@@ -0,0 +1,45 @@
+import unittest
+import dungeonlevelfactory
+import monster
+import spawner
+
+
+def level_from_lines(lines):
+    return dungeonlevelfactory.dungeon_level_from_lines(lines)
+
+
+def new_ratman_at(position, dungeon_level):
+    ratman = spawner.new_from_template(monster.new_ratman, None)
+    ratman.mover.try_move(position, dungeon_level)
+    return ratman
+
+
+class TestComposition(unittest.TestCase):
+
+    def setUp(self):
+        self.dungeon_level = level_from_lines(["#######",
+                                               "#.....#",
+                                               "#.....#",
+                                               "#.....#",
+                                               "#######"])
+        self.looker = new_ratman_at((3, 2), self.dungeon_level)
+        self.left = new_ratman_at((1, 2), self.dungeon_level)
+        self.right = new_ratman_at((5, 2), self.dungeon_level)
+
+    def test_snapshot_is_sorted_closest_first(self):
+        far = new_ratman_at((1, 1), self.dungeon_level)
+        near = new_ratman_at((4, 3), self.dungeon_level)
+        seen_entities = self.looker.vision.get_seen_entities()
+        self.assertEqual(seen_entities[0], near)
+        self.assertEqual(set(seen_entities[1:]), set([far, self.left, self.right]))
+
+    def test_snapshot_is_resorted_when_health_changes(self):
+        self.left.health.hp.value = 1
+        self.assertEqual(self.looker.vision.get_seen_entities(), [self.right, self.left])
+        self.right.health.hp.value = 0
+        self.assertEqual(self.looker.vision.get_seen_entities(), [self.left, self.right])
+
+    def test_snapshot_is_recalculated_when_an_entity_leaves(self):
+        self.assertEqual(set(self.looker.vision.get_seen_entities()), set([self.left, self.right]))
+        self.right.mover.try_remove_from_dungeon()
+        self.assertEqual(self.looker.vision.get_seen_entities(), [self.left])